@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Compare the per-run cost of keeping quote_latest current as the quote table grows.
+
+"rebuild" is the old drop-and-rebuild of quote_latest over the whole quote table after every insert,
+"trigger" is the incrementally maintained table from sql/migrations/0002_quote_latest.sql.
+
+Run with: python benchmarks/quote_latest.py [history sizes...]
+"""
+
+import sqlite3 as sqlite
+import sys
+import tempfile
+import time
+
+from cryptomonere import migrations
+from cryptomonere.app import quote_columns
+
+SYMBOLS = ["BTC", "ETH", "BCH", "XMR", "SOL", "MINA", "ZEC", "BNB", "XRP", "AGIX", "CXTC", "PAXG", "XAUT", "KAG"]
+RUNS = 20
+
+old_rebuild = """
+drop table if exists quote_latest;
+
+create table quote_latest as
+select * from (
+    select
+        *,
+        row_number() over (
+            partition by symbol order by timestamp desc
+        ) as is_latest
+    from quote
+)
+where is_latest = 1
+"""
+
+insert_quote = f"insert into quote ({', '.join(quote_columns)}) values ({', '.join('?' for _ in quote_columns)})"
+
+
+def quote_rows(tick):
+    stamp = f"2020-01-01T00:00:00Z+{tick:09d}"
+    for i, symbol in enumerate(SYMBOLS):
+        row = dict.fromkeys(quote_columns)
+        row.update(id=i, symbol=symbol, name=symbol, timestamp=stamp, last_updated=stamp, price=float(tick % 1000 + i))
+        yield tuple(row[column] for column in quote_columns)
+
+
+def build_db(path, history, schema_version):
+    cx = sqlite.connect(path)
+    for migration in migrations.migrations()[:schema_version]:
+        cx.executescript(migration.read_text())
+    with cx:
+        for tick in range(history // len(SYMBOLS)):
+            cx.executemany(insert_quote, quote_rows(tick))
+    return cx
+
+
+def time_runs(cx, tick, per_run):
+    start = time.perf_counter()
+    for run in range(RUNS):
+        with cx:
+            cx.executemany(insert_quote, quote_rows(tick + run))
+        per_run(cx)
+    return (time.perf_counter() - start) / RUNS * 1000
+
+
+def bench(history):
+    with tempfile.TemporaryDirectory() as tmp:
+        cx = build_db(f"{tmp}/rebuild.db", history, 1)
+        rebuild_ms = time_runs(cx, history, lambda cx: cx.executescript(old_rebuild))
+        cx.close()
+
+        cx = build_db(f"{tmp}/trigger.db", history, 1)
+        cx.executescript(migrations.migrations()[1].read_text())
+        trigger_ms = time_runs(cx, history, lambda cx: None)
+        cx.close()
+    return rebuild_ms, trigger_ms
+
+
+def main(sizes):
+    print(f"{'quote rows':>12} {'rebuild ms/run':>16} {'trigger ms/run':>16}")
+    for history in sizes:
+        rebuild_ms, trigger_ms = bench(history)
+        print(f"{history:>12} {rebuild_ms:>16.3f} {trigger_ms:>16.3f}")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
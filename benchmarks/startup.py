@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Check that monere commands start quickly: the time a command takes on top of starting a bare python interpreter,
+and that starting one imports none of the heavy dependencies only some commands need.
+
+Each command runs in a fresh process against a temporary config and database, after one warm-up run which writes
+the config cache. Exits with status 1 if a command is over the budget (in milliseconds) or imports a heavy module.
+
+Run with: python benchmarks/startup.py [budget ms]
+"""
+
+import json
+import os
+import sqlite3 as sqlite
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from cryptomonere import migrations
+
+BUDGET_MS = 100
+RUNS = 10
+COMMANDS = [
+    ["report", "latest"],
+    ["report", "last_at", "BTC", "30000"],
+    ["search", "bit"],
+]
+# Only the commands which need them may import these
+HEAVY_MODULES = ["pydantic", "requests", "numpy", "polars", "matplotlib", "cryptomonere.alerts_json", "cryptomonere.client"]
+
+imported_modules = f"""
+import sys
+from cryptomonere import app
+app.main(["report", "latest"])
+print(",".join(module for module in {HEAVY_MODULES!r} if module in sys.modules), file=sys.stderr)
+"""
+
+
+def build_home(home):
+    config_dir = os.path.join(home, ".config", "cryptomonere")
+    os.makedirs(config_dir)
+    with open(os.path.join(config_dir, "config.json"), "w") as f:
+        json.dump({"data_dir": os.path.join(home, "data"), "api_keys": {"coinmarketcap": "x"}}, f)
+    os.makedirs(os.path.join(home, "data"))
+    cx = sqlite.connect(os.path.join(home, "data", "crypto.db"))
+    migrations.migrate(cx)
+    with cx:
+        cx.execute("insert into currency (id, currency_rank, name, symbol, slug) values (1, 1, 'Bitcoin', 'BTC', 'bitcoin')")
+    cx.close()
+
+
+def time_ms(argv, env):
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run(argv, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main(budget):
+    failed = False
+    with tempfile.TemporaryDirectory() as home:
+        build_home(home)
+        env = dict(os.environ, HOME=home)
+        subprocess.run([sys.executable, "-m", "cryptomonere.app", "report", "latest"], env=env, capture_output=True, check=True)
+        bare = time_ms([sys.executable, "-c", "pass"], env)
+        print(f"{'command':<28} {'ms':>8} {'over bare python':>18}")
+        print(f"{'(bare python)':<28} {bare:>8.1f}")
+        for command in COMMANDS:
+            ms = time_ms([sys.executable, "-m", "cryptomonere.app", *command], env)
+            over = ms - bare
+            failed |= over > budget
+            print(f"{' '.join(command):<28} {ms:>8.1f} {over:>18.1f}{'  OVER BUDGET' if over > budget else ''}")
+
+        heavy = subprocess.run([sys.executable, "-c", imported_modules], env=env, capture_output=True, text=True, check=True).stderr.splitlines()[-1]
+        if heavy:
+            failed = True
+            print(f"report latest imported {heavy}")
+    print(f"budget {budget} ms: {'FAILED' if failed else 'ok'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Compare the bytes on disk per stored quote snapshot before and after the asset/quote_fact split.
+
+"before" is the wide quote table of schema version 8 with its (symbol, last_updated) index, "after" is the same
+snapshots migrated by sql/migrations/0009_quote_fact.sql into asset, its symbol index and the quote_fact table.
+Snapshots have every field the api returns filled in. Sizes come from the dbstat virtual table.
+
+Run with: python benchmarks/storage.py [snapshot counts...]
+"""
+
+import random
+import sqlite3 as sqlite
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from cryptomonere import migrations
+from cryptomonere.app import quote_columns
+
+SYMBOLS = ["BTC", "ETH", "BCH", "XMR", "SOL", "MINA", "ZEC", "BNB", "XRP", "AGIX", "CXTC", "PAXG", "XAUT", "KAG"]
+FACT_VERSION = 9
+START = datetime(2020, 1, 1)
+
+insert_quote = f"insert into quote ({', '.join(quote_columns)}) values ({', '.join('?' for _ in quote_columns)})"
+
+
+def quote_rows(tick, rng):
+    minute = (START + timedelta(minutes=tick)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    for i, symbol in enumerate(SYMBOLS):
+        price = rng.uniform(0.01, 60000)
+        supply = rng.uniform(1e6, 1e10)
+        row = {column: rng.uniform(-50, 50) for column in quote_columns}
+        row.update(
+            id=i + 1,
+            timestamp=minute,
+            name=f"{symbol} coin",
+            symbol=symbol,
+            date_added="2013-04-28T00:00:00.000Z",
+            max_supply=21000000,
+            circulating_supply=supply,
+            is_active=1,
+            infinite_supply=0,
+            minted_market_cap=price * supply,
+            cmc_rank=i + 1,
+            is_fiat=0,
+            self_reported_circulating_supply=None,
+            self_reported_market_cap=None,
+            last_updated=minute,
+            price=price,
+            volume_24h=rng.uniform(1e6, 1e10),
+            market_cap=price * supply,
+            fully_diluted_market_cap=price * 21000000,
+        )
+        yield tuple(row[column] for column in quote_columns)
+
+
+def table_bytes(cx, names):
+    return cx.execute(f"select coalesce(sum(pgsize), 0) from dbstat where name in ({', '.join('?' for _ in names)})", names).fetchone()[0]
+
+
+def bench(snapshots):
+    rng = random.Random(snapshots)
+    with tempfile.TemporaryDirectory() as tmp:
+        cx = sqlite.connect(f"{tmp}/storage.db")
+        for migration in migrations.migrations()[: FACT_VERSION - 1]:
+            cx.executescript(migration.read_text())
+        with cx:
+            for tick in range(snapshots // len(SYMBOLS)):
+                cx.executemany(insert_quote, quote_rows(tick, rng))
+        cx.execute("vacuum")
+        rows = cx.execute("select count(*) from quote").fetchone()[0]
+        before = table_bytes(cx, ["quote", "quote_symbol_last_updated"])
+
+        start = time.perf_counter()
+        cx.executescript(f"begin;\n{migrations.migrations()[FACT_VERSION - 1].read_text()}\ncommit;")
+        migrate_s = time.perf_counter() - start
+        cx.execute("vacuum")
+        after = table_bytes(cx, ["quote_fact", "asset", "asset_symbol"])
+        cx.close()
+    return rows, before / rows, after / rows, migrate_s
+
+
+def main(sizes):
+    print(f"{'snapshots':>12} {'before B/row':>14} {'after B/row':>14} {'saved':>8} {'migrate s':>10}")
+    for snapshots in sizes:
+        rows, before, after, migrate_s = bench(snapshots)
+        print(f"{rows:>12} {before:>14.1f} {after:>14.1f} {1 - after / before:>8.1%} {migrate_s:>10.2f}")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
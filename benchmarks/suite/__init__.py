@@ -0,0 +1,9 @@
+"""
+Benchmarks of the monere commands against generated data of several sizes.
+
+data.py generates a home directory (config, coinmarketcap map, minute quotes and CoinCodex history exports),
+stub.py serves the coinmarketcap endpoints monere calls from that data, and __main__.py times every command
+in fresh processes against it and writes the results as JSON.
+
+Run with: python -m benchmarks.suite [--sizes small medium ...] [--output results.json] [--compare older.json]
+"""
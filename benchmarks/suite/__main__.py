@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""Time every monere command at several generated data sizes and write the results as JSON"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.suite.data import SIZES, generate
+from benchmarks.suite.stub import StubApi, StubServer
+
+RESULTS_DIR = Path(__file__).parent.parent.joinpath("results")
+
+
+def commands(home: Path, history_symbols: list[str]) -> list[tuple[str, list[str]]]:
+    """(name, monere arguments) in the order they run. The first ones load the data the later ones read."""
+    symbol = history_symbols[0]
+    return [
+        ("map", ["map"]),
+        ("load-historic", ["load-historic", symbol, str(home.joinpath("history", f"{symbol}.csv"))]),
+        ("get", ["get"]),
+        ("backfill", ["backfill"]),
+        ("report latest", ["report", "latest"]),
+        ("report last_at", ["report", "last_at", symbol, "1", "100", "10000"]),
+        ("doubles_and_halves", ["report", "doubles_and_halves"]),
+        ("search", ["search", "coin"]),
+        ("search --complete", ["search", "s00", "--complete"]),
+        ("alert", ["alert"]),
+        ("graph price_full", ["graph", "price_full", symbol, "--output", str(home.joinpath("graphs"))]),
+    ]
+
+
+def run_size(name: str, runs: int) -> dict:
+    size = SIZES[name]
+    with tempfile.TemporaryDirectory() as tmp, StubServer(StubApi(size.symbols)) as server:
+        home = Path(tmp)
+        start = time.perf_counter()
+        generated = generate(home, size, server.url)
+        generate_s = time.perf_counter() - start
+        print(f"{name}: generated {generated['quotes']} quotes for {size.symbols} symbols in {generate_s:.1f}s", file=sys.stderr)
+
+        env = dict(os.environ, HOME=str(home), MPLBACKEND="Agg")
+        for path in sorted(home.joinpath("history").glob("*.csv"))[1:]:
+            # the other exports are loaded untimed, so the history reports have every symbol's history
+            subprocess.run([sys.executable, "-m", "cryptomonere.app", "load-historic", path.stem, str(path)], env=env, capture_output=True, check=True)
+
+        results = []
+        history_symbols = [path.stem for path in sorted(home.joinpath("history").glob("*.csv"))]
+        for command, arguments in commands(home, history_symbols):
+            times = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                done = subprocess.run([sys.executable, "-m", "cryptomonere.app", *arguments], env=env, capture_output=True, text=True)
+                times.append((time.perf_counter() - started) * 1000)
+                if done.returncode != 0:
+                    print(f"{name} {command} failed:\n{done.stderr[-2000:]}", file=sys.stderr)
+                    break
+            results.append({"command": command, "median_ms": statistics.median(times), "runs_ms": times, "ok": done.returncode == 0})
+            print(f"{name:8s} {command:22s} {statistics.median(times):10.1f} ms", file=sys.stderr)
+    return {"size": name, **generated, "generate_s": generate_s, "commands": results}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, previous: dict):
+    """Print each command's time against the same size and command in an earlier results file"""
+    before = {(size["size"], command["command"]): command["median_ms"] for size in previous["sizes"] for command in size["commands"]}
+    print(f"{'size':8s} {'command':22s} {previous.get('commit') or 'before':>10s} {current.get('commit') or 'now':>10s} {'change':>8s}")
+    for size in current["sizes"]:
+        for command in size["commands"]:
+            old = before.get((size["size"], command["command"]))
+            if old is not None:
+                change = command["median_ms"] / old - 1
+                print(f"{size['size']:8s} {command['command']:22s} {old:10.1f} {command['median_ms']:10.1f} {change:>+8.0%}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Time every monere command at several generated data sizes")
+    parser.add_argument("-s", "--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"], help="Data sizes to run")
+    parser.add_argument("-r", "--runs", type=int, default=3, help="Runs of each command, the median is reported")
+    parser.add_argument("-o", "--output", default=None, help="Results file (defaults to benchmarks/results/DATE-COMMIT.json)")
+    parser.add_argument("-c", "--compare", default=None, help="Earlier results file to compare with")
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "sizes": [run_size(size, args.runs) for size in args.sizes],
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR.joinpath(f"{results['date'][:10]}-{commit or 'unknown'}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as W:
+        json.dump(results, W, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+    if args.compare is not None:
+        with open(args.compare) as R:
+            compare(results, json.load(R))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
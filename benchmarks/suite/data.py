@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""Synthetic monere home directories: config, coinmarketcap map, minute quotes and CoinCodex history exports"""
+
+import csv
+import json
+import math
+import random
+import sqlite3 as sqlite
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from cryptomonere import migrations
+from cryptomonere.app import quote_columns
+
+insert_quote = f"insert into quote ({', '.join(quote_columns)}) values ({', '.join('?' for _ in quote_columns)})"
+
+
+@dataclass
+class Size:
+    # currencies in the map and in config.json's symbols, so "get" fetches a quote for each of them
+    symbols: int
+    # how many of those have minute quotes for the last quote_days days, and daily history for history_days before that
+    history_symbols: int
+    quote_days: int
+    history_days: int
+
+
+SIZES = {
+    "small": Size(symbols=500, history_symbols=5, quote_days=7, history_days=2 * 365),
+    "medium": Size(symbols=2000, history_symbols=10, quote_days=60, history_days=5 * 365),
+    "large": Size(symbols=5000, history_symbols=20, quote_days=365, history_days=10 * 365),
+}
+
+
+def symbol_name(i: int) -> str:
+    """BTC, ETH and XMR first, then S0004, S0005..., so the usual symbols are in every size"""
+    return ["BTC", "ETH", "XMR"][i] if i < 3 else f"S{i + 1:04d}"
+
+
+def start_price(symbol: str) -> float:
+    return random.Random(symbol).uniform(0.01, 50000)
+
+
+def map_entry(i: int, symbol: str) -> dict:
+    return {
+        "id": i + 1,
+        "rank": i + 1,
+        "name": f"{symbol} Coin",
+        "symbol": symbol,
+        "slug": f"{symbol.lower()}-coin",
+        "is_active": 1,
+        "status": 1,
+        "first_historical_data": "2013-04-28T18:47:21.000Z",
+        "last_historical_data": "2024-01-01T00:00:00.000Z",
+        "platform": None,
+    }
+
+
+def quote_entry(cmc_id: int, symbol: str, price: float, last_updated: str) -> dict:
+    """A quotes/latest data entry as coinmarketcap returns it"""
+    supply = 1e6 * cmc_id
+    return {
+        "id": cmc_id,
+        "name": f"{symbol} Coin",
+        "symbol": symbol,
+        "date_added": "2013-04-28T00:00:00.000Z",
+        "max_supply": 21000000,
+        "circulating_supply": supply,
+        "is_active": 1,
+        "infinite_supply": False,
+        "minted_market_cap": price * supply,
+        "cmc_rank": cmc_id,
+        "is_fiat": 0,
+        "self_reported_circulating_supply": None,
+        "self_reported_market_cap": None,
+        "last_updated": last_updated,
+        "quote": {
+            "USD": {
+                "price": price,
+                "volume_24h": price * supply * 0.05,
+                "volume_change_24h": 1.5,
+                "percent_change_1h": 0.1,
+                "percent_change_24h": -1.2,
+                "percent_change_7d": 3.4,
+                "percent_change_30d": -5.6,
+                "percent_change_60d": 7.8,
+                "percent_change_90d": -9.1,
+                "market_cap": price * supply,
+                "market_cap_dominance": 0.5,
+                "fully_diluted_market_cap": price * 21000000,
+                "last_updated": last_updated,
+            }
+        },
+    }
+
+
+def ohlcv_entry(cmc_id: int, symbol: str, price: float, now: datetime) -> dict:
+    """An ohlcv/latest data entry as coinmarketcap returns it: the bar of the current UTC day so far"""
+    stamp = now.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    supply = 1e6 * cmc_id
+    return {
+        "id": cmc_id,
+        "name": f"{symbol} Coin",
+        "symbol": symbol,
+        "last_updated": stamp,
+        "time_open": now.strftime("%Y-%m-%dT00:00:00.000Z"),
+        "time_close": None,
+        "quote": {
+            "USD": {
+                "open": price * 0.99,
+                "high": price * 1.02,
+                "low": price * 0.98,
+                "close": price,
+                "volume": price * supply * 0.05,
+                "market_cap": price * supply,
+                "last_updated": stamp,
+            }
+        },
+    }
+
+
+def historical_entry(cmc_id: int, symbol: str, stamps: list[str]) -> dict:
+    """A quotes/historical data entry with a point at each of stamps, priced on the same random walk as quote_rows"""
+    supply = 1e6 * cmc_id
+    rng = random.Random(f"{cmc_id} {stamps[0] if stamps else ''}")
+    quotes = [
+        {
+            "timestamp": stamp,
+            "quote": {
+                "USD": {
+                    "price": price,
+                    "volume_24h": price * supply * 0.05,
+                    "market_cap": price * supply,
+                    "circulating_supply": supply,
+                    "total_supply": supply,
+                    "timestamp": stamp,
+                }
+            },
+        }
+        for stamp, price in zip(stamps, random_walk(rng, start_price(symbol), len(stamps), 0.001))
+    ]
+    return {"id": cmc_id, "name": f"{symbol} Coin", "symbol": symbol, "is_active": 1, "is_fiat": 0, "quotes": quotes}
+
+
+def random_walk(rng: random.Random, price: float, steps: int, volatility: float):
+    for _ in range(steps):
+        price *= math.exp(rng.gauss(0, volatility))
+        yield price
+
+
+def quote_rows(cmc_id: int, symbol: str, start: datetime, minutes: int):
+    rng = random.Random(cmc_id)
+    for minute, price in enumerate(random_walk(rng, start_price(symbol), minutes, 0.001)):
+        stamp = (start + timedelta(minutes=minute)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        quote = quote_entry(cmc_id, symbol, price, stamp)
+        row = {column: quote.get(column) for column in quote_columns}
+        row.update({column: value for column, value in quote["quote"]["USD"].items() if column in row})
+        row["timestamp"] = stamp
+        yield tuple(row[column] for column in quote_columns)
+
+
+def write_history(path: Path, symbol: str, end: datetime, days: int):
+    """A CoinCodex export of days daily rows ending at end"""
+    rng = random.Random(symbol)
+    first = end - timedelta(days=days)
+    with open(path, "w", newline="") as W:
+        writer = csv.writer(W)
+        writer.writerow(["Start", "End", "Open", "High", "Low", "Close", "Volume", "Market Cap"])
+        close = start_price(symbol)
+        for day, price in enumerate(random_walk(rng, close, days, 0.03)):
+            low, high = min(close, price) * rng.uniform(0.95, 1), max(close, price) * rng.uniform(1, 1.05)
+            date = first + timedelta(days=day)
+            writer.writerow([date.strftime("%Y-%m-%d"), (date + timedelta(days=1)).strftime("%Y-%m-%d"), close, high, low, price, price * 1e6, price * 1e8])
+            close = price
+
+
+def generate(home: Path, size: Size, base_url: str) -> dict:
+    """Write a monere home directory for size under home. Returns a description of what was generated."""
+    config_dir = home.joinpath(".config", "cryptomonere")
+    data_dir = home.joinpath("data")
+    config_dir.mkdir(parents=True)
+    data_dir.mkdir(parents=True)
+    symbols = [symbol_name(i) for i in range(size.symbols)]
+
+    config = {
+        "data_dir": str(data_dir),
+        "api_keys": {"coinmarketcap": "benchmark"},
+        "api_base_url": base_url,
+        "api_retries": 0,
+        "fetch_ohlcv": True,
+        "symbols": symbols,
+    }
+    with open(config_dir.joinpath("config.json"), "w") as W:
+        json.dump(config, W)
+    rules = {
+        "range-rules": [{"currency": "All", "low": 1, "high": 40000}],
+        "variability-rules": [{"currency": "All", "magnitude": 0.1, "duration": "1 day"}],
+    }
+    with open(config_dir.joinpath("alert_rules.json"), "w") as W:
+        json.dump(rules, W)
+    with open(data_dir.joinpath("map.json"), "w") as W:
+        json.dump({"status": {"error_code": 0}, "data": [map_entry(i, symbol) for i, symbol in enumerate(symbols)]}, W)
+
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0, tzinfo=None)
+    quotes_start = now - timedelta(days=size.quote_days)
+    minutes = size.quote_days * 24 * 60
+    cx = sqlite.connect(data_dir.joinpath("crypto.db"))
+    migrations.migrate(cx)
+    with cx:
+        for i, symbol in enumerate(symbols[: size.history_symbols]):
+            cx.executemany(insert_quote, quote_rows(i + 1, symbol, quotes_start, minutes))
+    cx.close()
+
+    history_dir = home.joinpath("history")
+    history_dir.mkdir()
+    for symbol in symbols[: size.history_symbols]:
+        write_history(history_dir.joinpath(f"{symbol}.csv"), symbol, quotes_start, size.history_days)
+    return {**asdict(size), "quotes": size.history_symbols * minutes}
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""A local stand-in for the coinmarketcap api, serving generated responses so commands can be timed without the network"""
+
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.suite.data import historical_entry, map_entry, ohlcv_entry, quote_entry, start_price, symbol_name
+from cryptomonere.backfill import intervals
+
+
+class StubApi:
+    """Generated coinmarketcap responses for count currencies. Prices drift with every quotes/latest call."""
+
+    def __init__(self, count: int):
+        self.symbols = [symbol_name(i) for i in range(count)]
+        self.calls = 0
+        self.historical_calls = 0
+        self.routes = {
+            "/v1/cryptocurrency/map": self.map,
+            "/v2/cryptocurrency/quotes/latest": self.quotes_latest,
+            "/v2/cryptocurrency/ohlcv/latest": self.ohlcv_latest,
+            "/v2/cryptocurrency/quotes/historical": self.quotes_historical,
+        }
+
+    def map(self, params: dict) -> dict:
+        return {"status": {"error_code": 0, "credit_count": 1}, "data": [map_entry(i, symbol) for i, symbol in enumerate(self.symbols)]}
+
+    def quotes_latest(self, params: dict) -> dict:
+        self.calls += 1
+        ids = [int(cmc_id) for cmc_id in params.get("id", [""])[0].split(",") if cmc_id]
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        data = {}
+        for cmc_id in ids:
+            if 0 < cmc_id <= len(self.symbols):
+                symbol = self.symbols[cmc_id - 1]
+                data[str(cmc_id)] = quote_entry(cmc_id, symbol, start_price(symbol) * (1 + 0.001 * self.calls), now)
+        return {"status": {"error_code": 0, "credit_count": 1 + len(ids) // 100}, "data": data}
+
+    def ohlcv_latest(self, params: dict) -> dict:
+        ids = [int(cmc_id) for cmc_id in params.get("id", [""])[0].split(",") if cmc_id]
+        now = datetime.now(timezone.utc)
+        data = {}
+        for cmc_id in ids:
+            if 0 < cmc_id <= len(self.symbols):
+                symbol = self.symbols[cmc_id - 1]
+                data[str(cmc_id)] = ohlcv_entry(cmc_id, symbol, start_price(symbol) * (1 + 0.001 * self.calls), now)
+        return {"status": {"error_code": 0, "credit_count": 1 + len(ids) // 100}, "data": data}
+
+    def quotes_historical(self, params: dict) -> dict:
+        """Points every interval from time_start to time_end, on the minute grid coinmarketcap uses"""
+        self.historical_calls += 1
+        ids = [int(cmc_id) for cmc_id in params.get("id", [""])[0].split(",") if cmc_id]
+        start = datetime.fromisoformat(params["time_start"][0].replace("Z", "+00:00"))
+        end = datetime.fromisoformat(params["time_end"][0].replace("Z", "+00:00"))
+        step = timedelta(minutes=intervals[params.get("interval", ["5m"])[0]])
+        first = datetime.fromtimestamp(-(-start.timestamp() // step.total_seconds()) * step.total_seconds(), timezone.utc)
+        data = {}
+        for cmc_id in ids:
+            if 0 < cmc_id <= len(self.symbols):
+                symbol = self.symbols[cmc_id - 1]
+                times = (first + n * step for n in range(int((end - first) / step) + 1))
+                data[str(cmc_id)] = historical_entry(cmc_id, symbol, [time.strftime("%Y-%m-%dT%H:%M:%S.000Z") for time in times])
+        return {"status": {"error_code": 0, "credit_count": 1 + len(ids) // 100}, "data": data}
+
+
+class StubServer:
+    """Serve a StubApi (or anything with a routes dict of path -> handler) on a free localhost port from a background thread, as a
+    context manager"""
+
+    def __init__(self, api: StubApi):
+        api_routes = api.routes
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                route = api_routes.get(url.path)
+                if route is None:
+                    status, body = 404, {"status": {"error_code": 404, "error_message": f"No stub for {url.path}"}}
+                else:
+                    status, body = 200, route(parse_qs(url.query))
+                headers = {}
+                if isinstance(body, tuple):
+                    # a route can also answer (status, body, headers), e.g. to rate limit a client under test
+                    status, body, headers = body
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -3,101 +3,139 @@
 import logging
 import pathlib
 import sqlite3 as sqlite
-from itertools import chain
-from typing import List
+from contextlib import contextmanager
+from functools import cache
+from itertools import chain, islice
+from typing import Iterable, List, Mapping, Sequence
 
+from cryptomonere import metrics
 from cryptomonere.config import get_config
 
 logger = logging.getLogger(__name__)
-create_tables = """
-CREATE TABLE history
-        (
-            Symbol varchar(6),
-            StartDate Date,
-            EndDate Date,
-            Open Real,
-            High Real,
-            Low Real,
-            Close Real,
-            Volume Real,
-            Market_Cap Real
-        );
-CREATE TABLE quote
-        (
-            id int,
-            timestamp datetime,
-            name varchar(50),
-            symbol varchar(6),
-            date_added datetime,
-            max_supply Bigint,
-            circulating_supply real,
-            is_active tinyint,
-            infinite_supply tinyint,
-            minted_market_cap real,
-            cmc_rank smallint,
-            is_fiat tinyint,
-            self_reported_circulating_supply numeric,
-            self_reported_market_cap real,
-            last_updated datetime,
-            price real,
-            volume_24h real,
-            volume_change_24h real,
-            percent_change_1h real,
-            percent_change_24h real,
-            percent_change_7d real,
-            percent_change_30d real,
-            percent_change_60d real,
-            percent_change_90d real,
-            market_cap real,
-            market_cap_dominance real,
-            fully_diluted_market_cap real
-        );
-        """
+
+
+# Prepared statements kept per connection, enough for every query the commands run
+CACHED_STATEMENTS = 256
+
+
+@cache  # every SqlHandler in the process shares one connection
+def get_connection() -> sqlite.Connection:
+    config = get_config()
+    cx = sqlite.connect(f"{config.data_dir}/crypto.db", timeout=config.sqlite_busy_timeout, cached_statements=CACHED_STATEMENTS)
+    # WAL lets readers (reports, spawned workers, a second monere) run while watch writes, and with it synchronous=normal is
+    # still safe against corruption, only the last transactions before a power loss can be lost
+    cx.execute("pragma journal_mode = wal")
+    cx.execute("pragma synchronous = normal")
+    cx.execute(f"pragma busy_timeout = {int(config.sqlite_busy_timeout * 1000)}")
+    cx.execute(f"pragma cache_size = {-config.sqlite_cache_mb * 1024}")
+    cx.execute(f"pragma mmap_size = {config.sqlite_mmap_mb * 1024 * 1024}")
+    cx.execute("pragma temp_store = memory")
+    return cx
 
 
 class SqlHandler:
     cx: sqlite.Connection
-    table_list = List[str]
 
-    def listQuery(self, query):
-        self.cx.row_factory = None
-        a = self.cx.execute(query).fetchall()
+    def cursor(self, row_factory=None) -> sqlite.Cursor:
+        """A cursor formatting its rows with row_factory, leaving the shared connection's row_factory alone"""
+        cursor = self.cx.cursor()
+        cursor.row_factory = row_factory
+        return cursor
+
+    @contextmanager
+    def transaction(self):
+        """Run the block in one write transaction, committed at the end or rolled back on an exception.
+
+        begin immediate takes the write lock up front, so a concurrent writer makes the block wait (up to busy_timeout) before it
+        starts rather than fail half way through. A transaction inside another one joins it.
+        """
+        if self.cx.in_transaction:
+            yield self.cx
+            return
+        self.cx.execute("begin immediate")
+        try:
+            yield self.cx
+        except BaseException:
+            self.cx.rollback()
+            raise
+        self.cx.commit()
+
+    def listQuery(self, query, params=()):
+        a = self.cursor().execute(query, params).fetchall()
         return list(chain(*a))
 
-    def sql_df(self, query):
+    def sql_df(self, query, params=(), schema=None):
         import polars
 
-        self.cx.row_factory = None
-        return polars.read_database(query, self.cx)
+        return polars.read_database(query, self.cx, execute_options={"parameters": params}, schema_overrides=schema)
 
-    def bulk_insert(self, insert_into, values):
-        if logger.getEffectiveLevel() == logging.DEBUG:
-            for value in values:
-                self.sql(f"{insert_into}\n{value};", is_update=True)
+    def bulk_insert(
+        self,
+        table: str,
+        columns: Sequence[str],
+        rows: Iterable[Sequence | Mapping],
+        chunk_size: int | None = None,
+        on_conflict: str | None = None,
+        commit_every_chunk: bool = False,
+    ) -> int:
+        """Insert rows (tuples in column order, or dicts keyed by column name) with prepared executemany batches.
 
+        All chunks are written in a single transaction unless commit_every_chunk is set, in which case each chunk is committed
+        as it is written so the rows never need to be held in memory at once. Committing would also commit a caller's open
+        transaction, so commit_every_chunk is refused inside one. on_conflict is an upsert clause appended to the insert, e.g.
+        "(symbol) do nothing". Returns the number of rows written.
+        """
+        if commit_every_chunk and self.cx.in_transaction:
+            raise ValueError("commit_every_chunk would commit the transaction the caller has open")
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return 0
+        if chunk_size is None:
+            chunk_size = get_config().insert_chunk_size
+        if isinstance(first, Mapping):
+            placeholders = ", ".join(f":{column}" for column in columns)
         else:
-            self.sql(insert_into + "\n" + ",".join(values) + ";", is_update=True)
+            placeholders = ", ".join("?" for _ in columns)
+        query = f"insert into {table} ({', '.join(columns)}) values ({placeholders})"
+        if on_conflict is not None:
+            query += f" on conflict {on_conflict}"
+        logger.debug(query)
+
+        rows = chain([first], rows)
+        total = 0
+        with self.transaction():
+            while chunk := list(islice(rows, chunk_size)):
+                self.cx.executemany(query, chunk)
+                total += len(chunk)
+                if commit_every_chunk:
+                    self.cx.commit()
+                    self.cx.execute("begin immediate")
+                logger.debug(f"{table}: inserted {total} rows")
+        metrics.count(f"rows.{table}", total)
+        return total
 
-    def sql_file(self, filename, row_factory=None):
-        self.cx.row_factory = row_factory
+    def sql_file(self, filename, row_factory=None, params=None):
+        """Run a file from the sql directory. Files with a row_factory or params are a single query and return its rows, others are run as a script."""
         with open(pathlib.Path(__file__).parent.joinpath(f"sql/{filename}")) as SQLFILE:
             query = SQLFILE.read()
         logger.debug(query)
-        if row_factory is not None:
-            temp = self.cx.execute(query)
+        if row_factory is not None or params is not None:
+            temp = self.cursor(row_factory).execute(query, params or ())
             return temp.fetchall()
         self.cx.executescript(query)
 
-    def sql(self, query, row_factory=None, is_update=False):
-        self.cx.row_factory = row_factory
+    def sql(self, query, row_factory=None, is_update=False, params=()):
         logger.debug(query)
-        temp = self.cx.execute(query)
+        temp = self.cursor(row_factory).execute(query, params)
         if is_update:
             self.cx.commit()
         else:
             return temp.fetchall()
 
+    @property
+    def table_list(self) -> List[str]:
+        return self.listQuery("select name from sqlite_master where type='table'")
+
     def __init__(self):
-        config = get_config()
-        self.cx = sqlite.connect(f"{config.data_dir}/crypto.db")
-        self.table_list = self.listQuery("select name from sqlite_master where type='table'")
+        self.cx = get_connection()
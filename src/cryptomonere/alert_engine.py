@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable
+
+from cryptomonere.alerts_json import AlertRules, RangeRule, VariabilityRule
+from cryptomonere.config import get_config
+from cryptomonere.SqlHandler import SqlHandler
+
+logger = logging.getLogger(__name__)
+
+# Currency name in alert_rules.json which applies a rule to every symbol
+ALL_CURRENCIES = "ALL"
+
+
+def timestamp(last_updated: str) -> float:
+    return datetime.fromisoformat(last_updated).timestamp()
+
+
+class RollingWindow:
+    """Minimum and maximum price over the last duration seconds, kept with monotonic deques so each new price costs O(1) amortized"""
+
+    def __init__(self, duration: float):
+        self.duration = duration
+        self.minimums = deque()  # (timestamp, price) with increasing prices
+        self.maximums = deque()  # (timestamp, price) with decreasing prices
+
+    def push(self, when: float, price: float):
+        while self.minimums and self.minimums[-1][1] >= price:
+            self.minimums.pop()
+        self.minimums.append((when, price))
+        while self.maximums and self.maximums[-1][1] <= price:
+            self.maximums.pop()
+        self.maximums.append((when, price))
+        cutoff = when - self.duration
+        while self.minimums[0][0] < cutoff:
+            self.minimums.popleft()
+        while self.maximums[0][0] < cutoff:
+            self.maximums.popleft()
+
+    @property
+    def change(self) -> float:
+        """Range of the window relative to its minimum, e.g. 0.5 if the price moved between 100 and 150"""
+        if not self.minimums or self.minimums[0][1] <= 0:
+            return 0.0
+        return (self.maximums[0][1] - self.minimums[0][1]) / self.minimums[0][1]
+
+    def to_state(self) -> dict:
+        return {"minimums": list(self.minimums), "maximums": list(self.maximums)}
+
+    @classmethod
+    def from_state(cls, duration: float, state: dict) -> "RollingWindow":
+        window = cls(duration)
+        window.minimums = deque(tuple(entry) for entry in state["minimums"])
+        window.maximums = deque(tuple(entry) for entry in state["maximums"])
+        return window
+
+
+class AlertEngine:
+    """Evaluates quotes against the alert rules, compiled into per symbol lookups.
+
+    Range rules fire while a price is outside [low, high]. Variability rules fire while the price range over the rule's duration,
+    relative to its minimum, is at least the rule's magnitude. There is one rolling window per (symbol, duration), shared by every
+    rule with that duration. A window starts from the stored quotes the first time it is needed, and window state is saved to
+    alert_state.json so later runs carry on from it instead of rebuilding it.
+    """
+
+    def __init__(self, rules: AlertRules, state_path: Path):
+        self.state_path = state_path
+        self.range_rules: dict[str, list[RangeRule]] = {}
+        self.variability_rules: dict[str, list[VariabilityRule]] = {}
+        for rule in rules.range_rules:
+            self.range_rules.setdefault(rule.currency.upper(), []).append(rule)
+        for rule in rules.variability_rules:
+            if rule.duration_parsed is None:
+                logger.warning(f'Ignoring variability rule for {rule.currency} with unsupported duration "{rule.duration}"')
+                continue
+            self.variability_rules.setdefault(rule.currency.upper(), []).append(rule)
+        self.durations = {rule.duration_parsed.total_seconds() for rules in self.variability_rules.values() for rule in rules}
+
+        self.windows: dict[tuple[str, float], RollingWindow] = {}
+        self.last_seen: dict[str, float] = {}
+        if state_path.exists():
+            with open(state_path) as R:
+                state = json.load(R)
+            self.last_seen = state["last_seen"]
+            for key, window_state in state["windows"].items():
+                symbol, duration = key.rsplit("|", 1)
+                if float(duration) in self.durations:
+                    self.windows[(symbol, float(duration))] = RollingWindow.from_state(float(duration), window_state)
+
+    def rules_for(self, rules: dict[str, list], symbol: str) -> list:
+        return rules.get(symbol.upper(), []) + rules.get(ALL_CURRENCIES, [])
+
+    def window(self, symbol: str, duration: float, last_updated: str) -> RollingWindow:
+        if (symbol, duration) not in self.windows:
+            # start a new window from the quotes already stored before this one, so it does not have to fill up from scratch
+            window = RollingWindow(duration)
+            since = datetime.fromtimestamp(timestamp(last_updated) - duration, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+            history = SqlHandler().sql(
+                "select last_updated, price from quote where symbol = ? and last_updated >= ? and last_updated < ? and price is not null order by last_updated",
+                params=(symbol, since, last_updated),
+            )
+            for stored_updated, stored_price in history:
+                window.push(timestamp(stored_updated), stored_price)
+            self.windows[(symbol, duration)] = window
+        return self.windows[(symbol, duration)]
+
+    def evaluate(self, quotes: Iterable[tuple[str, str, float, str]]) -> list[str]:
+        """Check (symbol, name, price, last_updated) quotes and return the alert lines. Quotes older than ones already seen only get range checks."""
+        lines = []
+        for symbol, name, price, last_updated in quotes:
+            if price is None:
+                continue
+            for rule in self.rules_for(self.range_rules, symbol):
+                if not rule.low <= price <= rule.high:
+                    lines.append(f"{symbol} {price} {name}")
+            variability_rules = self.rules_for(self.variability_rules, symbol)
+            if len(variability_rules) == 0:
+                continue
+            when = timestamp(last_updated)
+            is_new = when > self.last_seen.get(symbol, float("-inf"))
+            for duration in {rule.duration_parsed.total_seconds() for rule in variability_rules}:
+                window = self.window(symbol, duration, last_updated)
+                if is_new:
+                    window.push(when, price)
+            if is_new:
+                self.last_seen[symbol] = when
+            for rule in variability_rules:
+                change = self.window(symbol, rule.duration_parsed.total_seconds(), last_updated).change
+                if change >= rule.magnitude:
+                    lines.append(f"{symbol} {price} {name} (moved {change:.0%} within {rule.duration})")
+        return lines
+
+    def save(self):
+        state = {
+            "last_seen": self.last_seen,
+            "windows": {f"{symbol}|{duration}": window.to_state() for (symbol, duration), window in self.windows.items()},
+        }
+        temp = self.state_path.with_name(f"{self.state_path.name}.{os.getpid()}.tmp")
+        with open(temp, "w") as W:
+            json.dump(state, W)
+        temp.replace(self.state_path)
+
+
+_engine: tuple[float, AlertEngine] | None = None
+
+
+def get_engine() -> AlertEngine:
+    """The process' alert engine, rebuilt if alert_rules.json changed since it was loaded"""
+    global _engine
+    config = get_config()
+    rules_path = config.config_dir.joinpath("alert_rules.json")
+    modified = rules_path.stat().st_mtime
+    if _engine is None or _engine[0] != modified:
+        _engine = (modified, AlertEngine(AlertRules(rules_path), config.data_dir.joinpath("alert_state.json")))
+    return _engine[1]
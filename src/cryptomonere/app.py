@@ -4,13 +4,13 @@ import argparse
 import functools
 import json
 import logging
-import logging.config
+import os
+import pathlib
 import sys
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 
-# from . import coinmarketcap as ccap, sqlite as sql
-from cryptomonere import coinmarketcap as ccap, report
-from cryptomonere.alerts_json import AlertRules
+# Command modules are imported by the functions that use them, so starting a command only imports what it needs
+from cryptomonere import metrics, migrations
 from cryptomonere.config import get_config
 from cryptomonere.SqlHandler import SqlHandler
 
@@ -24,6 +24,41 @@ Log levels:
 """
 
 
+quote_base_columns = (
+    "id",
+    "name",
+    "symbol",
+    "timestamp",
+    "date_added",
+    "max_supply",
+    "circulating_supply",
+    "is_active",
+    "infinite_supply",
+    "minted_market_cap",
+    "cmc_rank",
+    "is_fiat",
+    "self_reported_circulating_supply",
+    "self_reported_market_cap",
+    "last_updated",
+)
+# Fields of a quote which live under quote["quote"]["USD"] rather than at the top level of the api response
+quote_usd_columns = (
+    "price",
+    "volume_24h",
+    "volume_change_24h",
+    "percent_change_1h",
+    "percent_change_24h",
+    "percent_change_7d",
+    "percent_change_30d",
+    "percent_change_60d",
+    "percent_change_90d",
+    "market_cap",
+    "market_cap_dominance",
+    "fully_diluted_market_cap",
+)
+quote_columns = quote_base_columns + quote_usd_columns
+
+
 def parse_args(args_raw):
     parser = argparse.ArgumentParser(description="Cryptocurrency Price Tracker")
     parser.add_argument(
@@ -32,6 +67,12 @@ def parse_args(args_raw):
         help="set log level. Options are ERROR, WARNING, INFO, and DEBUG",
         default="INFO",
     )
+    parser.add_argument("-P", "--profile", action="store_true", help="Print how long each phase of the command took, and the rows and bytes it handled")
+    parser.add_argument("--metrics-output", default=None, help="Write the phase timings and counters to this file (watch rewrites it after every tick)")
+    parser.add_argument(
+        "--metrics-format", choices=["json", "prometheus"], default="json", help="Format of --metrics-output: a JSON summary or Prometheus text"
+    )
+    parser.add_argument("--cprofile", default=None, help="Run the command under cProfile, save the stats to this file and print the slowest calls")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     parser_load = subparsers.add_parser(
@@ -43,27 +84,80 @@ def parse_args(args_raw):
         "symbol",
         help='Cryptocurrency ticker symbol (e.g. "BTC" for Bitcoin)',
     )
-    parser_load.add_argument("filename", help="Name of file")
+    parser_load.add_argument("filenames", nargs="+", help="Names of files, or glob patterns matching them")
+    parser_load.add_argument("-j", "--jobs", type=int, default=1, help="Number of processes used to parse the files")
+    parser_load.add_argument("-b", "--batch-size", type=int, default=None, help="Number of rows written per transaction")
     parser_get = subparsers.add_parser("get", help="Get latest quotes")
     parser_get.set_defaults(func=fetch_and_insert_latest_quotes)
     parser_get.add_argument("-N", "--no-upload", default=False)
     parser_get.add_argument("-n", "--no-update-alert", default=False)
 
+    parser_watch = subparsers.add_parser("watch", help="Keep running, getting the latest quotes (and checking alerts) on a fixed schedule")
+    parser_watch.set_defaults(func=watch_main)
+    parser_watch.add_argument("-i", "--interval", type=float, default=60, help="Seconds between quote fetches")
+    parser_watch.add_argument(
+        "-c", "--credit-budget", type=int, default=None, help="Maximum api credits to spend per UTC day (defaults to daily_credit_budget in config.json)"
+    )
+    parser_watch.add_argument("-n", "--no-update-alert", action="store_true", help="Do not check alerts after each fetch")
+    parser_watch.add_argument("-q", "--no-report", action="store_true", help="Do not print the latest quotes after each fetch")
+
     parser_map = subparsers.add_parser("map", help="Get mapping of CoinmarketCap Ids to All listed cryptocurrencies")
     parser_map.set_defaults(func=fetch_map_main)
     parser_map.add_argument("-N", "--no-upload", default=False)
 
     parser_search = subparsers.add_parser("search", help="Query Cryptocurrency Mappings")
     parser_search.set_defaults(func=query_map)
-    parser_search.add_argument("search_query")
+    parser_search.add_argument("search_query", help="Start of a symbol, name or slug. Every word is matched as a prefix")
+    parser_search.add_argument("-l", "--limit", type=int, default=50, help="Maximum number of results")
+    parser_search.add_argument("-o", "--offset", type=int, default=0, help="Number of results to skip")
+    parser_search.add_argument("-c", "--complete", action="store_true", help="Use the in-memory prefix tree (fast completion of a single prefix)")
+
+    parser_rebuild_latest = subparsers.add_parser("rebuild-latest", help="Rebuild the quote_latest table from the complete quote history")
+    parser_rebuild_latest.set_defaults(func=rebuild_latest)
 
-    parser_search = subparsers.add_parser("alert", help="Check alerts")
-    parser_search.set_defaults(func=alert)
+    parser_rebuild_index = subparsers.add_parser("rebuild-price-index", help="Rebuild the index of price ranges used by the last_at reports")
+    parser_rebuild_index.set_defaults(func=rebuild_price_index)
+
+    parser_dedup = subparsers.add_parser(
+        "dedup", help="Merge quotes a symbol has under a placeholder id into its coinmarketcap id, dropping duplicate snapshots"
+    )
+    parser_dedup.set_defaults(func=dedup_main)
+
+    parser_archive = subparsers.add_parser("archive", help="Move old quote and history rows to Parquet files and compact the database (needs polars)")
+    parser_archive.set_defaults(func=archive_main)
+    parser_archive.add_argument(
+        "-d", "--older-than", type=int, default=None, help="Archive rows older than this many days (defaults to archive_after_days in config.json)"
+    )
+    parser_archive.add_argument("--no-vacuum", action="store_true", help="Do not compact the database file afterwards")
+
+    parser_backfill = subparsers.add_parser("backfill", help="Find gaps in the stored quotes and fill them from coinmarketcap's historical quotes")
+    parser_backfill.set_defaults(func=backfill_main)
+    parser_backfill.add_argument("symbols", nargs="*", help="Symbols to backfill (defaults to the symbols in config.json)")
+    parser_backfill.add_argument(
+        "-i",
+        "--interval",
+        choices=["5m", "10m", "15m", "30m", "45m", "1h", "2h", "3h", "4h", "6h", "12h", "24h"],
+        default="5m",
+        help="How often quotes are expected (match how often get runs) and the interval of the fetched quotes",
+    )
+    parser_backfill.add_argument("-d", "--days", type=int, default=30, help="Look for gaps over this many days")
+    parser_backfill.add_argument("-s", "--since", type=date.fromisoformat, default=None, help="Look for gaps since this date instead (YYYY-MM-DD)")
+    parser_backfill.add_argument("--refetch", action="store_true", help="Also request windows an earlier backfill already fetched")
+    parser_backfill.add_argument("-n", "--dry-run", action="store_true", help="Only print the gaps and how many windows would be fetched")
+
+    parser_alert = subparsers.add_parser("alert", help="Check alerts")
+    parser_alert.set_defaults(func=alert)
+    subparsers_alert = parser_alert.add_subparsers(dest="alert_command")
+    parser_alert_backtest = subparsers_alert.add_parser("backtest", help="Report how often and when alert rules would have fired over the stored price history")
+    parser_alert_backtest.set_defaults(func=alert_backtest)
+    parser_alert_backtest.add_argument("-r", "--rules", default=None, help="Rules file to test (defaults to alert_rules.json in the config directory)")
+    parser_alert_backtest.add_argument("-j", "--jobs", type=int, default=None, help="Number of processes evaluating symbols (defaults to the number of cores)")
+    parser_alert_backtest.add_argument("-t", "--times", action="store_true", help="List every time each rule would have fired")
 
     parser_report = subparsers.add_parser("report", help="Generate (text) Reports")
     subparsers_report = parser_report.add_subparsers(dest="report_type", required=True)
     parser_report_quote_latest = subparsers_report.add_parser("latest", help="View latest quotes")
-    parser_report_quote_latest.set_defaults(func=report.quote_latest)
+    parser_report_quote_latest.set_defaults(func=report_latest)
 
     parser_report_last_at = subparsers_report.add_parser("last_at", help="View most recent date a given currency was at a given price")
     parser_report_last_at.set_defaults(func=report_last_at_wrapper)
@@ -73,13 +167,33 @@ def parse_args(args_raw):
     )
     parser_report_last_at.add_argument(
         "price",
-        help="The price you are are cheking for.",
+        type=float,
+        nargs="+",
+        help="The price you are are cheking for (or several prices).",
     )
 
     parser_report_double_half = subparsers_report.add_parser(
         "doubles_and_halves", help="View latest quotes - and last time they were at double/half their current price"
     )
-    parser_report_double_half.set_defaults(func=report.all_last_at)
+    parser_report_double_half.set_defaults(func=report_all_last_at)
+    parser_report_double_half.add_argument(
+        "--full-scan",
+        action="store_true",
+        help="Recompute every symbol from its full price history (needs numpy and polars) instead of using the price index",
+    )
+
+    parser_report_correlation = subparsers_report.add_parser(
+        "correlation", help="View the correlation of returns and the price ratios between every pair of symbols (needs numpy and polars)"
+    )
+    parser_report_correlation.set_defaults(func=report_correlation)
+    parser_report_correlation.add_argument("symbols", nargs="*", help="Symbols to include (defaults to every symbol with quotes or history)")
+    parser_report_correlation.add_argument("-H", "--hourly", action="store_true", help="Use hourly instead of daily returns (only covers tracked quotes)")
+    parser_report_correlation.add_argument("-m", "--min-periods", type=int, default=30, help="Returns two symbols need in common to be correlated")
+    parser_report_correlation.add_argument(
+        "-r", "--rolling", type=int, default=None, help="Also correlate every symbol with --against over this many trailing days (or hours)"
+    )
+    parser_report_correlation.add_argument("-a", "--against", default="BTC", help="Symbol the rolling correlations are against")
+    parser_report_correlation.add_argument("-o", "--output", default=None, help="Write the matrices as csv files to this directory instead of printing them")
 
     parser_graph = subparsers.add_parser("graph", help="Generate (graphical) Reports")
     subparsers_graph = parser_graph.add_subparsers(dest="Subcommand", required=True)
@@ -87,8 +201,21 @@ def parse_args(args_raw):
     parser_graph_price_history.set_defaults(func=graph_price_history_wrapper)
     parser_graph_price_history.add_argument(
         "symbol",
+        nargs="?",
         help='Cryptocurrency ticker symbol (e.g. "BTC" for Bitcoin; NOT case-sensitive)',
     )
+    parser_graph_price_history.add_argument("-a", "--all-symbols", action="store_true", help="Graph every symbol with quotes or history (needs --output)")
+    parser_graph_price_history.add_argument(
+        "-o", "--output", default=None, help="Save the graphs as SYMBOL.png (or .svg) in this directory instead of showing them"
+    )
+    parser_graph_price_history.add_argument("-f", "--format", choices=["png", "svg"], default="png", help="File format of saved graphs")
+    parser_graph_price_history.add_argument("-w", "--width", type=int, default=1200, help="Width of the graph in pixels, which the prices are downsampled to")
+    parser_graph_price_history.add_argument(
+        "-d", "--downsample", choices=["lttb", "minmax", "none"], default="lttb", help="How prices are reduced to the width of the graph (default lttb)"
+    )
+    parser_graph_price_history.add_argument(
+        "-j", "--jobs", type=int, default=None, help="Number of processes rendering saved graphs (defaults to the number of cores)"
+    )
     parser_graph_history_comparison = subparsers_graph.add_parser("comparison", help="Generate graph of comparing prices of two cryptocurrencies.")
     parser_graph_history_comparison.set_defaults(func=graph_price_comparison_wrapper)
     parser_graph_history_comparison.add_argument(
@@ -126,26 +253,13 @@ or manually install matplotlib and polars."""
 
 
 def load_historic(args: argparse.Namespace):
-    fname = args.filename
-    symbol = args.symbol
-    with open(fname) as R:
-        rawfile = R.readlines()
+    from cryptomonere import historic
 
-    inserts = []
-    for line in rawfile[1:]:
-        liney = line.strip().split(",")
-        liney_remainder = ",".join(liney[2:])
-        inserts.append(f'("{symbol}","{liney[0]}","{liney[1]}",{liney_remainder})')
-
-    SQL = SqlHandler()
-    SQL.bulk_insert(
-        """
-    Insert into historical
-    (Symbol, StartDate, EndDate, Open, High, Low, Close, Volume, Market_Cap)
-    Values
-    """,
-        inserts,
-    )
+    try:
+        historic.load(args.symbol, args.filenames, jobs=args.jobs, batch_size=args.batch_size)
+    except FileNotFoundError as e:
+        logger.error(e)
+        return 1
     logger.info("file uploaded successfully")
 
 
@@ -155,171 +269,222 @@ def fetch_map_main(args: argparse.Namespace):
 
 def fetch_map(no_upload=False):
     config = get_config()
-    # data = ccap.fetch_api_json(ccap.map_url, f"{config.data_dir}/map.json")
-    with open(config.data_dir.joinpath("map.json")) as readJson:
-        data = json.load(readJson)
     if no_upload:
         return 0
-    SQL = SqlHandler()
-    SQL.sql_file("recreate_cryptocurrency_map.sql")
-
-    inserts = []
-    for row in data["data"]:
-        platform_query = "NULL, NULL, NULL, NULL"
-        if row["platform"] is not None:
-            platform_query = f"{row['platform']['id']}, \"{row['platform']['name']}\", \"{row['platform']['symbol']}\", \"{row['platform']['slug']}\""
-        inserts.append(
-            f"""({row['id']}, {row['rank']}, \"{row['name'].strip("\"")}\", \"{row['symbol']}\", \"{row['slug']}\", {row['is_active']}, {row['status']}, \"{row['first_historical_data']}\", \"{row['last_historical_data']}\", {platform_query})""".replace(
-                "None", "NULL"
-            )
-        )
-    SQL.bulk_insert(
-        """
-insert into cryptocurrency_map (
-    id,
-    currency_rank,
-    name,
-    symbol,
-    slug,
-    is_active,
-    status,
-    first_historical_data,
-    last_historical_data,
-    platform_id,
-    platform_name,
-    platform_symbol,
-    platform_slug
-) VALUES """,
-        inserts,
-    )
-    SQL.sql_file("dedupe_currency_map.sql")
+    from cryptomonere import currency_map
+
+    with open(config.data_dir.joinpath("map.json")) as readJson:
+        currency_map.refresh(readJson)
 
 
 def query_map(args: argparse.Namespace):
-    SQL = SqlHandler()
+    from cryptomonere import search
+
+    if args.complete and args.offset + args.limit <= search.TRIE_TOP:
+        rows = search.load_trie().complete(args.search_query, limit=args.limit, offset=args.offset)
+    else:
+        rows = search.search(args.search_query, limit=args.limit, offset=args.offset)
     headers = ["Cap_Id", "Symbol", "Name", "slug", "rank"]
     print(f"{headers[0].ljust(6)} {headers[4].ljust(6)}  {headers[1].ljust(10)}{headers[2].ljust(30)};{headers[3].ljust(30)}")
-    SQL.sql(
-        f"""
-    Select Id, Symbol, Name, slug, currency_rank from currency
-    WHERE (symbol like \"%{args.search_query}%\")
-        OR (Name like \"%{args.search_query}%\")
-        OR (slug like \"%{args.search_query}%\")
-    """,
-        row_factory=lambda Cursor, Row: print(f"{str(Row[0]).ljust(6)} {str(Row[4]).ljust(6)}  {Row[1].ljust(10)}{Row[2].ljust(30)};{Row[3].ljust(30)}"),
-    )
+    for Row in rows:
+        print(f"{str(Row[0]).ljust(6)} {str(Row[4]).ljust(6)}  {str(Row[1]).ljust(10)}{str(Row[2]).ljust(30)};{str(Row[3]).ljust(30)}")
 
 
 def fetch_and_insert_latest_quotes(args: argparse.Namespace):
-    # Set parameters in decreasing order of specificity, from coinmarketcap_id, to slug, to symbol
+    from cryptomonere import coinmarketcap as ccap, report
+
     config = get_config()
     if len(config.symbols) == 0:
         logging.warn(
             "There is no list of cryptocurrency symbols in your config file, and thus nothing to query. Please update your config file if you want this command to work."
         )
         return 1
-    SQL = SqlHandler()
-    symbol_list = '","'.join(config.symbols)
-    id_list = SQL.listQuery(
-        f"""
-    Select Id from currency
-    where symbol in (\"{symbol_list}\")
-    """
-    )
-
-    parameters = {"id": ",".join([str(cmc_id) for cmc_id in id_list])}
     timestamp = datetime.now(timezone.utc).isoformat()
-    data = ccap.fetch_api_json(ccap.quotes_url, f"{config.data_dir}/quotes_latest.json", parameters=parameters)
+    try:
+        with metrics.span("fetch"):
+            data, ohlcv = fetch_latest(config)
+    except ccap.ApiError as e:
+        logger.error(e)
+        return 1
     if args.no_upload:
         return 0
-    insert_string = """
-    insert into quote
-    (id,
-     name,
-     symbol,
-     timestamp,
-     date_added,
-     max_supply,
-     circulating_supply,
-     is_active,
-     infinite_supply,
-     minted_market_cap,
-     cmc_rank,
-     is_fiat,
-     self_reported_circulating_supply,
-     self_reported_market_cap,
-     last_updated,
-     price,
-     volume_24h,
-     volume_change_24h,
-     percent_change_1h,
-     percent_change_24h,
-     percent_change_7d,
-     percent_change_30d,
-     percent_change_60d,
-     percent_change_90d,
-     market_cap,
-     market_cap_dominance,
-     fully_diluted_market_cap)
-    VALUES
+    with metrics.span("insert"):
+        # the bars go in first, so the crossings refreshed after the quotes are inserted already cover them
+        if ohlcv is not None:
+            insert_ohlcv(ohlcv)
+        rows = insert_quotes(data, timestamp)
+
+    if not args.no_update_alert:
+        with metrics.span("alert"):
+            alert(args, rows)
+
+    with metrics.span("report"):
+        report.quote_latest(args)
+
+
+def currency_ids(config) -> list[int]:
+    """coinmarketcap ids of the configured symbols"""
+    # Set parameters in decreasing order of specificity, from coinmarketcap_id, to slug, to symbol
+    placeholders = ", ".join("?" for _ in config.symbols)
+    return SqlHandler().listQuery(f"select Id from currency where symbol in ({placeholders})", config.symbols)
+
+
+def fetch_latest(config, id_list: list[int] | None = None) -> tuple[dict, dict | None]:
+    """Fetch the latest quotes, and the current daily OHLCV bars unless fetch_ohlcv is off, for every configured symbol (or id_list).
+
+    Both endpoints are requested at once in chunks of quote_chunk_size ids, with at most api_workers requests in flight and no more
+    than api_requests_per_minute. A chunk which fails is logged and skipped so the other quotes are still returned. Raises ApiError
+    only if every quotes chunk fails.
     """
+    from cryptomonere import coinmarketcap as ccap, fetcher
 
-    values_strings = []
-    for key in data["data"].keys():
-        a = data["data"][key]
-        values_strings.append(
-            f"""
-     ({a['id']},
-     \"{a['name']}\",
-     \"{a['symbol']}\",
-     \"{timestamp}\",
-     \"{a['date_added']}\",
-     {a['max_supply']},
-     {a['circulating_supply']},
-     {a['is_active']},
-     {a['infinite_supply']},
-     {a['minted_market_cap']},
-     {a['cmc_rank']},
-     {a['is_fiat']},
-     {a['self_reported_circulating_supply']},
-     {a['self_reported_market_cap']},
-     \"{a['last_updated']}\",
-     {a['quote']['USD']['price']},
-     {a['quote']['USD']['volume_24h']},
-     {a['quote']['USD']['volume_change_24h']},
-     {a['quote']['USD']['percent_change_1h']},
-     {a['quote']['USD']['percent_change_24h']},
-     {a['quote']['USD']['percent_change_7d']},
-     {a['quote']['USD']['percent_change_30d']},
-     {a['quote']['USD']['percent_change_60d']},
-     {a['quote']['USD']['percent_change_90d']},
-     {a['quote']['USD']['market_cap']},
-     {a['quote']['USD']['market_cap_dominance']},
-     {a['quote']['USD']['fully_diluted_market_cap']})\n""".replace(
-                "None", "NULL"
-            )
-        )
-    SQL.bulk_insert(insert_string, values_strings)
-    SQL.sql_file("quote_to_quote_latest.sql")
+    if id_list is None:
+        id_list = currency_ids(config)
+    data, ohlcv = fetcher.fetch_latest(id_list, config, ohlcv=config.fetch_ohlcv)
+    chunks = data["status"]["chunks"]
+    if chunks > 0 and data["status"]["failed_chunks"] == chunks:
+        raise ccap.ApiError(f"Fetching quotes failed for all {chunks} chunks")
 
-    if not args.no_update_alert:
-        alert(args)
+    metrics.count("quotes.fetched", len(data["data"]))
+    # written to a file of this process and moved into place, so overlapping runs never leave a mix of both responses
+    path = config.data_dir.joinpath("quotes_latest.json")
+    temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with metrics.span("fetch.save"):
+        with open(temp, "w") as OutFile:
+            json.dump(data, OutFile, indent=2)
+        temp.replace(path)
+    return data, ohlcv
 
-    report.quote_latest(args)
+
+def insert_quotes(data: dict, timestamp: str) -> list[dict]:
+    """Insert the quotes of an api response and return the inserted rows"""
+    from cryptomonere import crossings, rollup
+
+    rows = [quote_row(quote, timestamp) for quote in data["data"].values()]
+    with metrics.span("insert.quotes"):
+        SqlHandler().bulk_insert("quote", quote_columns, rows)
+    with metrics.span("insert.crossings"):
+        crossings.refresh()
+    with metrics.span("insert.prune"):
+        rollup.prune()
+    return rows
+
+
+def insert_ohlcv(data: dict) -> int:
+    """Upsert the current daily bars of an ohlcv/latest response into historical, so the day's bar is kept up to date. Returns the rows written."""
+    from cryptomonere import historic
+
+    rows = [historic.ohlcv_row(bar) for bar in data["data"].values() if bar.get("time_open") is not None]
+    with metrics.span("insert.ohlcv"):
+        return SqlHandler().bulk_insert("historical", historic.historical_columns, rows, on_conflict=historic.historical_upsert)
+
+
+def watch_main(args: argparse.Namespace):
+    from cryptomonere import watch  # lazy import, watch imports this module
+
+    watch.run(args)
+
+
+def quote_row(quote: dict, timestamp: str) -> dict:
+    row = {column: quote.get(column) for column in quote_base_columns}
+    row.update({column: quote["quote"]["USD"].get(column) for column in quote_usd_columns})
+    row["timestamp"] = timestamp
+    return row
+
+
+def rebuild_latest(args: argparse.Namespace):
+    SqlHandler().sql_file("quote_to_quote_latest.sql")
+    logger.info("quote_latest rebuilt")
+
+
+def dedup_main(args: argparse.Namespace):
+    from cryptomonere import dedup
+
+    dedup.dedup()
+
+
+def rebuild_price_index(args: argparse.Namespace):
+    from cryptomonere import price_index
+
+    price_index.rebuild()
 
 
-def alert(args: argparse.Namespace):
+def alert(args: argparse.Namespace, quotes: list[dict] | None = None):
+    """Check quotes (by default the latest quote of every symbol) against alert_rules.json and write the alerts file"""
+    from cryptomonere import alert_engine
+
     config = get_config()
-    ar = AlertRules(config.config_dir.joinpath("alert_rules.json"))
-    SQL = SqlHandler()
-    lines = SQL.sql(ar.range_rules_to_sql(), row_factory=lambda Cursor, Row: f"{Row[0]} {Row[2]} {Row[1]}")
+    if quotes is None:
+        quotes = SqlHandler().sql("select symbol, name, price, last_updated from quote_latest")
+    else:
+        quotes = [(quote["symbol"], quote["name"], quote["price"], quote["last_updated"]) for quote in quotes]
+    with metrics.span("alert.evaluate"):
+        engine = alert_engine.get_engine()
+        lines = engine.evaluate(quotes)
+    metrics.count("alerts.fired", len(lines))
+    with metrics.span("alert.save"):
+        engine.save()
     with open(config.config_dir.joinpath("alerts"), "w") as WRITE:
         WRITE.write("\n".join(lines))
 
 
+def archive_main(args: argparse.Namespace):
+    try:
+        from cryptomonere import archive
+    except ImportError:
+        logger.error("Archiving requires optional dependencies. Install with: pip install cryptomonere[analytics]")
+        return 1
+    archive.archive(args.older_than, vacuum=not args.no_vacuum)
+
+
+def backfill_main(args: argparse.Namespace):
+    from cryptomonere import backfill
+
+    symbols = [symbol.upper() for symbol in args.symbols] or get_config().symbols
+    since = datetime.combine(args.since, datetime.min.time(), timezone.utc) if args.since is not None else None
+    return backfill.backfill(symbols, args.interval, args.days, since, refetch=args.refetch, dry_run=args.dry_run)
+
+
+def alert_backtest(args: argparse.Namespace):
+    try:
+        from cryptomonere import backtest
+    except ImportError:
+        logger.error("Backtesting requires optional dependencies. Install with: pip install cryptomonere[analytics]")
+        return 1
+    rules_path = args.rules if args.rules is not None else get_config().config_dir.joinpath("alert_rules.json")
+    backtest.backtest(rules_path, jobs=args.jobs, show_times=args.times)
+
+
+def report_correlation(args: argparse.Namespace):
+    try:
+        from cryptomonere import correlation
+    except ImportError:
+        logger.error("The correlation report requires optional dependencies. Install with: pip install cryptomonere[analytics]")
+        return 1
+    symbols = [symbol.upper() for symbol in args.symbols] or None
+    output_dir = pathlib.Path(args.output) if args.output is not None else None
+    return correlation.report(symbols, args.hourly, args.min_periods, args.rolling, args.against.upper(), output_dir)
+
+
 @depends_graph
 def graph_price_history_wrapper(graph, args: argparse.Namespace):
-    graph.graph_price_history(args.symbol.upper())
+    method = None if args.downsample == "none" else args.downsample
+    if args.output is None:
+        if args.all_symbols or args.symbol is None:
+            logger.error("Give a symbol to show, or --output to save graphs of --all-symbols")
+            return 1
+        graph.graph_price_history(args.symbol.upper(), args.width, method)
+        return 0
+    if args.all_symbols:
+        from cryptomonere import archive
+
+        symbols = archive.symbols()
+    elif args.symbol is not None:
+        symbols = [args.symbol.upper()]
+    else:
+        logger.error("Give a symbol or --all-symbols to graph")
+        return 1
+    graph.render_all(symbols, pathlib.Path(args.output), args.format, args.width, method, args.jobs)
 
 
 @depends_graph
@@ -327,18 +492,30 @@ def graph_price_comparison_wrapper(graph, args: argparse.Namespace):
     graph.graph_price_comparison(args.symbol.upper(), args.symbol2.upper())
 
 
+def report_latest(args: argparse.Namespace):
+    from cryptomonere import report
+
+    report.quote_latest(args)
+
+
 def report_last_at_wrapper(args: argparse.Namespace):
-    report.last_at(args.symbol, args.price)
+    from cryptomonere import report
+
+    report.last_at(args.symbol.upper(), *args.price)
+
+
+def report_all_last_at(args: argparse.Namespace):
+    from cryptomonere import report
+
+    report.all_last_at(args)
 
 
 def init_db():
     SQL = SqlHandler()
-    if len(SQL.table_list) == 0:
-        logger.warning("Database is empty and has no schema. Creating tables...")
-        SQL.cx.executescript(SQL.create_tables)
-        SQL.table_list = SQL.listQuery("select name from sqlite_master where type='table'")
-    if "currency" not in SQL.table_list:
-        logger.info("currency table (table listing all supported cryptocurrencies) does not exist. Creating it... (this may take a minute)")
+    migrations.migrate(SQL.cx)
+    # only whether the table has any row, counting it would read all of it on every command
+    if not SQL.listQuery("select exists (select 1 from currency)")[0]:
+        logger.info("currency table (table listing all supported cryptocurrencies) is empty. Filling it... (this may take a minute)")
         fetch_map()  # Calling "monere map"
 
 
@@ -346,8 +523,39 @@ def main(args_raw):
     # logging.config.dictConfig(config=logging_config)
     args = parse_args(args_raw)
     logging.basicConfig(level=args.log_level)
-    init_db()
-    args.func(args)
+    if args.profile or args.metrics_output is not None:
+        metrics.enable()
+    with metrics.span("init_db"):
+        init_db()
+    if args.cprofile is not None:
+        run_profiled(args)
+    else:
+        with metrics.span(args.command):
+            args.func(args)
+    if metrics.enabled():
+        write_metrics(args)
+
+
+def run_profiled(args: argparse.Namespace):
+    """Run the command under cProfile, saving the stats to args.cprofile and printing the calls with the most cumulative time"""
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        with metrics.span(args.command):
+            profiler.runcall(args.func, args)
+    finally:
+        profiler.dump_stats(args.cprofile)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(20)
+        logger.info(f"cProfile stats saved to {args.cprofile}, view them with: python -m pstats {args.cprofile}")
+
+
+def write_metrics(args: argparse.Namespace):
+    if args.metrics_output is not None:
+        metrics.active.write(pathlib.Path(args.metrics_output), args.metrics_format)
+    if args.profile:
+        metrics.active.print_summary()
 
 
 def run():
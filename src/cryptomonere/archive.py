@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import quote as url_quote, unquote
+
+import polars as pl
+
+from cryptomonere.config import get_config
+from cryptomonere.SqlHandler import SqlHandler
+
+logger = logging.getLogger(__name__)
+
+# Tables that can be archived, with their symbol and time columns. Archived rows are kept in
+# archive_dir/TABLE/SYMBOL_COLUMN=SYMBOL/month=YYYY-MM/data.parquet, without the symbol column (it is in the path).
+archived_tables = {
+    "quote": ("symbol", "last_updated"),
+    "historical": ("Symbol", "EndDate"),
+}
+# quote is a view, its rows are deleted from the table behind it directly rather than one at a time through its delete trigger
+archived_deletes = {
+    "quote": "delete from quote_fact where id in (select id from asset where symbol = ?) and last_updated < ?",
+}
+
+
+def table_schema(table: str) -> dict:
+    """polars types for the columns of a table, from their declared sqlite types"""
+    schema = {}
+    for _, name, declared, *_ in SqlHandler().sql(f"pragma table_info({table})"):
+        declared = declared.lower()
+        if "int" in declared and "big" not in declared:
+            schema[name] = pl.Int64
+        elif any(numeric in declared for numeric in ("real", "numeric", "float", "double", "bigint")):
+            schema[name] = pl.Float64
+        else:
+            schema[name] = pl.String
+    return schema
+
+
+def partition_files(table: str) -> list[Path]:
+    return sorted(get_config().archive_dir.joinpath(table).glob("*/month=*/data.parquet"))
+
+
+def symbols() -> list[str]:
+    """Every symbol with quotes or history, in the database or the archive"""
+    found = set(SqlHandler().listQuery("select symbol from quote_latest union select distinct symbol from historical"))
+    for table, (symbol_column, _) in archived_tables.items():
+        found.update(unquote(path.name.removeprefix(f"{symbol_column}=")) for path in get_config().archive_dir.joinpath(table).glob(f"{symbol_column}=*"))
+    return sorted(found)
+
+
+def write_partition(path: Path, rows: pl.DataFrame, time_column: str):
+    """Add rows to a partition file, merging with the rows already in it so archiving the same rows twice does not duplicate them"""
+    if path.exists():
+        rows = pl.concat([pl.read_parquet(path), rows], how="vertical_relaxed").unique(maintain_order=True)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    rows.sort(time_column).write_parquet(temp)
+    temp.replace(path)
+
+
+def archive_table(table: str, cutoff: str) -> int:
+    """Move the rows of table from before cutoff into the archive, one symbol at a time. Returns the number of rows moved."""
+    symbol_column, time_column = archived_tables[table]
+    SQL = SqlHandler()
+    schema = table_schema(table)
+    root = get_config().archive_dir.joinpath(table)
+    moved = 0
+    for symbol in SQL.listQuery(f"select distinct {symbol_column} from {table} where {time_column} < ?", (cutoff,)):
+        rows = SQL.sql_df(f"select * from {table} where {symbol_column} = ? and {time_column} < ?", [symbol, cutoff], schema)
+        rows = rows.with_columns(pl.col(time_column).str.slice(0, 7).alias("month"))
+        for (month,), partition in rows.partition_by("month", as_dict=True).items():
+            path = root.joinpath(f"{symbol_column}={url_quote(symbol, safe='')}", f"month={month}", "data.parquet")
+            write_partition(path, partition.drop(symbol_column, "month"), time_column)
+        with SQL.transaction():
+            # archived history stays in the price_interval index, so its delete trigger is dropped while the rows are removed
+            trigger = SQL.cx.execute("select sql from sqlite_master where type = 'trigger' and name = 'price_interval_historical_delete'").fetchone()
+            if table == "historical" and trigger is not None:
+                SQL.cx.execute("drop trigger price_interval_historical_delete")
+            SQL.cx.execute(archived_deletes.get(table, f"delete from {table} where {symbol_column} = ? and {time_column} < ?"), (symbol, cutoff))
+            if table == "historical" and trigger is not None:
+                SQL.cx.execute(trigger[0])
+        moved += rows.height
+        logger.debug(f"Archived {rows.height} {table} rows of {symbol}")
+    return moved
+
+
+def archive(days: int | None = None, vacuum: bool = True) -> int:
+    """Move quote and historical rows older than days (archive_after_days by default) to Parquet, then compact the database"""
+    days = get_config().archive_after_days if days is None else days
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+    moved = sum(archive_table(table, cutoff) for table in archived_tables)
+    logger.info(f"Archived {moved} rows from before {cutoff} to {get_config().archive_dir}")
+    if moved and vacuum:
+        SqlHandler().cx.execute("vacuum")
+        logger.info("Database compacted")
+    return moved
+
+
+def scan(table: str, symbols: list[str] | None = None, columns: list[str] | None = None, start: str | None = None, end: str | None = None) -> pl.LazyFrame:
+    """Rows of table from both the database and the archive, as one lazy frame.
+
+    Only the given symbols, columns and time range (inclusive) are read. The database part is filtered in sql, and the filters
+    on the archive are pushed down to the Parquet scan, so only the matching symbol/month partitions and row groups are read.
+    Rows in both, e.g. history loaded again after it was archived, are read from the database only.
+    """
+    symbol_column, time_column = archived_tables[table]
+    schema = table_schema(table)
+    names = {name.lower(): name for name in schema}
+    columns = [names[column.lower()] for column in columns] if columns else list(schema)
+    keys = [symbol_column, time_column]
+    where, params = [], []
+    if symbols is not None:
+        where.append(f"{symbol_column} in ({', '.join('?' for _ in symbols)})")
+        params += symbols
+    if start is not None:
+        where.append(f"{time_column} >= ?")
+        params.append(start)
+    if end is not None:
+        where.append(f"{time_column} <= ?")
+        params.append(end)
+    read = columns + [key for key in keys if key not in columns]
+    query = f"select {', '.join(read)} from {table}" + (f" where {' and '.join(where)}" if where else "")
+    hot = SqlHandler().sql_df(query, params, {column: schema[column] for column in read}).lazy()
+    if len(partition_files(table)) == 0:
+        return hot.select(columns)
+
+    cold = pl.scan_parquet(
+        get_config().archive_dir.joinpath(table, "**", "data.parquet"),
+        hive_partitioning=True,
+        hive_schema={symbol_column: pl.String, "month": pl.String},
+    )
+    if symbols is not None:
+        cold = cold.filter(pl.col(symbol_column).is_in(symbols))
+    if start is not None:
+        cold = cold.filter((pl.col("month") >= start[:7]) & (pl.col(time_column) >= start))
+    if end is not None:
+        cold = cold.filter((pl.col("month") <= end[:7]) & (pl.col(time_column) <= end))
+    cold = cold.join(hot.select(keys), on=keys, how="anti")
+    return pl.concat([cold.select(columns), hot.select(columns)], how="vertical_relaxed")
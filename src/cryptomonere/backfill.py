@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from cryptomonere import coinmarketcap as ccap, crossings, metrics, rollup
+from cryptomonere.app import quote_columns
+from cryptomonere.client import ApiError
+from cryptomonere.config import get_config
+from cryptomonere.fetcher import Fetcher
+from cryptomonere.SqlHandler import SqlHandler
+
+logger = logging.getLogger(__name__)
+
+# Minutes between the points of each quotes/historical interval
+intervals = {"5m": 5, "10m": 10, "15m": 15, "30m": 30, "45m": 45, "1h": 60, "2h": 120, "3h": 180, "4h": 240, "6h": 360, "12h": 720, "24h": 1440}
+# Points of one currency a request asks for at most (coinmarketcap returns up to 10000). A gap is fetched in windows of this many
+# points, aligned to the epoch so that currencies missing the same hours share windows, and so requests.
+POINTS_PER_REQUEST = 10000
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.000Z"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Each currency's last quote before the backfilled range, its first quote in the range and its last quote
+bounds_query = """
+select
+    a.symbol,
+    a.id,
+    (select max(last_updated) from quote_fact f where f.id = a.id and f.last_updated < :since) as before,
+    (select min(last_updated) from quote_fact f where f.id = a.id and f.last_updated >= :since) as first,
+    (select max(last_updated) from quote_fact f where f.id = a.id) as last
+from asset a
+where a.id > 0 and a.symbol in ({symbols})
+"""
+# Consecutive quotes in the backfilled range that are further apart than :gap minutes
+gaps_query = """
+select a.symbol, q.id, q.prev_updated, q.last_updated
+from (
+    select id, last_updated, lag(last_updated) over (partition by id order by last_updated) as prev_updated
+    from quote_fact
+    where id in (select id from asset where id > 0 and symbol in ({symbols})) and last_updated >= :since
+) q
+inner join asset a on a.id = q.id
+where q.prev_updated is not null and (julianday(q.last_updated) - julianday(q.prev_updated)) * 1440 > :gap
+"""
+# Asset fields a backfilled quote carries, so inserting it through the quote view leaves the asset row as it is
+asset_columns = ("id", "symbol", "name", "date_added", "max_supply", "infinite_supply", "is_fiat")
+
+
+def parse_time(text: str) -> datetime:
+    time = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    return time if time.tzinfo is not None else time.replace(tzinfo=timezone.utc)
+
+
+def format_time(time: datetime) -> str:
+    return time.astimezone(timezone.utc).strftime(TIME_FORMAT)
+
+
+def floor_time(time: datetime, step: timedelta) -> datetime:
+    return EPOCH + (time - EPOCH) // step * step
+
+
+def gap_minutes(interval: str) -> int:
+    """Quotes further apart than this are missing at least one point of interval"""
+    return 2 * intervals[interval]
+
+
+def find_gaps(symbols: list[str], since: datetime, until: datetime, interval: str) -> list[tuple]:
+    """(symbol, id, previous quote, next quote) of every stretch between since and until where a currency is missing at least one
+    point of interval.
+
+    A currency's series starts at its last quote before since, or at its first quote if it has none (it was not tracked yet), and
+    runs to until, so a gap is also found between its last quote and until. Only the part of a stretch between since and until
+    counts towards its length.
+    """
+    params = {"since": format_time(since), "gap": gap_minutes(interval)}
+    placeholders = ", ".join(f":symbol{i}" for i in range(len(symbols)))
+    params.update({f"symbol{i}": symbol for i, symbol in enumerate(symbols)})
+    SQL = SqlHandler()
+    gaps = [
+        (symbol, cmc_id, parse_time(prev), parse_time(last)) for symbol, cmc_id, prev, last in SQL.sql(gaps_query.format(symbols=placeholders), params=params)
+    ]
+    for symbol, cmc_id, before, first, last in SQL.sql(bounds_query.format(symbols=placeholders), params=params):
+        if last is None:
+            continue
+        if before is not None:
+            gaps.append((symbol, cmc_id, parse_time(before), parse_time(first) if first is not None else until))
+        if first is not None:
+            gaps.append((symbol, cmc_id, parse_time(last), until))
+    # a stretch reaching outside the range is measured on its part inside it, the part windows() requests
+    return sorted(gap for gap in gaps if min(gap[3], until) - max(gap[2], since) > timedelta(minutes=gap_minutes(interval)))
+
+
+def windows(prev: datetime, following: datetime, since: datetime, until: datetime, interval: str):
+    """(start, end) of the request windows covering the part of a gap between since and until"""
+    step = timedelta(minutes=intervals[interval])
+    length = POINTS_PER_REQUEST * step
+    start = floor_time(max(prev, since), step)
+    end = min(floor_time(min(following, until), step) + step, until)
+    while start < end:
+        window_end = min(floor_time(start, length) + length, end)
+        yield format_time(start), format_time(window_end)
+        start = window_end
+
+
+def fetched_windows(interval: str) -> dict[int, list[tuple[str, str]]]:
+    fetched = {}
+    for cmc_id, start, end in SqlHandler().sql("select id, time_start, time_end from backfill_window where interval = ?", params=(interval,)):
+        fetched.setdefault(cmc_id, []).append((start, end))
+    return fetched
+
+
+def plan(gaps: list[tuple], since: datetime, until: datetime, interval: str, refetch: bool = False) -> dict[tuple[str, str], list[tuple]]:
+    """The gaps to request for each window, leaving out windows already fetched for a currency unless refetch is set"""
+    fetched = {} if refetch else fetched_windows(interval)
+    requests = {}
+    for symbol, cmc_id, prev, following in gaps:
+        for start, end in windows(prev, following, since, until, interval):
+            if any(done_start <= start and end <= done_end for done_start, done_end in fetched.get(cmc_id, [])):
+                continue
+            requests.setdefault((start, end), []).append((symbol, cmc_id, prev, following))
+    return requests
+
+
+def historical_entries(response: dict) -> dict[int, dict]:
+    """quotes/historical data keyed by id. A request for a single id may return its entry instead of a dict of entries."""
+    data = response["data"]
+    if "quotes" in data:
+        data = {data["id"]: data}
+    return {int(cmc_id): entry for cmc_id, entry in data.items()}
+
+
+def quote_rows(entry: dict, asset: dict, prev: datetime, following: datetime, timestamp: str):
+    """Rows for the quote view from the points of a quotes/historical entry which fall inside the gap"""
+    for point in entry.get("quotes", []):
+        last_updated = parse_time(point["timestamp"])
+        if not prev < last_updated < following:
+            continue
+        usd = point["quote"]["USD"]
+        row = dict.fromkeys(quote_columns)
+        row.update(asset)
+        row.update(
+            timestamp=timestamp,
+            last_updated=format_time(last_updated),
+            is_active=entry.get("is_active"),
+            price=usd.get("price"),
+            volume_24h=usd.get("volume_24h"),
+            market_cap=usd.get("market_cap"),
+            circulating_supply=usd.get("circulating_supply"),
+        )
+        yield row
+
+
+def save(start: str, end: str, interval: str, gaps: list[tuple], response: dict, assets: dict[int, dict]) -> int:
+    """Insert the quotes of one response and record its window as fetched for each of its currencies, in one transaction"""
+    entries = historical_entries(response)
+    timestamp = datetime.now(timezone.utc).isoformat()
+    SQL = SqlHandler()
+    inserted = 0
+    with SQL.transaction():
+        for _, cmc_id, prev, following in gaps:
+            rows = list(quote_rows(entries.get(cmc_id, {}), assets[cmc_id], prev, following, timestamp))
+            inserted += SQL.bulk_insert("quote", quote_columns, rows)
+            SQL.cx.execute(
+                "insert or replace into backfill_window (id, interval, time_start, time_end, quotes, fetched_at) values (?, ?, ?, ?, ?, ?)",
+                (cmc_id, interval, start, end, len(rows), timestamp),
+            )
+    return inserted
+
+
+async def fetch_window(fetcher: Fetcher, start: str, end: str, interval: str, gaps: list[tuple]) -> tuple:
+    params = {"id": ",".join(str(cmc_id) for cmc_id in sorted({gap[1] for gap in gaps})), "time_start": start, "time_end": end, "interval": interval}
+    try:
+        return start, end, gaps, await fetcher.get_json(ccap.historical_quotes_path, params)
+    except ApiError as e:
+        logger.error(f"Fetching quotes from {start} to {end} for {len(gaps)} gaps starting with {gaps[0][0]} failed: {e}")
+        return start, end, gaps, None
+
+
+async def fetch_all(requests: dict[tuple[str, str], list[tuple]], interval: str, assets: dict[int, dict]) -> tuple[int, set[str], int]:
+    """Fetch every window concurrently and save each response as it arrives. Returns the quotes inserted, the symbols they were
+    for and the number of failed requests."""
+    config = get_config()
+    fetcher = Fetcher(ccap.get_client(), config.api_workers, config.api_requests_per_minute)
+    step = timedelta(minutes=intervals[interval])
+    tasks = []
+    for (start, end), gaps in requests.items():
+        points = max(1, (parse_time(end) - parse_time(start)) // step)
+        # A request returns points for each of its currencies, so long windows are requested for fewer currencies at once
+        per_request = max(1, min(config.quote_chunk_size, POINTS_PER_REQUEST // points))
+        gaps = iter(gaps)
+        while chunk := list(islice(gaps, per_request)):
+            tasks.append(fetch_window(fetcher, start, end, interval, chunk))
+    inserted, symbols, failed = 0, set(), 0
+    for task in asyncio.as_completed(tasks):
+        start, end, gaps, response = await task
+        if response is None:
+            failed += 1
+            continue
+        with metrics.span("backfill.save"):
+            rows = save(start, end, interval, gaps, response, assets)
+        if rows:
+            inserted += rows
+            symbols.update(gap[0] for gap in gaps)
+    metrics.count("backfill.requests", len(tasks))
+    metrics.count("backfill.quotes", inserted)
+    return inserted, symbols, failed
+
+
+def backfill(symbols: list[str], interval: str = "5m", days: int = 30, since: datetime | None = None, refetch: bool = False, dry_run: bool = False) -> int:
+    """Find and fill the gaps in the quotes of symbols over the last days (or since since) from quotes/historical.
+
+    Returns 1 if any request failed, so they are retried by running the backfill again.
+    """
+    until = datetime.now(timezone.utc)
+    if since is None:
+        since = until - timedelta(days=days)
+    cutoff = rollup.retention_cutoff()
+    if cutoff is not None and since < parse_time(cutoff):
+        # older quotes are pruned down to their rollups, so backfilling them would only fetch quotes to delete again
+        logger.info(f"Backfilling from {cutoff}, the quote_retention_days cutoff, rather than {format_time(since)}")
+        since = parse_time(cutoff)
+    with metrics.span("backfill.gaps"):
+        gaps = find_gaps(symbols, since, until, interval)
+        requests = plan(gaps, since, until, interval, refetch)
+    if dry_run:
+        for symbol, _, prev, following in gaps:
+            start, end = max(prev, since), min(following, until)
+            print(f"{symbol:10s} {format_time(start)} {format_time(end)} {(end - start) / timedelta(minutes=1):10.0f} min")
+        print(f"{len(gaps)} gaps, {len(requests)} windows to fetch")
+        return 0
+    if not requests:
+        logger.info(f"No gaps longer than {gap_minutes(interval)} minutes to fill")
+        return 0
+
+    ids = sorted({gap[1] for window in requests.values() for gap in window})
+    assets = {
+        row[0]: dict(zip(asset_columns, row))
+        for row in SqlHandler().sql(f"select {', '.join(asset_columns)} from asset where id in ({', '.join('?' for _ in ids)})", params=ids)
+    }
+    try:
+        with metrics.span("backfill.fetch"):
+            inserted, filled, failed = asyncio.run(fetch_all(requests, interval, assets))
+    except KeyboardInterrupt:
+        # every window saved so far is committed and recorded in backfill_window
+        logger.warning("Interrupted, run backfill again to resume")
+        return 130
+    for symbol in filled:
+        crossings.forget(symbol)
+    crossings.refresh()
+    logger.info(f"Backfilled {inserted} quotes of {len(filled)} symbols from {len(gaps)} gaps")
+    if failed:
+        logger.error(f"{failed} requests failed, run backfill again to retry them")
+        return 1
+    return 0
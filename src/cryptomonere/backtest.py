@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from cryptomonere import archive
+from cryptomonere.alert_engine import ALL_CURRENCIES
+from cryptomonere.alerts_json import AlertRules
+from cryptomonere.rollup import to_datetime
+from cryptomonere.SqlHandler import SqlHandler
+
+logger = logging.getLogger(__name__)
+
+# Each source only covers the time before the next finer one that has any rows starts: daily history, then hourly rollups (of
+# quotes deleted by quote_retention_days), then the raw quotes
+hourly_series_query = "select bucket as time, low, high from quote_hourly where symbol = ? and bucket < ? order by bucket"
+
+
+def load_series(symbol: str):
+    """Price series of a symbol as a polars DataFrame of (time, low, high): daily history rows, hourly rollups, then quotes (where low = high = price)"""
+    SQL = SqlHandler()
+    quotes = archive.scan("quote", [symbol], ["last_updated", "price"]).filter(pl.col("price").is_not_null()).sort("last_updated").collect()
+    first_quote = quotes["last_updated"][0] if quotes.height else None
+    hourly = SQL.sql_df(hourly_series_query, [symbol, (first_quote or "9999")[:13]])
+    first_hour = SQL.sql("select min(bucket) from quote_hourly where symbol = ?", params=(symbol,))[0][0]
+    # ISO 8601 prefixes sort before the times they start, so this is the earlier of the two
+    history_end = min((start for start in (first_hour, first_quote) if start is not None), default="9999")
+    history = (
+        archive.scan("historical", [symbol], ["EndDate", "Low", "High"])
+        .filter(pl.col("Low").is_not_null() & pl.col("High").is_not_null() & (pl.col("EndDate") < history_end))
+        .sort("EndDate")
+        .collect()
+    )
+    series = pl.concat(
+        [
+            history.select(
+                to_datetime("EndDate", 10).alias("time"),
+                pl.col("Low").cast(pl.Float64).alias("low"),
+                pl.col("High").cast(pl.Float64).alias("high"),
+            ),
+            hourly.select(
+                to_datetime("time", 13),
+                pl.col("low").cast(pl.Float64),
+                pl.col("high").cast(pl.Float64),
+            ),
+            quotes.select(
+                to_datetime("last_updated", 19).alias("time"),
+                pl.col("price").cast(pl.Float64).alias("low"),
+                pl.col("price").cast(pl.Float64).alias("high"),
+            ),
+        ]
+    )
+    # the rolling windows need increasing times. Where two sources still meet at the same time, e.g. a day of history ending on
+    # the first hour, the finer one is kept.
+    return series.sort("time", maintain_order=True).unique(subset="time", keep="last", maintain_order=True)
+
+
+def firings(mask, times) -> tuple[int, list[str]]:
+    """Number of points where mask is set, and the times at which it became set (i.e. when an alert would have gone off)"""
+    starts = np.flatnonzero(mask[1:] & ~mask[:-1]) + 1
+    if mask[:1].any():
+        starts = np.concatenate(([0], starts))
+    return int(np.count_nonzero(mask)), list(np.datetime_as_string(times[starts], unit="s"))
+
+
+def backtest_symbol(
+    symbol: str, range_rules: list[tuple[int, float, float]], variability_rules: list[tuple[int, float, float]]
+) -> tuple[str, int, list[tuple]]:
+    """Evaluate (index, low, high) range rules and (index, seconds, magnitude) variability rules over a symbol's whole price series.
+
+    Returns (symbol, number of points, [(kind, index, points fired, [start times])]) for the rules that fired.
+    """
+    series = load_series(symbol)
+    times = series["time"].to_numpy()
+    lows = series["low"].to_numpy()
+    highs = series["high"].to_numpy()
+    results = []
+    for index, low, high in range_rules:
+        points, starts = firings((lows < low) | (highs > high), times)
+        if points:
+            results.append(("range", index, points, starts))
+
+    # one rolling min/max per duration, shared by every rule with that duration
+    for seconds in sorted({seconds for _, seconds, _ in variability_rules}):
+        window = f"{int(seconds)}s"
+        extremes = series.select(
+            pl.col("low").rolling_min_by("time", window_size=window, closed="both").alias("minimum"),
+            pl.col("high").rolling_max_by("time", window_size=window, closed="both").alias("maximum"),
+        )
+        minimums = extremes["minimum"].to_numpy()
+        maximums = extremes["maximum"].to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = np.where(minimums > 0, (maximums - minimums) / minimums, 0.0)
+        for index, rule_seconds, magnitude in variability_rules:
+            if rule_seconds != seconds:
+                continue
+            points, starts = firings(change >= magnitude, times)
+            if points:
+                results.append(("variability", index, points, starts))
+    return symbol, len(series), results
+
+
+def symbols_for(rules: AlertRules) -> list[str]:
+    named = {rule.currency.upper() for rule in [*rules.range_rules, *rules.variability_rules]}
+    if ALL_CURRENCIES in named:
+        return archive.symbols()
+    return sorted(named)
+
+
+def describe(rules: AlertRules, kind: str, index: int) -> str:
+    if kind == "range":
+        rule = rules.range_rules[index]
+        return f"{rule.currency} outside {rule.low} - {rule.high}"
+    rule = rules.variability_rules[index]
+    return f"{rule.currency} moved {rule.magnitude:.0%} within {rule.duration}"
+
+
+def backtest(rules_path: Path, jobs: int | None = None, show_times: bool = False):
+    """Report how often (and when) the rules in rules_path would have fired over the stored quote and historical prices"""
+    started = time.perf_counter()
+    rules = AlertRules(rules_path)
+    variability = [(index, rule) for index, rule in enumerate(rules.variability_rules) if rule.duration_parsed is not None]
+    for rule in rules.variability_rules:
+        if rule.duration_parsed is None:
+            logger.warning(f'Ignoring variability rule for {rule.currency} with unsupported duration "{rule.duration}"')
+
+    tasks = []
+    for symbol in symbols_for(rules):
+        range_rules = [(index, rule.low, rule.high) for index, rule in enumerate(rules.range_rules) if rule.currency.upper() in (symbol, ALL_CURRENCIES)]
+        variability_rules = [
+            (index, rule.duration_parsed.total_seconds(), rule.magnitude) for index, rule in variability if rule.currency.upper() in (symbol, ALL_CURRENCIES)
+        ]
+        tasks.append((symbol, range_rules, variability_rules))
+
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks))
+    if jobs > 1:
+        # spawned rather than forked workers, so they neither share the sqlite connection nor inherit polars' thread pool
+        with ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(backtest_symbol, *zip(*tasks)))
+    else:
+        results = [backtest_symbol(*task) for task in tasks]
+
+    total_points = 0
+    print(f"{'Rule'.ljust(40)} {'Symbol'.ljust(8)} {'Alerts'.rjust(8)} {'Points'.rjust(10)}  First               Last")
+    for symbol, points, fired in sorted(results):
+        total_points += points
+        for kind, index, fired_points, starts in fired:
+            print(
+                f"{describe(rules, kind, index).ljust(40)} {symbol.ljust(8)} {str(len(starts)).rjust(8)} {str(fired_points).rjust(10)}  {starts[0]} {starts[-1]}"
+            )
+            if show_times:
+                for start in starts:
+                    print(f"    {start}")
+    rule_count = len(rules.range_rules) + len(variability)
+    logger.info(
+        f"Backtested {rule_count} rules over {total_points} prices of {len(results)} symbols in {time.perf_counter() - started:.2f}s using {jobs} process(es)"
+    )
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout, TooManyRedirects
+
+from cryptomonere import metrics
+
+logger = logging.getLogger(__name__)
+
+# coinmarketcap error codes for exhausted daily/monthly credit limits. Retrying those cannot succeed until the limit resets.
+EXHAUSTED_ERROR_CODES = {1009, 1010}
+
+
+class ApiError(Exception):
+    pass
+
+
+class ApiClient:
+    """JSON http client with a pooled session, timeouts, retries with exponential backoff and an optional on-disk TTL cache.
+
+    Retries happen on connection errors, timeouts, 429 and 5xx responses. A Retry-After or X-RateLimit-Reset header on the response
+    is honored instead of the computed backoff. Cached responses are keyed by url and parameters, and are only used for calls which
+    pass a ttl (or when the client has a default cache_ttl).
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        headers: dict | None = None,
+        timeout: float = 30,
+        retries: int = 4,
+        backoff: float = 1.0,
+        max_backoff: float = 60,
+        pool_size: int = 10,
+        cache_dir: Path | None = None,
+        cache_ttl: float = 0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        self.cache_pruned = False
+        self.session = Session()
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, path: str) -> str:
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def cache_path(self, url: str, params: dict) -> Path:
+        key = hashlib.sha1(json.dumps([url, sorted((str(k), str(v)) for k, v in params.items())]).encode()).hexdigest()
+        return self.cache_dir.joinpath(f"{key}.json")
+
+    def cache_get(self, url: str, params: dict, ttl: float) -> dict | None:
+        if self.cache_dir is None or ttl <= 0:
+            return None
+        path = self.cache_path(url, params)
+        try:
+            if time.time() - path.stat().st_mtime > ttl:
+                return None
+            with open(path) as R:
+                return json.load(R)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def cache_put(self, url: str, params: dict, data: dict, ttl: float):
+        if self.cache_dir is None or ttl <= 0:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if not self.cache_pruned:
+            self.prune_cache(max(ttl, self.cache_ttl))
+        path = self.cache_path(url, params)
+        temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(temp, "w") as W:
+            json.dump(data, W)
+        temp.replace(path)
+
+    def prune_cache(self, max_age: float):
+        """Delete cached responses older than max_age seconds, once per client, so responses which are never asked for again
+        (e.g. every window of a backfill) do not pile up"""
+        self.cache_pruned = True
+        cutoff = time.time() - max_age
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                pass  # pruned by another process
+
+    def retry_delay(self, attempt: int, response: Response | None = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after is not None:
+                try:
+                    return min(self.max_backoff, float(retry_after))
+                except ValueError:
+                    pass
+                try:
+                    return min(self.max_backoff, max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()))
+                except (TypeError, ValueError):
+                    logger.debug(f"Ignoring unparseable Retry-After header {retry_after!r}")
+            reset = response.headers.get("X-RateLimit-Reset")
+            if reset is not None and reset.replace(".", "", 1).isdigit():
+                return min(self.max_backoff, max(0.0, float(reset) - time.time()))
+        # exponential backoff with jitter, so concurrent callers do not retry in lockstep
+        return min(self.max_backoff, self.backoff * 2**attempt) * random.uniform(0.5, 1)
+
+    def get_json(self, path: str, params: dict | None = None, ttl: float | None = None) -> dict:
+        """GET a coinmarketcap style {"status": ..., "data": ...} response. Raises ApiError once retries are exhausted or on an api error."""
+        url = self.url(path)
+        params = params or {}
+        ttl = self.cache_ttl if ttl is None else ttl
+        cached = self.cache_get(url, params, ttl)
+        if cached is not None:
+            logger.debug(f"Using cached response for {url}")
+            metrics.count("api.cache_hits")
+            return cached
+
+        error = None
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                with metrics.span("api.request"):
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+            except (ConnectionError, Timeout, TooManyRedirects) as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                metrics.count("api.requests")
+                metrics.count("api.bytes", len(response.content))
+                try:
+                    with metrics.span("api.parse"):
+                        data = response.json()
+                except ValueError:
+                    data = {}
+                status = data.get("status") or {}
+                if response.status_code == 429 or response.status_code >= 500:
+                    error = f"HTTP {response.status_code}: {status.get('error_message', response.reason)}"
+                    if status.get("error_code") in EXHAUSTED_ERROR_CODES:
+                        raise ApiError(f"Querying the url: {url} failed with the following error:\n\"{status.get('error_message')}\"")
+                elif status.get("error_code", 0) != 0 or not response.ok:
+                    raise ApiError(f"Querying the url: {url} failed with the following error:\n\"{status.get('error_message', response.reason)}\"")
+                else:
+                    self.cache_put(url, params, data, ttl)
+                    return data
+            if attempt < self.retries:
+                delay = self.retry_delay(attempt, response)
+                logger.warning(f"{error} from {url}. Retrying in {delay:.1f}s ({attempt + 1}/{self.retries})")
+                time.sleep(delay)
+        raise ApiError(f"Querying the url: {url} failed after {self.retries + 1} attempts. Last error: {error}")
+
+    def close(self):
+        self.session.close()
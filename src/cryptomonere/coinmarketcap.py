@@ -1,46 +1,38 @@
 #!/usr/bin/env python
 
 
-import json
 import logging
+from functools import cache
 
 # Documentation at https://coinmarketcap.com/api/documentation/v1/#section/Endpoint-Overview
-from requests import Session
-from requests.exceptions import ConnectionError, Timeout, TooManyRedirects
-
+from cryptomonere.client import ApiClient, ApiError  # noqa: F401 (ApiError is re-exported for callers)
 from cryptomonere.config import get_config
 
 logger = logging.getLogger(__name__)
 
 test_url = "https://sandbox-api.coinmarketcap.com"
 base_url = "https://pro-api.coinmarketcap.com"
-quotes_url = f"{base_url}/v2/cryptocurrency/quotes/latest"
-map_url = f"{base_url}/v1/cryptocurrency/map"
-ohlcv_url = f"{base_url}/v2/cryptocurrency/ohlcv/latest"
+quotes_path = "/v2/cryptocurrency/quotes/latest"
+map_path = "/v1/cryptocurrency/map"
+ohlcv_path = "/v2/cryptocurrency/ohlcv/latest"
+historical_quotes_path = "/v2/cryptocurrency/quotes/historical"
 # parameters = {"start": "1", "limit": "5000", "convert": "USD"}
 
 
-def fetch_api_json(url, output_file, parameters={}):
+@cache  # one client (and its pooled connections) for the life of the process
+def get_client() -> ApiClient:
     config = get_config()
     api_key = config.api_keys["coinmarketcap"]
-    ",".join(config.symbols)
 
     headers = {
         "Accepts": "application/json",
         "X-CMC_PRO_API_KEY": api_key,
     }
-    session = Session()
-    session.headers.update(headers)
-
-    try:
-        response = session.get(url, params=parameters)
-        data = json.loads(response.text)
-
-        with open(output_file, "w") as OutFile:
-            json.dump(data, OutFile, indent=2)
-        if data["status"]["error_code"] == 0:
-            return data
-        else:
-            logger.error(f"Querying the url: {url} failed with the following error:\n\"{data['status']['error_message']}\"")
-    except (ConnectionError, Timeout, TooManyRedirects) as e:
-        print(e)
+    return ApiClient(
+        config.api_base_url,
+        headers=headers,
+        timeout=config.api_timeout,
+        retries=config.api_retries,
+        cache_dir=config.data_dir.joinpath("cache"),
+        cache_ttl=config.api_cache_ttl,
+    )
@@ -4,33 +4,72 @@ import os
 import shutil
 from functools import cache
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from pydantic import BaseModel, computed_field, field_validator
+if TYPE_CHECKING:
+    from cryptomonere.config_model import Config
 
 logger = logging.getLogger(__name__)
 CONFIG_PATH = Path(os.getenv("HOME")).joinpath(".config/cryptomonere/config.json")
+# The validated config, so starting a command does not need to import pydantic and validate config.json every time
+CONFIG_CACHE_PATH = CONFIG_PATH.parent.joinpath(".config_cache.json")
 
 
-class Config(BaseModel):
-    config_dir: Path = CONFIG_PATH.parent
-    data_dir: Path = CONFIG_PATH.parent
-    symbols: list[str] = ["BTC", "ETH", "BCH", "XMR"]
-    api_keys: dict
+class CachedConfig:
+    """Attributes of a Config read back from the config cache, with its paths as Path objects again"""
 
-    # Handy checks before initializing Config, part of Pydantic lib
-    @field_validator("data_dir", mode="before")
-    @classmethod
-    def validate_data_dir_is_dir_not_file(cls, value: str) -> Path:
-        p = Path(value).expanduser()
-        p.mkdir(parents=True, exist_ok=True)
-        if not p.is_dir():
-            raise Exception("data_dir must be a directory, not a file")
-        return p
+    def __init__(self, values: dict, paths: list[str]):
+        self.__dict__.update(values)
+        for name in paths:
+            setattr(self, name, Path(values[name]))
 
-    @computed_field
-    @property
-    def sqlite_db_path(self) -> Path:
-        return self.data_dir.joinpath("cryptocurrency_tracker.db")
+    def __repr__(self):
+        return f"CachedConfig({self.__dict__})"
+
+
+def __getattr__(name):
+    # Config is only imported (with pydantic) when it is actually used
+    if name == "Config":
+        from cryptomonere.config_model import Config
+
+        return Config
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def cache_key() -> list[int]:
+    """Changes whenever config.json or the Config model is edited"""
+    config, model = CONFIG_PATH.stat(), Path(__file__).parent.joinpath("config_model.py").stat()
+    return [config.st_mtime_ns, config.st_size, model.st_mtime_ns]
+
+
+def read_cached_config() -> CachedConfig | None:
+    try:
+        with open(CONFIG_CACHE_PATH) as f:
+            cached = json.load(f)
+        if cached["key"] != cache_key():
+            return None
+        config = CachedConfig(cached["values"], cached["paths"])
+    except (OSError, ValueError, KeyError):
+        return None
+    # the model's data_dir validator creates the directory, which may have been removed since
+    config.data_dir.mkdir(parents=True, exist_ok=True)
+    return config
+
+
+def write_cached_config(config: "Config") -> None:
+    values = config.model_dump()
+    cached = {
+        "key": cache_key(),
+        "paths": [name for name, value in values.items() if isinstance(value, Path)],
+        "values": config.model_dump(mode="json"),
+    }
+    temp = CONFIG_CACHE_PATH.with_name(f"{CONFIG_CACHE_PATH.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp, "w") as f:
+            json.dump(cached, f)
+        temp.replace(CONFIG_CACHE_PATH)
+    except OSError as e:
+        logger.debug(f"Could not write the config cache: {e}")
 
 
 @cache  # cache will cache the results in an in-memory python dictionary. Literally no faster data structure possible.
@@ -38,9 +77,17 @@ def get_config():
     if not CONFIG_PATH.exists():
         build_config()
 
+    cached = read_cached_config()
+    if cached is not None:
+        return cached
+
+    from cryptomonere.config_model import Config
+
     # Load hard-coded config path
     with open(CONFIG_PATH) as f:
-        return Config.model_validate(json.load(f))
+        config = Config.model_validate(json.load(f))
+    write_cached_config(config)
+    return config
 
 
 def build_config():
@@ -56,7 +103,7 @@ def build_config():
     exit()
 
 
-def save_config(config: Config) -> None:
+def save_config(config: "Config") -> None:
     with open(CONFIG_PATH, "w") as f:
         # Dump Pydantic model as JSON to hard-coded config path
         f.write(config.model_dump_json())
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+from pydantic import BaseModel, computed_field, field_validator
+
+from cryptomonere.config import CONFIG_PATH
+
+
+class Config(BaseModel):
+    config_dir: Path = CONFIG_PATH.parent
+    data_dir: Path = CONFIG_PATH.parent
+    symbols: list[str] = ["BTC", "ETH", "BCH", "XMR"]
+    api_keys: dict
+    insert_chunk_size: int = 1000
+    daily_credit_budget: int | None = None
+    api_base_url: str = "https://pro-api.coinmarketcap.com"
+    api_timeout: float = 30
+    api_retries: int = 4
+    # Seconds a response is reused for before calling the api again. 0 disables the cache.
+    api_cache_ttl: float = 0
+    # Ids per quotes/latest request, and how many of those requests run at once
+    quote_chunk_size: int = 100
+    api_workers: int = 4
+    # Requests per minute allowed across all concurrent requests (the coinmarketcap basic plan allows 30)
+    api_requests_per_minute: int = 30
+    # Also fetch ohlcv/latest with every get, keeping today's open/high/low/close in historical up to date. Off by default, as the
+    # basic api plan does not include ohlcv and every request for it would fail.
+    fetch_ohlcv: bool = False
+    # Raw quotes older than this many days are deleted after each insert, keeping only their hourly and daily rollups.
+    # None keeps every quote.
+    quote_retention_days: int | None = None
+    # "monere archive" moves quote and historical rows older than this many days to Parquet files in archive_dir
+    archive_after_days: int = 180
+    # sqlite page cache and memory map sizes of the database connection, and seconds a write waits for another writer to finish
+    sqlite_cache_mb: int = 64
+    sqlite_mmap_mb: int = 256
+    sqlite_busy_timeout: float = 5
+
+    # Handy checks before initializing Config, part of Pydantic lib
+    @field_validator("data_dir", mode="before")
+    @classmethod
+    def validate_data_dir_is_dir_not_file(cls, value: str) -> Path:
+        p = Path(value).expanduser()
+        p.mkdir(parents=True, exist_ok=True)
+        if not p.is_dir():
+            raise Exception("data_dir must be a directory, not a file")
+        return p
+
+    @computed_field
+    @property
+    def sqlite_db_path(self) -> Path:
+        return self.data_dir.joinpath("cryptocurrency_tracker.db")
+
+    @computed_field
+    @property
+    def archive_dir(self) -> Path:
+        return self.data_dir.joinpath("archive")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+import logging
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from cryptomonere import archive
+from cryptomonere.SqlHandler import SqlHandler
+
+logger = logging.getLogger(__name__)
+
+hourly_prices_query = "select bucket as time, symbol, close as price from quote_hourly"
+daily_prices_query = "select bucket as time, symbol, close as price from quote_daily"
+
+
+def price_grid(symbols: list[str] | None = None, hourly: bool = False) -> pl.DataFrame:
+    """Closing prices of the symbols (default all of them) aligned on one daily or hourly grid: a time column, then one column per symbol.
+
+    Daily closes come from the quote rollup, with the loaded (and archived) history filling in the days without quotes.
+    """
+    prices = SqlHandler().sql_df(hourly_prices_query if hourly else daily_prices_query).lazy()
+    prices = prices.with_columns(pl.col("time").cast(pl.String), pl.col("symbol").cast(pl.String), pl.col("price").cast(pl.Float64))
+    if symbols is not None:
+        prices = prices.filter(pl.col("symbol").is_in(symbols))
+    if not hourly:
+        history = archive.scan("historical", symbols, ["EndDate", "Symbol", "Close"]).select(
+            pl.col("EndDate").alias("time"), pl.col("Symbol").alias("symbol"), pl.col("Close").alias("price")
+        )
+        history = history.filter(pl.col("price").is_not_null()).join(prices, on=["time", "symbol"], how="anti")
+        prices = pl.concat([prices, history], how="vertical_relaxed")
+    grid = prices.collect().pivot(on="symbol", index="time", values="price", aggregate_function="last").sort("time")
+    return grid.select("time", *sorted(grid.columns[1:]))
+
+
+def log_returns(prices: np.ndarray) -> np.ndarray:
+    """Log returns between consecutive grid times, NaN where either price is missing"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logs = np.log(np.where(prices > 0, prices, np.nan))
+    return np.diff(logs, axis=0)
+
+
+def correlation_matrix(returns: np.ndarray, min_periods: int = 2) -> np.ndarray:
+    """Pearson correlation of every pair of columns over the rows where both have a value, computed with matrix products.
+
+    Pairs with fewer than min_periods rows in common are NaN.
+    """
+    valid = ~np.isnan(returns)
+    values = np.where(valid, returns, 0.0)
+    mask = valid.astype(float)
+    # entry (i, j) of each product is a sum over the rows where both column i and column j have a value
+    count = mask.T @ mask
+    sums = values.T @ mask
+    squares = (values**2).T @ mask
+    products = values.T @ values
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = products - sums * sums.T / count
+        variance_i = squares - sums**2 / count
+        variance_j = variance_i.T.copy()
+        correlation = covariance / np.sqrt(variance_i * variance_j)
+    correlation[count < min_periods] = np.nan
+    return np.clip(correlation, -1, 1)
+
+
+def ratio_matrix(prices: np.ndarray) -> np.ndarray:
+    """Latest price of each column divided by the latest price of every other column"""
+    latest = np.array(pl.DataFrame(prices).fill_nan(None).fill_null(strategy="forward").row(-1), dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.outer(latest, 1 / latest)
+
+
+def rolling_correlation(returns: np.ndarray, reference: int, window: int, min_periods: int = 2) -> np.ndarray:
+    """Correlation of every column with the reference column over each trailing window of rows, using cumulative sums.
+
+    Row t covers rows t - window + 1 to t. Rows before the first full window, and windows with fewer than min_periods common values, are NaN.
+    """
+    if window > len(returns):
+        return np.full(returns.shape, np.nan)
+    x = returns[:, [reference]]
+    valid = ~np.isnan(returns) & ~np.isnan(x)
+    xs = np.where(valid, x, 0.0)
+    ys = np.where(valid, returns, 0.0)
+
+    def trailing(values):
+        sums = np.cumsum(np.vstack([np.zeros((1, values.shape[1])), values]), axis=0)
+        return sums[window:] - sums[:-window]
+
+    count = trailing(valid.astype(float))
+    sum_x, sum_y = trailing(xs), trailing(ys)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = trailing(xs * ys) - sum_x * sum_y / count
+        variance_x = trailing(xs**2) - sum_x**2 / count
+        variance_y = trailing(ys**2) - sum_y**2 / count
+        correlation = np.clip(covariance / np.sqrt(variance_x * variance_y), -1, 1)
+    correlation[count < max(min_periods, 2)] = np.nan
+    return np.vstack([np.full((window - 1, returns.shape[1]), np.nan), correlation])
+
+
+def print_matrix(title: str, symbols: list[str], matrix: np.ndarray, decimals: int = 2):
+    print(title)
+    print(" " * 8 + "".join(symbol[:9].rjust(10) for symbol in symbols))
+    for symbol, row in zip(symbols, matrix):
+        print(symbol[:8].ljust(8) + "".join(("" if np.isnan(value) else f"{value:.{decimals}f}").rjust(10) for value in row))
+    print()
+
+
+def report(
+    symbols: list[str] | None = None,
+    hourly: bool = False,
+    min_periods: int = 30,
+    rolling: int | None = None,
+    against: str = "BTC",
+    output_dir: Path | None = None,
+):
+    """Print (or write to output_dir as csv) the return correlation and price ratio matrices, and optionally rolling correlations with one symbol"""
+    grid = price_grid(symbols, hourly)
+    names = grid.columns[1:]
+    if len(names) == 0 or grid.height < 2:
+        logger.warning("Not enough prices to correlate, load some history or keep tracking quotes for a while")
+        return 1
+    prices = grid.select(names).cast(pl.Float64).to_numpy()
+    returns = log_returns(prices)
+    correlation = correlation_matrix(returns, min_periods)
+    ratios = ratio_matrix(prices)
+    logger.info(f"Correlated {len(names)} symbols over {grid.height} {'hours' if hourly else 'days'}")
+
+    rolling_frame = None
+    if rolling is not None:
+        if against not in names:
+            logger.error(f'There are no prices for "{against}" to correlate with')
+            return 1
+        rolled = rolling_correlation(returns, names.index(against), rolling, min(min_periods, rolling))
+        rolling_frame = pl.DataFrame(rolled, schema=names).insert_column(0, grid["time"][1:])
+
+    if output_dir is not None:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        pl.DataFrame(correlation, schema=names).insert_column(0, pl.Series("symbol", names)).write_csv(output_dir.joinpath("correlation.csv"))
+        pl.DataFrame(ratios, schema=names).insert_column(0, pl.Series("symbol", names)).write_csv(output_dir.joinpath("ratio.csv"))
+        if rolling_frame is not None:
+            rolling_frame.write_csv(output_dir.joinpath(f"rolling_{against}.csv"))
+        logger.info(f"Wrote the matrices to {output_dir}")
+        return 0
+
+    print_matrix(f"Correlation of {'hourly' if hourly else 'daily'} returns", names, correlation)
+    print_matrix("Price ratio (row / column)", names, ratios, decimals=4)
+    if rolling_frame is not None:
+        print(f"Latest correlation with {against} over {rolling} {'hours' if hourly else 'days'}")
+        for symbol in names:
+            latest = rolling_frame.select("time", symbol).drop_nans().drop_nulls().tail(1)
+            if latest.height:
+                print(f"{symbol:8s}{latest[symbol][0]:>10.2f}  {latest['time'][0]}")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+import logging
+
+from cryptomonere import price_index
+from cryptomonere.SqlHandler import SqlHandler
+
+logger = logging.getLogger(__name__)
+
+upsert_last_crossing = """
+insert into last_crossing (symbol, price, last_at_double, last_at_half) values (?, ?, ?, ?)
+on conflict (symbol) do update set
+    price = excluded.price,
+    last_at_double = excluded.last_at_double,
+    last_at_half = excluded.last_at_half
+"""
+
+
+def save(rows: list[tuple]):
+    SQL = SqlHandler()
+    with SQL.transaction():
+        SQL.cx.executemany(upsert_last_crossing, rows)
+
+
+def refresh() -> int:
+    """Recompute last_crossing for the symbols whose latest price moved, using the price_interval index. Returns how many were updated."""
+    stale = SqlHandler().sql_file("last_crossing_stale.sql", params=())
+    if len(stale) == 0:
+        return 0
+    pairs = []
+    for symbol, price in stale:
+        pairs += [(symbol, price * 2), (symbol, price / 2)]
+    days = price_index.last_at_many(pairs)
+    save([(symbol, price, days[2 * i][2], days[2 * i + 1][2]) for i, (symbol, price) in enumerate(stale)])
+    logger.debug(f"Updated last double/half crossings of {len(stale)} symbols")
+    return len(stale)
+
+
+def forget(symbol: str):
+    """Drop a symbol's crossings (e.g. after loading more of its history) so the next refresh recomputes them"""
+    SqlHandler().sql("delete from last_crossing where symbol = ?", params=(symbol,), is_update=True)
+
+
+def last_crossing_day(days, lows, highs, target: float) -> str | None:
+    """Day of the last range (in chronological order) which contains target, found with a vectorized reverse scan"""
+    import numpy as np
+
+    hits = (lows <= target) & (highs >= target)
+    if not hits.any():
+        return None
+    return days[len(hits) - 1 - np.argmax(hits[::-1])]
+
+
+def full_scan(symbols: list[str] | None = None) -> int:
+    """Recompute last_crossing from the daily quote rollup and (archived) history with numpy and polars, without the price_interval index.
+
+    Every symbol in quote_latest (or just the ones given) is recomputed. Returns how many were updated.
+    """
+    import numpy as np
+    import polars as pl
+
+    from cryptomonere import archive
+
+    SQL = SqlHandler()
+    latest = SQL.sql("select symbol, price from quote_latest where price is not null")
+    if symbols is not None:
+        latest = [(symbol, price) for symbol, price in latest if symbol in symbols]
+    rows = []
+    for symbol, price in latest:
+        quotes = SQL.sql("select bucket, low, high, close from quote_daily where symbol = ? order by bucket", params=(symbol,))
+        history = (
+            archive.scan("historical", [symbol], ["StartDate", "Low", "High"])
+            .filter(pl.col("Low").is_not_null() & pl.col("High").is_not_null())
+            .sort("StartDate")
+            .collect()
+            .rows()
+        )
+        quote_days = np.array([row[0] for row in quotes], dtype=object)
+        quote_lows = np.array([row[1] for row in quotes], dtype=float)
+        quote_highs = np.array([row[2] for row in quotes], dtype=float)
+        quote_closes = np.array([row[3] for row in quotes], dtype=float)
+        history_days = np.array([row[0] for row in history], dtype=object)
+        history_lows = np.array([row[1] for row in history], dtype=float)
+        history_highs = np.array([row[2] for row in history], dtype=float)
+        # the quote segments dated on a day run from the previous day's close through all of that day's prices
+        previous_closes = np.concatenate(([np.nan], quote_closes[:-1]))
+        segment_lows = np.fmin(quote_lows, previous_closes)
+        segment_highs = np.fmax(quote_highs, previous_closes)
+
+        crossings = []
+        for target in (price * 2, price / 2):
+            found = [
+                last_crossing_day(quote_days, segment_lows, segment_highs, target),
+                last_crossing_day(history_days, history_lows, history_highs, target),
+            ]
+            found = [day for day in found if day is not None]
+            crossings.append(max(found) if found else None)
+        rows.append((symbol, price, *crossings))
+    save(rows)
+    return len(rows)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+import json
+import logging
+import re
+from typing import Iterator, TextIO
+
+from cryptomonere.SqlHandler import SqlHandler
+
+logger = logging.getLogger(__name__)
+
+map_columns = (
+    "id",
+    "currency_rank",
+    "name",
+    "symbol",
+    "slug",
+    "is_active",
+    "status",
+    "first_historical_data",
+    "last_historical_data",
+    "platform_id",
+    "platform_name",
+    "platform_symbol",
+    "platform_slug",
+)
+
+
+def iter_json_array(fp: TextIO, key: str, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    """Yield the objects of the array stored under key in a JSON document one at a time, without loading the whole document"""
+    decoder = json.JSONDecoder()
+    start = re.compile(rf'"{key}"\s*:\s*\[')
+    buffer = ""
+    while (match := start.search(buffer)) is None:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            raise ValueError(f'No "{key}" array in the JSON document')
+        buffer += chunk
+
+    position = match.end()
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = fp.read(chunk_size)
+            if not chunk:
+                raise
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+def map_row(row: dict) -> tuple:
+    platform = row["platform"] or {}
+    return (
+        row["id"],
+        row["rank"],
+        row["name"].strip('"'),
+        row["symbol"],
+        row["slug"],
+        row["is_active"],
+        row["status"],
+        row["first_historical_data"],
+        row["last_historical_data"],
+        platform.get("id"),
+        platform.get("name"),
+        platform.get("symbol"),
+        platform.get("slug"),
+    )
+
+
+def refresh(fp: TextIO) -> int:
+    """Bring cryptocurrency_map (and currency) in line with a coinmarketcap map response, writing only what changed.
+
+    Rows are compared by id against the stored map. New and changed rows are upserted, ids missing from the response are marked
+    inactive, and only the symbols those rows touch are deduplicated into currency again. Returns the number of changed ids.
+    """
+    SQL = SqlHandler()
+    stored = {row[0]: row for row in SQL.sql(f"select {', '.join(map_columns)} from cryptocurrency_map")}
+    symbol_index = map_columns.index("symbol")
+    active_index = map_columns.index("is_active")
+
+    changes = []
+    changed_symbols = set()
+    for row in map(map_row, iter_json_array(fp, "data")):
+        old = stored.pop(row[0], None)
+        if old == row:
+            continue
+        changes.append(row)
+        changed_symbols.add(row[symbol_index])
+        if old is not None:
+            changed_symbols.add(old[symbol_index])
+    removed = [old for old in stored.values() if old[active_index] != 0]
+    changed_symbols.update(old[symbol_index] for old in removed)
+
+    if len(changes) == 0 and len(removed) == 0:
+        logger.info("Cryptocurrency map is already up to date")
+        return 0
+    SQL.sql_file("create_map_changes.sql")
+    SQL.cx.executemany(f"insert into temp.map_changes ({', '.join(map_columns)}) values ({', '.join('?' for _ in map_columns)})", changes)
+    SQL.cx.executemany("insert into temp.map_removed (id) values (?)", [(old[0],) for old in removed])
+    SQL.cx.executemany("insert into temp.map_changed_symbols (symbol) values (?)", [(symbol,) for symbol in changed_symbols])
+    SQL.sql_file("apply_map_changes.sql")
+    logger.info(f"Cryptocurrency map updated: {len(changes)} new or changed, {len(removed)} deactivated, {len(changed_symbols)} symbols deduplicated")
+    return len(changes) + len(removed)
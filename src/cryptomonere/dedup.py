@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+import logging
+
+from cryptomonere import crossings, price_index
+from cryptomonere.SqlHandler import SqlHandler
+
+logger = logging.getLogger(__name__)
+
+# Assets with a placeholder (negative) id, given to quotes stored without a coinmarketcap id, whose symbol has since been quoted
+# under exactly one real id. A symbol quoted under several real ids is several currencies sharing it, and is left alone.
+split_assets_query = """
+select n.id, max(p.id), n.symbol
+from asset n
+inner join asset p on p.symbol = n.symbol and p.id > 0
+where n.id < 0
+group by n.id, n.symbol
+having count(p.id) = 1
+"""
+
+
+def dedup() -> tuple[int, int]:
+    """Merge the quotes of symbols split between a placeholder id and their real id, dropping the snapshots stored under both.
+
+    Snapshots are unique per (id, last_updated) since the quote_fact migration, which already dropped exact duplicates, so a split
+    symbol is the one way a snapshot can still be stored twice. Returns the number of quotes moved and the number of duplicates dropped.
+    """
+    SQL = SqlHandler()
+    moved = dropped = 0
+    with SQL.transaction():
+        split = SQL.cx.execute(split_assets_query).fetchall()
+        for placeholder, real, symbol in split:
+            # quote_fact has no update or delete triggers, so the rollups (keyed by symbol) are left as they are
+            count = SQL.cx.execute("update or ignore quote_fact set id = ? where id = ?", (real, placeholder)).rowcount
+            duplicates = SQL.cx.execute("delete from quote_fact where id = ?", (placeholder,)).rowcount
+            SQL.cx.execute("delete from asset where id = ?", (placeholder,))
+            SQL.cx.execute("update quote_latest set id = ? where id = ?", (real, placeholder))
+            logger.info(f"{symbol}: moved {count} quotes from placeholder id {placeholder} to id {real}, dropped {duplicates} duplicates")
+            moved += count
+            dropped += duplicates
+    if split:
+        # the moved quotes now interleave with the real id's, so the price segments of these symbols are recomputed
+        price_index.resegment([symbol for _, _, symbol in split])
+        for _, _, symbol in split:
+            crossings.forget(symbol)
+        crossings.refresh()
+    logger.info(f"Merged {len(split)} split symbols: {moved} quotes moved, {dropped} duplicate quotes dropped")
+    return moved, dropped
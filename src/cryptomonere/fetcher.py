@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+import asyncio
+import logging
+import time
+from itertools import islice
+from typing import Iterable
+
+from cryptomonere import coinmarketcap as ccap
+from cryptomonere.client import ApiClient, ApiError
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Rate limit shared by every request of a fetch: rate requests per second on average, in bursts of up to capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Fetcher:
+    """Runs blocking ApiClient requests concurrently from asyncio, at most concurrency at a time and all through one TokenBucket.
+
+    The client (requests) is synchronous, so each request runs in a worker thread; the event loop only schedules them.
+    """
+
+    def __init__(self, client: ApiClient, concurrency: int, requests_per_minute: float):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(requests_per_minute / 60, max(1, requests_per_minute))
+
+    async def get_json(self, path: str, params: dict) -> dict:
+        async with self.semaphore:
+            await self.bucket.acquire()
+            return await asyncio.to_thread(self.client.get_json, path, params)
+
+    async def get_chunked(self, path: str, ids: Iterable[int], chunk_size: int, params: dict | None = None) -> dict:
+        """Request path for ids in chunks of chunk_size, merged into one {"status", "data"} response.
+
+        A chunk which fails is logged and counted in status.failed_chunks, so the other chunks are still returned.
+        """
+        ids = iter(ids)
+        chunks = []
+        while chunk := list(islice(ids, chunk_size)):
+            chunks.append(chunk)
+        responses = await asyncio.gather(
+            *(self.get_json(path, {**(params or {}), "id": ",".join(str(cmc_id) for cmc_id in chunk)}) for chunk in chunks),
+            return_exceptions=True,
+        )
+        data = {"status": {"error_code": 0, "credit_count": 0, "failed_chunks": 0, "chunks": len(chunks)}, "data": {}}
+        for chunk, response in zip(chunks, responses):
+            if isinstance(response, ApiError):
+                logger.error(f"Fetching {path} for {len(chunk)} ids starting with id {chunk[0]} failed: {response}")
+                data["status"]["failed_chunks"] += 1
+                continue
+            if isinstance(response, BaseException):
+                raise response
+            data["status"]["credit_count"] += response["status"].get("credit_count", 1)
+            data["data"].update(response["data"])
+        return data
+
+
+async def fetch_latest_async(ids: list[int], config, ohlcv: bool = True) -> tuple[dict, dict | None]:
+    fetcher = Fetcher(ccap.get_client(), config.api_workers, config.api_requests_per_minute)
+    requests = [fetcher.get_chunked(ccap.quotes_path, ids, config.quote_chunk_size)]
+    if ohlcv:
+        requests.append(fetcher.get_chunked(ccap.ohlcv_path, ids, config.quote_chunk_size))
+    responses = await asyncio.gather(*requests)
+    return responses[0], responses[1] if ohlcv else None
+
+
+def fetch_latest(ids: list[int], config, ohlcv: bool = True) -> tuple[dict, dict | None]:
+    """quotes/latest and (if ohlcv) ohlcv/latest for ids, every chunk of both endpoints fetched concurrently"""
+    return asyncio.run(fetch_latest_async(ids, config, ohlcv))
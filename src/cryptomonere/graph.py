@@ -1,71 +1,160 @@
 #!/usr/bin/env python
 
 import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
 import polars as pl
 from matplotlib import pyplot as plt
+from matplotlib.figure import Figure
 
+from cryptomonere import archive, rollup
 from cryptomonere.SqlHandler import SqlHandler
 
 logger = logging.getLogger(__name__)
 
 
-def graph_price_history(symbol):
-    SQL = SqlHandler()
-    history = SQL.sql_df(f"Select EndDate,Open,Close,Low,High from historical where symbol like '{symbol}' order by EndDate asc")
+# Figure height and resolution of rendered graphs. Their width in pixels is chosen per call.
+HEIGHT = 600
+DPI = 100
+
+
+def lttb(x, y, threshold: int):
+    """Largest-Triangle-Three-Buckets downsampling of (x, y) to threshold points, keeping the points that shape the line.
+
+    Returns the indices of the kept points.
+    """
+    import numpy as np
+
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    # the points between the first and last are split into threshold - 2 buckets, each contributing one point
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous]) - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def minmax(y, buckets: int):
+    """Min/max downsampling: the indices of the lowest and highest point of each of buckets equal slices of y, in order"""
+    import numpy as np
+
+    n = len(y)
+    if 2 * buckets >= n:
+        return np.arange(n)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    lows = np.minimum.reduceat(y, edges[:-1])
+    highs = np.maximum.reduceat(y, edges[:-1])
+    kept = set()
+    for start, end, low, high in zip(edges[:-1], edges[1:], lows, highs):
+        window = y[start:end]
+        kept.add(start + int(np.argmax(window == low)))
+        kept.add(start + int(np.argmax(window == high)))
+    return np.array(sorted(kept))
+
+
+def downsample(series: pl.DataFrame, width: int, method: str | None = "lttb") -> pl.DataFrame:
+    """Reduce a (time, price) series to about one point per pixel of width (two for minmax). A method of None leaves it as it is."""
+    if method is None or series.height <= width:
+        return series
+    prices = series["price"].to_numpy()
+    if method == "minmax":
+        kept = minmax(prices, width)
+    else:
+        kept = lttb(series["time"].dt.epoch("s").to_numpy().astype(float), prices, width)
+    return series[kept]
+
+
+def price_history(symbol: str) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """(history closes, quoted prices) of a symbol, each as a (time, price) DataFrame"""
+    history = (
+        archive.scan("historical", [symbol], ["EndDate", "Close"])
+        .select(pl.col("EndDate").str.to_date().cast(pl.Datetime).alias("time"), pl.col("Close").alias("price"))
+        .drop_nulls()
+        .sort("time")
+        .collect()
+    )
+    return history, rollup.price_series(symbol)
+
+
+def plot_price_history(axes, symbol: str, width: int = 1200, method: str | None = "lttb") -> bool:
+    """Draw a symbol's history and quotes on axes, downsampled to width. Returns False if there was nothing to draw."""
+    history, prices = price_history(symbol)
     if history.height == 0:
         logger.warning(f'There is nothing in the history table for currency "{symbol}", perhaps you might want to load it?')
     else:
-        history = history.with_columns(pl.col("EndDate").str.to_date().cast(pl.Datetime))
-        plt.plot(history["EndDate"], history["Close"])
-
-    prices = SQL.sql_df(f"Select last_updated,Price from quote where symbol like '{symbol}' order by last_updated asc")
+        history = downsample(history, width, method)
+        axes.plot(history["time"], history["price"])
     if prices.height == 0:
         logger.warning(f'There is nothing in the quotes table for currency "{symbol}", you might want to add it to config.json and begin tracking it.')
     else:
-        prices = prices.with_columns(pl.col("last_updated").cast(pl.Datetime))
-        plt.plot(prices["last_updated"], prices["price"])
+        prices = downsample(prices, width, method)
+        axes.plot(prices["time"], prices["price"])
+    return history.height > 0 or prices.height > 0
+
+
+def graph_price_history(symbol, width: int = 1200, method: str | None = "lttb"):
+    plot_price_history(plt.gca(), symbol, width, method)
     plt.show()
 
 
+def render_price_history(symbol: str, output_dir: Path, file_format: str = "png", width: int = 1200, method: str | None = "lttb") -> Path | None:
+    """Save a symbol's price history graph to output_dir/SYMBOL.file_format without a display, returning its path"""
+    # a bare Figure renders with the Agg (or svg) canvas, whatever pyplot's interactive backend is
+    figure = Figure(figsize=(width / DPI, HEIGHT / DPI), dpi=DPI)
+    axes = figure.subplots()
+    if not plot_price_history(axes, symbol, width, method):
+        return None
+    axes.set_title(f"{symbol} price history")
+    path = output_dir.joinpath(f"{symbol}.{file_format}")
+    figure.savefig(path, format=file_format)
+    return path
+
+
+def render_all(
+    symbols: list[str], output_dir: Path, file_format: str = "png", width: int = 1200, method: str | None = "lttb", jobs: int | None = None
+) -> list[Path]:
+    """Render the price history of every symbol to output_dir across a pool of processes. Returns the paths written."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    jobs = min(jobs or os.cpu_count() or 1, len(symbols))
+    if jobs > 1:
+        # spawned rather than forked workers, so they do not share the sqlite connection
+        with ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(render_price_history, symbol, output_dir, file_format, width, method) for symbol in symbols]
+            paths = [future.result() for future in futures]
+    else:
+        paths = [render_price_history(symbol, output_dir, file_format, width, method) for symbol in symbols]
+    paths = [path for path in paths if path is not None]
+    logger.info(f"Rendered {len(paths)} graphs to {output_dir}")
+    return paths
+
+
 def graph_price_comparison(symbol1, symbol2):
-    SQL = SqlHandler()
-    price_comparison_sql = f"""
-with prices_cte as (
-    select
-        datey,
-        symbol,
-        avg(price) as price
-    from
-        (
-            select
-                date(last_updated) as datey,
-                symbol,
-                avg(price) as price
-            from quote
-            where symbol like '{symbol1}' OR symbol like '{symbol2}'
-            group by date(last_updated), symbol
-            union all
-            select
-                enddate as datey,
-                symbol,
-                close as price
-            from historical
-            where symbol like '{symbol1}' OR symbol like '{symbol2}'
-        ) m
-    group by datey, symbol
-)
-
-select
-    a.datey,
-    a.price / b.price as price_ratio
-from prices_cte a
-inner join prices_cte b on a.datey = b.datey
-where a.symbol like '{symbol1}'
-    and b.symbol like '{symbol2}'
-order by a.datey asc
-"""
-    comparison = SQL.sql_df(price_comparison_sql)
+    symbols = [symbol1, symbol2]
+    quoted = SqlHandler().sql_df("select bucket as datey, symbol, close as price from quote_daily where symbol in (?, ?)", symbols)
+    history = archive.scan("historical", symbols, ["EndDate", "Symbol", "Close"]).rename({"EndDate": "datey", "Symbol": "symbol", "Close": "price"})
+    comparison = (
+        pl.concat([quoted.lazy().cast({"datey": pl.String, "symbol": pl.String, "price": pl.Float64}), history], how="vertical_relaxed")
+        .group_by("datey", "symbol")
+        .agg(pl.col("price").mean())
+        .collect()
+        .pivot(on="symbol", index="datey", values="price")
+    )
+    if symbol1 in comparison.columns and symbol2 in comparison.columns:
+        comparison = comparison.select("datey", (pl.col(symbol1) / pl.col(symbol2)).alias("price_ratio")).drop_nulls().sort("datey")
+    else:
+        comparison = comparison.clear()
     if comparison.height == 0:
         logger.warning(
             f'There is nothing to compare for the currencies "{symbol1}" and "{symbol2}", perhaps you misspelled the symbol or have not been tracking it?'
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+import csv
+import glob
+import io
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from cryptomonere import crossings
+from cryptomonere.SqlHandler import SqlHandler
+
+logger = logging.getLogger(__name__)
+
+historical_columns = ("Symbol", "StartDate", "EndDate", "Open", "High", "Low", "Close", "Volume", "Market_Cap")
+# Reloading a file (or overlapping exports) replaces the stored values for each day instead of duplicating them
+historical_upsert = (
+    "(Symbol, EndDate) do update set " + ", ".join(f"{column} = excluded.{column}" for column in historical_columns[3:]) + ", StartDate = excluded.StartDate"
+)
+# Files are parsed by the process pool in segments of this many bytes, so no worker holds more than one segment of rows
+SEGMENT_BYTES = 8 * 1024 * 1024
+
+
+def expand_paths(patterns: Iterable[str]) -> list[Path]:
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(os.path.expanduser(pattern)))
+        if len(matches) == 0:
+            raise FileNotFoundError(f'No history file matches "{pattern}"')
+        paths.extend(Path(match) for match in matches)
+    return paths
+
+
+def csv_rows(symbol: str, lines: Iterable[str]) -> Iterator[tuple]:
+    """Turn CoinCodex export lines (Start,End,Open,High,Low,Close,Volume,Market Cap) into historical rows, skipping blank lines"""
+    for fields in csv.reader(lines):
+        if len(fields) == 0:
+            continue
+        yield (symbol, *fields[:8])
+
+
+def ohlcv_row(bar: dict) -> tuple:
+    """A historical row from a coinmarketcap ohlcv bar. Like in CoinCodex exports, StartDate is the day the bar covers and EndDate
+    the day after."""
+    usd = bar["quote"]["USD"]
+    day = date.fromisoformat(bar["time_open"][:10])
+    return (
+        bar["symbol"],
+        day.isoformat(),
+        (day + timedelta(days=1)).isoformat(),
+        usd.get("open"),
+        usd.get("high"),
+        usd.get("low"),
+        usd.get("close"),
+        usd.get("volume"),
+        usd.get("market_cap"),
+    )
+
+
+def read_file(symbol: str, path: Path) -> Iterator[tuple]:
+    with open(path, newline="") as R:
+        next(R, None)  # header
+        yield from csv_rows(symbol, R)
+
+
+def segments(path: Path, size: int = SEGMENT_BYTES) -> Iterator[tuple[Path, int, int]]:
+    """Split a file into (path, start, end) byte ranges of roughly size bytes that begin and end on line boundaries, skipping the header"""
+    with open(path, "rb") as R:
+        R.readline()
+        start = R.tell()
+        end_of_file = os.fstat(R.fileno()).st_size
+        while start < end_of_file:
+            R.seek(min(start + size, end_of_file))
+            R.readline()
+            end = R.tell()
+            yield path, start, end
+            start = end
+
+
+def parse_segment(symbol: str, path: Path, start: int, end: int) -> list[tuple]:
+    with open(path, "rb") as R:
+        R.seek(start)
+        text = R.read(end - start).decode()
+    return list(csv_rows(symbol, io.StringIO(text, newline="")))
+
+
+def parallel_rows(symbol: str, paths: list[Path], jobs: int) -> Iterator[tuple]:
+    """Parse file segments across a process pool, yielding rows in file order with at most 2 * jobs segments in flight"""
+    with ProcessPoolExecutor(jobs) as pool:
+        pending = deque()
+        for path in paths:
+            for segment in segments(path):
+                pending.append(pool.submit(parse_segment, symbol, *segment))
+                if len(pending) >= 2 * jobs:
+                    yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def load(symbol: str, patterns: Iterable[str], jobs: int = 1, batch_size: int | None = None) -> int:
+    """Stream CoinCodex history exports into the historical table, committing every batch_size rows. Returns the number of rows written."""
+    symbol = symbol.upper()
+    paths = expand_paths(patterns)
+    if jobs > 1 and (len(paths) > 1 or paths[0].stat().st_size > SEGMENT_BYTES):
+        rows = parallel_rows(symbol, paths, jobs)
+    else:
+        rows = (row for path in paths for row in read_file(symbol, path))
+    total = SqlHandler().bulk_insert("historical", historical_columns, rows, chunk_size=batch_size, on_conflict=historical_upsert, commit_every_chunk=True)
+    crossings.forget(symbol)
+    logger.info(f"Loaded {total} {symbol} history rows from {len(paths)} file(s)")
+    return total
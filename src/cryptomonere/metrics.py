@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+import json
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# What span() returns while metrics are off, so an instrumented block costs one function call and nothing else
+NULL_SPAN = nullcontext()
+
+
+class Metrics:
+    """Timing spans and counters of the phases of a command.
+
+    A span named "insert.quotes" accumulates how often the block ran and its total and longest time. Counters add up
+    rows, bytes and the like. Names are dotted, from the phase to the detail.
+    """
+
+    def __init__(self):
+        self.spans = {}
+        self.counters = {}
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            count, total, longest = self.spans.get(name, (0, 0.0, 0.0))
+            self.spans[name] = (count + 1, total + elapsed, max(longest, elapsed))
+
+    def count(self, name: str, value: int | float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> dict:
+        return {
+            "spans": {name: {"count": count, "total_ms": total * 1000, "max_ms": longest * 1000} for name, (count, total, longest) in self.spans.items()},
+            "counters": dict(self.counters),
+        }
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text format, for node_exporter's textfile collector"""
+        lines = [
+            "# HELP monere_span_seconds_total Time spent in each phase of monere commands.",
+            "# TYPE monere_span_seconds_total counter",
+        ]
+        lines += [f'monere_span_seconds_total{{span="{name}"}} {total:.6f}' for name, (_, total, _) in sorted(self.spans.items())]
+        lines += ["# HELP monere_span_runs_total Times each phase ran.", "# TYPE monere_span_runs_total counter"]
+        lines += [f'monere_span_runs_total{{span="{name}"}} {count}' for name, (count, _, _) in sorted(self.spans.items())]
+        for name, value in sorted(self.counters.items()):
+            metric = "monere_" + re.sub(r"[^a-zA-Z0-9_]", "_", name) + "_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path, format: str = "json"):
+        """Write the metrics to path as a JSON summary or Prometheus text, replacing the file in one step so collectors never read half of it"""
+        temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(temp, "w") as W:
+            if format == "prometheus":
+                W.write(self.prometheus())
+            else:
+                json.dump(self.summary(), W, indent=2)
+        temp.replace(path)
+
+    def print_summary(self, file=sys.stderr):
+        print(f"{'phase':32s} {'runs':>6s} {'total ms':>10s} {'max ms':>10s}", file=file)
+        for name, (count, total, longest) in sorted(self.spans.items()):
+            print(f"{name:32s} {count:6d} {total * 1000:10.1f} {longest * 1000:10.1f}", file=file)
+        for name, value in sorted(self.counters.items()):
+            print(f"{name:32s} {value:>6}", file=file)
+
+
+class NullMetrics:
+    """Stands in for Metrics while profiling is off"""
+
+    def span(self, name: str):
+        return NULL_SPAN
+
+    def count(self, name: str, value: int | float = 1):
+        pass
+
+
+active = NullMetrics()
+
+
+def enable() -> Metrics:
+    """Start recording (if not already) and return the process' Metrics"""
+    global active
+    if not isinstance(active, Metrics):
+        active = Metrics()
+    return active
+
+
+def enabled() -> bool:
+    return isinstance(active, Metrics)
+
+
+def span(name: str):
+    """Time the block as the phase name, if metrics are enabled"""
+    return active.span(name)
+
+
+def count(name: str, value: int | float = 1):
+    active.count(name, value)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+import logging
+import pathlib
+import sqlite3 as sqlite
+import time
+
+logger = logging.getLogger(__name__)
+MIGRATIONS_DIR = pathlib.Path(__file__).parent.joinpath("sql/migrations")
+# Seconds to wait for another process that holds the database while migrating it (a large quote table takes a while)
+MIGRATION_WAIT = 600
+# Run first in each migration's transaction: fails once the write lock is held if another process applied the migration since
+# the version was read, instead of applying it twice
+version_guard = """
+create temp table migration_guard (version integer check (version < {target}));
+insert into temp.migration_guard select user_version from pragma_user_version;
+drop table temp.migration_guard;
+"""
+
+
+def migrations() -> list[pathlib.Path]:
+    """Migration scripts in the order they are applied. Each is named NNNN_description.sql, where NNNN is the schema version it produces."""
+    return sorted(MIGRATIONS_DIR.glob("[0-9][0-9][0-9][0-9]_*.sql"))
+
+
+def schema_version(cx: sqlite.Connection) -> int:
+    return cx.execute("pragma user_version").fetchone()[0]
+
+
+def applied_elsewhere(cx: sqlite.Connection, target: int, locked: bool) -> bool:
+    """Whether another process has migrated the database to target, waiting up to MIGRATION_WAIT seconds for it if it holds the lock"""
+    deadline = time.monotonic() + (MIGRATION_WAIT if locked else 0)
+    while schema_version(cx) < target:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.5)
+    return True
+
+
+def migrate(cx: sqlite.Connection) -> int:
+    """Apply every migration newer than the schema version recorded in the database, each in its own transaction.
+
+    Two monere processes started at once (cron and watch after an upgrade) may both find the schema out of date. begin immediate
+    makes the second wait for the first one's migration, and a migration that fails because the first already applied it, or
+    still holds the database, is skipped once the recorded version shows it was applied.
+    """
+    version = schema_version(cx)
+    for path in migrations():
+        target = int(path.name[:4])
+        if target <= version:
+            continue
+        logger.info(f"Migrating database schema to version {target} ({path.name})")
+        try:
+            cx.executescript(f"begin immediate;\n{version_guard.format(target=target)}\n{path.read_text()}\npragma user_version = {target};\ncommit;")
+        except sqlite.Error as e:
+            cx.rollback()
+            if not applied_elsewhere(cx, target, locked="locked" in str(e)):
+                raise
+            logger.info(f"Schema version {target} was applied by another process")
+        version = max(target, schema_version(cx))
+    return version
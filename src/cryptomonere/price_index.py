@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+import logging
+from typing import Iterable
+
+from cryptomonere.config import get_config
+from cryptomonere.SqlHandler import SqlHandler
+
+logger = logging.getLogger(__name__)
+
+# First id (halved) of the history ranges a rebuild reads from the archive. Historical rowids stay far below it.
+ARCHIVED_HISTORY_IDS = 2**61
+
+
+def last_at_many(pairs: Iterable[tuple[str, float]]) -> list[tuple[str, float, str | None]]:
+    """Answer "when was SYMBOL last at PRICE" for many (symbol, price) pairs in one query over the price_interval index.
+
+    Returns (symbol, price, day) in the order given, where day is None if the symbol never reached the price.
+    """
+    SQL = SqlHandler()
+    SQL.cx.execute("create temp table if not exists price_queries (symbol varchar(10), price real)")
+    SQL.cx.execute("delete from temp.price_queries")
+    SQL.cx.executemany("insert into temp.price_queries (symbol, price) values (?, ?)", [(symbol, float(price)) for symbol, price in pairs])
+    results = SQL.sql_file("price_interval_last_at.sql", params=())
+    SQL.cx.commit()
+    return results
+
+
+def last_at(symbol: str, price: float) -> str | None:
+    return last_at_many([(symbol, price)])[0][2]
+
+
+def stage_symbols(SQL: SqlHandler, symbols: Iterable[str]):
+    """Stage the symbols whose quote segments price_interval_quote_segments.sql inserts"""
+    SQL.cx.execute("create temp table if not exists price_interval_rebuild (symbol varchar(10) primary key)")
+    SQL.cx.execute("delete from temp.price_interval_rebuild")
+    SQL.cx.executemany("insert or ignore into temp.price_interval_rebuild (symbol) values (?)", [(symbol,) for symbol in symbols])
+
+
+def archived_history() -> list[tuple[str, str, float, float]]:
+    """(symbol, StartDate, low, high) of the archived history rows which are not also in the historical table"""
+    if not get_config().archive_dir.joinpath("historical").exists():
+        return []
+    import polars as pl
+
+    from cryptomonere import archive
+
+    history = archive.scan("historical", None, ["Symbol", "StartDate", "EndDate", "Low", "High"])
+    rows = history.filter(pl.col("Low").is_not_null() & pl.col("High").is_not_null()).collect().rows()
+    stored = set(SqlHandler().sql("select Symbol, EndDate from historical"))
+    return sorted((symbol, start, low, high) for symbol, start, end, low, high in rows if (symbol, end) not in stored)
+
+
+def rebuild():
+    """Rebuild the price_interval index, e.g. after quotes were inserted out of order.
+
+    Quote segments are recomputed from quote_fact, and from the hourly rollups for the hours whose quotes were pruned or archived.
+    History is read from the historical table and the archive, so a rebuild keeps the ranges of every price ever stored.
+    """
+    SQL = SqlHandler()
+    archived = archived_history()
+    with SQL.transaction():
+        SQL.cx.execute("delete from price_interval")
+        SQL.cx.execute("insert or ignore into price_interval_symbol (symbol) select symbol from asset union select symbol from historical")
+        SQL.cx.executemany("insert or ignore into price_interval_symbol (symbol) values (?)", {(row[0],) for row in archived})
+        stage_symbols(SQL, SQL.listQuery("select symbol from price_interval_symbol"))
+        SQL.sql_file("price_interval_quote_segments.sql", params=())
+        SQL.sql_file("price_interval_history.sql", params=())
+        # archived rows have no rowid any more, so they are numbered in an odd id range of their own, above any historical rowid
+        SQL.cx.executemany(
+            """
+            insert into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+            select ?, s.id, s.id, ?, ?, julianday(date(?)), julianday(date(?)), ?, ?, date(?)
+            from price_interval_symbol s
+            where s.symbol = ?
+            """,
+            [((ARCHIVED_HISTORY_IDS + i) * 2 + 1, low, high, start, start, low, high, start, symbol) for i, (symbol, start, low, high) in enumerate(archived)],
+        )
+    logger.info(f"price_interval index rebuilt, with {len(archived)} days of archived history")
+
+
+def resegment(symbols: Iterable[str]):
+    """Recompute the quote segments of symbols, e.g. after their quotes moved to another asset id, leaving the rest of the index"""
+    SQL = SqlHandler()
+    symbols = list(symbols)
+    with SQL.transaction():
+        for (symbol_id,) in SQL.cx.execute(f"select id from price_interval_symbol where symbol in ({', '.join('?' for _ in symbols)})", symbols).fetchall():
+            SQL.cx.execute("delete from price_interval where symbol_lo <= ? and symbol_hi >= ? and id % 2 = 0", (symbol_id, symbol_id))
+        stage_symbols(SQL, symbols)
+        SQL.sql_file("price_interval_quote_segments.sql", params=())
+    logger.debug(f"Recomputed the price_interval segments of {len(symbols)} symbols")
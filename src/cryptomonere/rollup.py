@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+from cryptomonere.config import get_config
+from cryptomonere.SqlHandler import SqlHandler
+
+logger = logging.getLogger(__name__)
+
+# A rollup is only used for a range if it still has at least this many buckets in it, e.g. daily rows from 500 days up
+MIN_POINTS = 500
+
+# (table, length of its times) from coarsest to finest. Times are the start of an ISO 8601 time, e.g. 2024-01-01T00 for an hour.
+resolutions = (
+    ("quote_daily", 10),
+    ("quote_hourly", 13),
+    ("quote", 19),
+)
+TIME_PADDING = "0000-01-01T00:00:00"
+
+
+def to_datetime(column: str, length: int):
+    """polars expression parsing a column of times truncated to length characters, e.g. 2024-01-01T00 or 2024-01-01"""
+    import polars as pl
+
+    return pl.concat_str(pl.col(column).cast(pl.String).str.slice(0, length), pl.lit(TIME_PADDING[length:])).str.to_datetime("%Y-%m-%dT%H:%M:%S")
+
+
+def retention_cutoff() -> str | None:
+    """last_updated before which raw quotes are deleted, if the config sets quote_retention_days"""
+    days = get_config().quote_retention_days
+    if days is None:
+        return None
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def table_for(start: datetime, end: datetime) -> tuple[str, int]:
+    """Coarsest of quote_daily, quote_hourly and quote which has MIN_POINTS buckets between start and end, as an entry of resolutions"""
+    span = end - start
+    if span >= timedelta(days=MIN_POINTS):
+        return resolutions[0]
+    cutoff = retention_cutoff()
+    if span >= timedelta(hours=MIN_POINTS) or (cutoff is not None and start.strftime("%Y-%m-%dT%H:%M:%S") < cutoff):
+        return resolutions[1]
+    return resolutions[2]
+
+
+def price_series(symbol: str, start: str | None = None, end: str | None = None):
+    """Quoted prices of a symbol between start and end (defaulting to all of them) from the coarsest table that fits the range.
+
+    Returns a polars DataFrame of (time, price), where price is the close of each bucket for the rollups.
+    """
+    import polars as pl
+
+    SQL = SqlHandler()
+    first, last = SQL.sql("select min(open_at), max(close_at) from quote_daily where symbol = ?", params=(symbol,))[0]
+    if first is None:
+        return pl.DataFrame(schema={"time": pl.Datetime, "price": pl.Float64})
+    start, end = max(start or first, first), min(end or last, last)
+    table, length = table_for(datetime.fromisoformat(start[:19]), datetime.fromisoformat(end[:19]))
+    if table == "quote":
+        from cryptomonere import archive
+
+        quotes = archive.scan("quote", [symbol], ["last_updated", "price"], start, end)
+        series = quotes.filter(pl.col("price").is_not_null()).sort("last_updated").rename({"last_updated": "time"}).collect()
+    else:
+        query = f"select bucket as time, close as price from {table} where symbol = ? and bucket between ? and ? order by bucket"
+        series = SQL.sql_df(query, [symbol, start[:length], end[:length]])
+    logger.debug(f"Read {series.height} {symbol} prices from {table}")
+    return series.select(to_datetime("time", length), pl.col("price").cast(pl.Float64))
+
+
+def prune() -> int:
+    """Delete raw quotes older than quote_retention_days whose hour has been rolled up. Returns the number of quotes deleted."""
+    cutoff = retention_cutoff()
+    if cutoff is None:
+        return 0
+    SQL = SqlHandler()
+    deleted = 0
+    with SQL.transaction():
+        # one indexed range delete per symbol, rather than a scan of the whole table
+        for (symbol,) in SQL.cx.execute("select symbol from quote_latest").fetchall():
+            deleted += SQL.cx.execute(
+                """
+                delete from quote_fact
+                where id in (select id from asset where symbol = ?) and last_updated < ?
+                    and (price is null or exists (select 1 from quote_hourly h where h.symbol = ? and h.bucket = substr(quote_fact.last_updated, 1, 13)))
+                """,
+                (symbol, cutoff, symbol),
+            ).rowcount
+    if deleted:
+        logger.info(f"Deleted {deleted} quotes from before {cutoff}, their hourly and daily rollups are kept")
+    return deleted
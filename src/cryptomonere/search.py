@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+import bisect
+import logging
+import pickle
+import re
+
+from cryptomonere.config import get_config
+from cryptomonere.SqlHandler import SqlHandler
+
+logger = logging.getLogger(__name__)
+
+# Completions kept at each trie node. Queries asking for more fall back to the full text index.
+TRIE_TOP = 20
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query that prefix matches every word, e.g. 'bit cash' -> '"bit"* "cash"*'"""
+    words = re.findall(r"\w+", text)
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in words)
+
+
+def search(text: str, limit: int = 50, offset: int = 0) -> list[tuple]:
+    """Search currency by symbol, name and slug prefixes, best matches first. Rows are (id, symbol, name, slug, currency_rank)."""
+    query = fts_query(text)
+    if query == "":
+        return []
+    return SqlHandler().sql_file("search_currency.sql", params={"query": query, "symbol": text.upper(), "limit": limit, "offset": offset})
+
+
+class Trie:
+    """Prefix tree over the lower case symbols, names, name words and slugs in currency.
+
+    Every node keeps the best TRIE_TOP (currency_rank, id) pairs below it, so a completion is one walk down the prefix.
+    """
+
+    def __init__(self, rows: list[tuple]):
+        self.root = {}
+        self.rows = {}
+        for row in rows:
+            cmc_id, symbol, name, slug, rank = row
+            self.rows[cmc_id] = row
+            entry = (rank if rank is not None else float("inf"), cmc_id)
+            keys = {symbol.lower(), name.lower(), slug.lower(), *name.lower().split()} if name and slug else {symbol.lower()}
+            for key in keys:
+                self.insert(key, entry)
+
+    def insert(self, key: str, entry: tuple):
+        node = self.root
+        for character in key:
+            node = node.setdefault(character, {})
+            top = node.setdefault(None, [])
+            if entry in top:
+                continue
+            bisect.insort(top, entry)
+            if len(top) > TRIE_TOP:
+                top.pop()
+
+    def complete(self, prefix: str, limit: int = 10, offset: int = 0) -> list[tuple]:
+        node = self.root
+        for character in prefix.lower():
+            node = node.get(character)
+            if node is None:
+                return []
+        top = node.get(None, [])
+        return [self.rows[cmc_id] for _, cmc_id in top[offset:][:limit]]
+
+
+def load_trie() -> Trie:
+    """Build the trie, or load it from the cache in the data directory if currency has not changed since it was built"""
+    SQL = SqlHandler()
+    signature = tuple(SQL.sql("select count(*), total(rowid), max(rowid), total(currency_rank) from currency")[0])
+    cache_path = get_config().data_dir.joinpath("search_trie.pickle")
+    if cache_path.exists():
+        with open(cache_path, "rb") as R:
+            cached_signature, trie = pickle.load(R)
+        if cached_signature == signature:
+            return trie
+    logger.debug("Building search trie")
+    trie = Trie(SQL.sql("select id, symbol, name, slug, currency_rank from currency"))
+    with open(cache_path, "wb") as W:
+        pickle.dump((signature, trie), W, protocol=pickle.HIGHEST_PROTOCOL)
+    return trie
@@ -0,0 +1,96 @@
+-- Applies the rows staged in the temp tables by currency_map.refresh in a single transaction,
+-- so the symbol -> id mapping in currency is never seen half updated.
+begin immediate;
+
+insert into cryptocurrency_map (
+    id,
+    currency_rank,
+    name,
+    symbol,
+    slug,
+    is_active,
+    status,
+    first_historical_data,
+    last_historical_data,
+    platform_id,
+    platform_name,
+    platform_symbol,
+    platform_slug
+)
+select
+    id,
+    currency_rank,
+    name,
+    symbol,
+    slug,
+    is_active,
+    status,
+    first_historical_data,
+    last_historical_data,
+    platform_id,
+    platform_name,
+    platform_symbol,
+    platform_slug
+from temp.map_changes where true
+on conflict (id) do update set
+    currency_rank = excluded.currency_rank,
+    name = excluded.name,
+    symbol = excluded.symbol,
+    slug = excluded.slug,
+    is_active = excluded.is_active,
+    status = excluded.status,
+    first_historical_data = excluded.first_historical_data,
+    last_historical_data = excluded.last_historical_data,
+    platform_id = excluded.platform_id,
+    platform_name = excluded.platform_name,
+    platform_symbol = excluded.platform_symbol,
+    platform_slug = excluded.platform_slug;
+
+update cryptocurrency_map set is_active = 0
+where id in (select id from temp.map_removed);
+
+-- Only the symbols touched by this refresh are deduplicated again, keeping the highest ranking active currency
+delete from currency
+where symbol in (select symbol from temp.map_changed_symbols);
+
+insert into currency (
+    id,
+    currency_rank,
+    name,
+    symbol,
+    slug,
+    is_active,
+    status,
+    first_historical_data,
+    last_historical_data,
+    platform_name,
+    platform_symbol,
+    platform_slug
+)
+select
+    id,
+    currency_rank,
+    name,
+    symbol,
+    slug,
+    is_active,
+    status,
+    first_historical_data,
+    last_historical_data,
+    platform_name,
+    platform_symbol,
+    platform_slug
+from (
+    select
+        *,
+        row_number() over (
+            partition by symbol order by currency_rank asc
+        ) as row_rank
+    from cryptocurrency_map
+    where
+        is_active = 1
+        and symbol in (select symbol from temp.map_changed_symbols)
+)
+where row_rank = 1;
+
+commit;
@@ -1,6 +1,5 @@
-Drop Table If Exists cryptocurrency_map;
-Create Table cryptocurrency_map (
-    id int Unique,
+create temp table if not exists map_changes (
+    id int,
     currency_rank int,
     name varchar(50),
     symbol varchar(10),
@@ -14,3 +13,13 @@ Create Table cryptocurrency_map (
     platform_symbol varchar(10),
     platform_slug varchar(50)
 );
+
+create temp table if not exists map_removed (id int);
+
+create temp table if not exists map_changed_symbols (symbol varchar(10) primary key);
+
+delete from temp.map_changes;
+
+delete from temp.map_removed;
+
+delete from temp.map_changed_symbols;
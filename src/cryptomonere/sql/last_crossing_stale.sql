@@ -0,0 +1,7 @@
+-- Symbols whose latest price differs from the price their last crossings were computed for
+select
+    q.symbol,
+    q.price
+from quote_latest q
+left join last_crossing c on q.symbol = c.symbol
+where c.price is not q.price and q.price is not null
@@ -0,0 +1,59 @@
+-- Initial schema. Databases created before migrations were introduced may already have some of these tables,
+-- and older versions created the history table under the name "history" while everything reads "historical".
+create table if not exists historical (
+    Symbol varchar(6),
+    StartDate Date,
+    EndDate Date,
+    Open Real,
+    High Real,
+    Low Real,
+    Close Real,
+    Volume Real,
+    Market_Cap Real
+);
+
+create table if not exists history (
+    Symbol varchar(6),
+    StartDate Date,
+    EndDate Date,
+    Open Real,
+    High Real,
+    Low Real,
+    Close Real,
+    Volume Real,
+    Market_Cap Real
+);
+
+insert into historical select * from history;
+
+drop table history;
+
+create table if not exists quote (
+    id int,
+    timestamp datetime,
+    name varchar(50),
+    symbol varchar(6),
+    date_added datetime,
+    max_supply Bigint,
+    circulating_supply real,
+    is_active tinyint,
+    infinite_supply tinyint,
+    minted_market_cap real,
+    cmc_rank smallint,
+    is_fiat tinyint,
+    self_reported_circulating_supply numeric,
+    self_reported_market_cap real,
+    last_updated datetime,
+    price real,
+    volume_24h real,
+    volume_change_24h real,
+    percent_change_1h real,
+    percent_change_24h real,
+    percent_change_7d real,
+    percent_change_30d real,
+    percent_change_60d real,
+    percent_change_90d real,
+    market_cap real,
+    market_cap_dominance real,
+    fully_diluted_market_cap real
+);
@@ -0,0 +1,166 @@
+drop table if exists quote_latest;
+drop trigger if exists quote_latest_upsert;
+
+create table quote_latest (
+    id int,
+    timestamp datetime,
+    name varchar(50),
+    symbol varchar(6) primary key,
+    date_added datetime,
+    max_supply Bigint,
+    circulating_supply real,
+    is_active tinyint,
+    infinite_supply tinyint,
+    minted_market_cap real,
+    cmc_rank smallint,
+    is_fiat tinyint,
+    self_reported_circulating_supply numeric,
+    self_reported_market_cap real,
+    last_updated datetime,
+    price real,
+    volume_24h real,
+    volume_change_24h real,
+    percent_change_1h real,
+    percent_change_24h real,
+    percent_change_7d real,
+    percent_change_30d real,
+    percent_change_60d real,
+    percent_change_90d real,
+    market_cap real,
+    market_cap_dominance real,
+    fully_diluted_market_cap real
+);
+
+-- Keep quote_latest current as quotes are inserted, instead of rebuilding it from the whole quote table
+create trigger quote_latest_upsert after insert on quote
+begin
+    insert or replace into quote_latest (
+        id,
+        timestamp,
+        name,
+        symbol,
+        date_added,
+        max_supply,
+        circulating_supply,
+        is_active,
+        infinite_supply,
+        minted_market_cap,
+        cmc_rank,
+        is_fiat,
+        self_reported_circulating_supply,
+        self_reported_market_cap,
+        last_updated,
+        price,
+        volume_24h,
+        volume_change_24h,
+        percent_change_1h,
+        percent_change_24h,
+        percent_change_7d,
+        percent_change_30d,
+        percent_change_60d,
+        percent_change_90d,
+        market_cap,
+        market_cap_dominance,
+        fully_diluted_market_cap
+    )
+    select
+        new.id,
+        new.timestamp,
+        new.name,
+        new.symbol,
+        new.date_added,
+        new.max_supply,
+        new.circulating_supply,
+        new.is_active,
+        new.infinite_supply,
+        new.minted_market_cap,
+        new.cmc_rank,
+        new.is_fiat,
+        new.self_reported_circulating_supply,
+        new.self_reported_market_cap,
+        new.last_updated,
+        new.price,
+        new.volume_24h,
+        new.volume_change_24h,
+        new.percent_change_1h,
+        new.percent_change_24h,
+        new.percent_change_7d,
+        new.percent_change_30d,
+        new.percent_change_60d,
+        new.percent_change_90d,
+        new.market_cap,
+        new.market_cap_dominance,
+        new.fully_diluted_market_cap
+    where new.last_updated >= coalesce(
+        (select last_updated from quote_latest where symbol = new.symbol), ''
+    );
+end;
+
+delete from quote_latest;
+
+insert into quote_latest (
+    id,
+    timestamp,
+    name,
+    symbol,
+    date_added,
+    max_supply,
+    circulating_supply,
+    is_active,
+    infinite_supply,
+    minted_market_cap,
+    cmc_rank,
+    is_fiat,
+    self_reported_circulating_supply,
+    self_reported_market_cap,
+    last_updated,
+    price,
+    volume_24h,
+    volume_change_24h,
+    percent_change_1h,
+    percent_change_24h,
+    percent_change_7d,
+    percent_change_30d,
+    percent_change_60d,
+    percent_change_90d,
+    market_cap,
+    market_cap_dominance,
+    fully_diluted_market_cap
+)
+select
+    id,
+    timestamp,
+    name,
+    symbol,
+    date_added,
+    max_supply,
+    circulating_supply,
+    is_active,
+    infinite_supply,
+    minted_market_cap,
+    cmc_rank,
+    is_fiat,
+    self_reported_circulating_supply,
+    self_reported_market_cap,
+    last_updated,
+    price,
+    volume_24h,
+    volume_change_24h,
+    percent_change_1h,
+    percent_change_24h,
+    percent_change_7d,
+    percent_change_30d,
+    percent_change_60d,
+    percent_change_90d,
+    market_cap,
+    market_cap_dominance,
+    fully_diluted_market_cap
+from (
+    select
+        *,
+        row_number() over (
+            partition by symbol order by last_updated desc
+        ) as is_latest
+    from quote
+)
+where is_latest = 1;
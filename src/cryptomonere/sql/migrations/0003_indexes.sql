@@ -0,0 +1,12 @@
+-- Symbols are compared with equality (so these indexes can be used), so store them upper case like the api returns them
+update historical set symbol = upper(symbol);
+
+-- Loading the same history file twice used to insert every row again. Keep the most recently loaded copy.
+delete from historical
+where rowid not in (
+    select max(rowid) from historical group by symbol, enddate
+);
+
+create unique index if not exists historical_symbol_enddate on historical (symbol, enddate);
+
+create index if not exists quote_symbol_last_updated on quote (symbol, last_updated);
@@ -0,0 +1,37 @@
+-- cryptocurrency_map and currency are now updated in place by "monere map" instead of being dropped and recreated
+create table if not exists cryptocurrency_map (
+    id int unique,
+    currency_rank int,
+    name varchar(50),
+    symbol varchar(10),
+    slug varchar(50),
+    is_active tinyint,
+    status tinyint,
+    first_historical_data datetime,
+    last_historical_data datetime,
+    platform_id int,
+    platform_name varchar(50),
+    platform_symbol varchar(10),
+    platform_slug varchar(50)
+);
+
+create index if not exists cryptocurrency_map_symbol on cryptocurrency_map (symbol, currency_rank);
+
+create table if not exists currency (
+    id int,
+    currency_rank int,
+    name varchar(50),
+    symbol varchar(10),
+    slug varchar(50),
+    is_active tinyint,
+    status tinyint,
+    first_historical_data datetime,
+    last_historical_data datetime,
+    platform_name varchar(50),
+    platform_symbol varchar(10),
+    platform_slug varchar(50)
+);
+
+drop index if exists currency_symbol;
+
+create unique index currency_symbol on currency (symbol);
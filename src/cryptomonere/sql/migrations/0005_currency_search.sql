@@ -0,0 +1,31 @@
+-- Full text (and prefix) index over currency for "monere search", kept in sync with currency by triggers
+create virtual table currency_search using fts5 (
+    symbol,
+    name,
+    slug,
+    content = 'currency',
+    content_rowid = 'rowid',
+    prefix = '1 2 3'
+);
+
+create trigger currency_search_insert after insert on currency
+begin
+    insert into currency_search (rowid, symbol, name, slug)
+    values (new.rowid, new.symbol, new.name, new.slug);
+end;
+
+create trigger currency_search_delete after delete on currency
+begin
+    insert into currency_search (currency_search, rowid, symbol, name, slug)
+    values ('delete', old.rowid, old.symbol, old.name, old.slug);
+end;
+
+create trigger currency_search_update after update on currency
+begin
+    insert into currency_search (currency_search, rowid, symbol, name, slug)
+    values ('delete', old.rowid, old.symbol, old.name, old.slug);
+    insert into currency_search (rowid, symbol, name, slug)
+    values (new.rowid, new.symbol, new.name, new.slug);
+end;
+
+insert into currency_search (currency_search) values ('rebuild');
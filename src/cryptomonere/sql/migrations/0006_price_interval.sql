@@ -0,0 +1,122 @@
+-- Index of the price ranges each symbol has covered, so "when was SYMBOL last at PRICE" is an R*Tree lookup instead of a scan
+-- of its whole history. R*Tree coordinates are 32 bit floats rounded outwards, so the exact low/high are kept alongside
+-- (as auxiliary columns) to confirm the candidates the tree returns.
+create table price_interval_symbol (
+    id integer primary key,
+    symbol varchar(10) unique
+);
+
+create virtual table price_interval using rtree (
+    id,
+    symbol_lo,
+    symbol_hi,
+    price_lo,
+    price_hi,
+    day_lo,
+    day_hi,
+    +low real,
+    +high real,
+    +day text
+);
+
+create trigger price_interval_quote after insert on quote
+when new.price is not null
+begin
+    insert or ignore into price_interval_symbol (symbol) values (new.symbol);
+    insert into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+    select
+        new.rowid * 2,
+        s.id,
+        s.id,
+        min(p.price, new.price),
+        max(p.price, new.price),
+        julianday(date(p.last_updated)),
+        julianday(date(new.last_updated)),
+        min(p.price, new.price),
+        max(p.price, new.price),
+        date(new.last_updated)
+    from (
+        select price, last_updated from quote
+        where
+            symbol = new.symbol
+            and last_updated < new.last_updated
+            and price is not null
+        order by last_updated desc
+        limit 1
+    ) p
+    inner join price_interval_symbol s on s.symbol = new.symbol;
+end;
+
+create trigger price_interval_historical_insert after insert on historical
+when new.low is not null and new.high is not null
+begin
+    insert or ignore into price_interval_symbol (symbol) values (new.symbol);
+    insert or replace into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+    select new.rowid * 2 + 1, s.id, s.id, new.low, new.high, julianday(new.enddate), julianday(new.enddate), new.low, new.high, new.enddate
+    from price_interval_symbol s
+    where s.symbol = new.symbol;
+end;
+
+create trigger price_interval_historical_update after update on historical
+begin
+    delete from price_interval where id = old.rowid * 2 + 1;
+    insert or ignore into price_interval_symbol (symbol) values (new.symbol);
+    insert into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+    select new.rowid * 2 + 1, s.id, s.id, new.low, new.high, julianday(new.enddate), julianday(new.enddate), new.low, new.high, new.enddate
+    from price_interval_symbol s
+    where s.symbol = new.symbol and new.low is not null and new.high is not null;
+end;
+
+create trigger price_interval_historical_delete after delete on historical
+begin
+    delete from price_interval where id = old.rowid * 2 + 1;
+end;
+
+insert or ignore into price_interval_symbol (symbol)
+select symbol from quote
+union
+select symbol from historical;
+
+-- Segments between consecutive quotes of a symbol. A segment's id is twice the rowid of the quote that ends it.
+insert into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+select
+    q.rowid * 2,
+    s.id,
+    s.id,
+    min(q.prev_price, q.price),
+    max(q.prev_price, q.price),
+    julianday(date(q.prev_updated)),
+    julianday(date(q.last_updated)),
+    min(q.prev_price, q.price),
+    max(q.prev_price, q.price),
+    date(q.last_updated)
+from (
+    select
+        rowid,
+        symbol,
+        price,
+        last_updated,
+        lag(price) over (win) as prev_price,
+        lag(last_updated) over (win) as prev_updated
+    from quote
+    window win as (partition by symbol order by last_updated asc)
+) q
+inner join price_interval_symbol s on q.symbol = s.symbol
+where q.prev_price is not null and q.price is not null;
+
+-- Daily low/high ranges of the loaded history. Their ids are twice the historical rowid plus one.
+insert into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+select
+    h.rowid * 2 + 1,
+    s.id,
+    s.id,
+    h.low,
+    h.high,
+    julianday(h.enddate),
+    julianday(h.enddate),
+    h.low,
+    h.high,
+    h.enddate
+from historical h
+inner join price_interval_symbol s on h.symbol = s.symbol
+where h.low is not null and h.high is not null;
@@ -0,0 +1,8 @@
+-- Last day each symbol was at double and at half of its latest price. Rows are recomputed by crossings.refresh only when a
+-- symbol's latest price moves, instead of joining every historical segment against quote_latest on each report.
+create table last_crossing (
+    symbol varchar(10) primary key,
+    price real,
+    last_at_double date,
+    last_at_half date
+);
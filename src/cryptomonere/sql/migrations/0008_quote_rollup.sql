@@ -0,0 +1,116 @@
+-- Hourly and daily OHLC rollups of quote, so graphs and reports over long ranges read one row per bucket instead of every
+-- snapshot, and old snapshots can be deleted without losing their history. Buckets are the first 13 (hourly) or 10 (daily)
+-- characters of last_updated. open_at and close_at are the last_updated of the open and close snapshots, so quotes inserted
+-- out of order still end up in the right place. volume_24h is taken from the close snapshot.
+create table quote_hourly (
+    symbol varchar(10) not null,
+    bucket text not null,
+    open real,
+    high real,
+    low real,
+    close real,
+    volume_24h real,
+    open_at datetime,
+    close_at datetime,
+    samples integer,
+    primary key (symbol, bucket)
+) without rowid;
+
+create table quote_daily (
+    symbol varchar(10) not null,
+    bucket text not null,
+    open real,
+    high real,
+    low real,
+    close real,
+    volume_24h real,
+    open_at datetime,
+    close_at datetime,
+    samples integer,
+    primary key (symbol, bucket)
+) without rowid;
+
+-- Only the hour and day a new quote falls in are touched
+create trigger quote_rollup after insert on quote
+when new.price is not null
+begin
+    insert into quote_hourly (symbol, bucket, open, high, low, close, volume_24h, open_at, close_at, samples)
+    values (new.symbol, substr(new.last_updated, 1, 13), new.price, new.price, new.price, new.price, new.volume_24h, new.last_updated, new.last_updated, 1)
+    on conflict (symbol, bucket) do update set
+        open = case when excluded.open_at < open_at then excluded.open else open end,
+        high = max(high, excluded.high),
+        low = min(low, excluded.low),
+        close = case when excluded.close_at >= close_at then excluded.close else close end,
+        volume_24h = case when excluded.close_at >= close_at then excluded.volume_24h else volume_24h end,
+        open_at = min(open_at, excluded.open_at),
+        close_at = max(close_at, excluded.close_at),
+        samples = samples + 1;
+
+    insert into quote_daily (symbol, bucket, open, high, low, close, volume_24h, open_at, close_at, samples)
+    values (new.symbol, substr(new.last_updated, 1, 10), new.price, new.price, new.price, new.price, new.volume_24h, new.last_updated, new.last_updated, 1)
+    on conflict (symbol, bucket) do update set
+        open = case when excluded.open_at < open_at then excluded.open else open end,
+        high = max(high, excluded.high),
+        low = min(low, excluded.low),
+        close = case when excluded.close_at >= close_at then excluded.close else close end,
+        volume_24h = case when excluded.close_at >= close_at then excluded.volume_24h else volume_24h end,
+        open_at = min(open_at, excluded.open_at),
+        close_at = max(close_at, excluded.close_at),
+        samples = samples + 1;
+end;
+
+insert into quote_hourly (symbol, bucket, open, high, low, close, volume_24h, open_at, close_at, samples)
+select
+    symbol,
+    bucket,
+    max(case when first_in_bucket = 1 then price end),
+    max(price),
+    min(price),
+    max(case when last_in_bucket = 1 then price end),
+    max(case when last_in_bucket = 1 then volume_24h end),
+    min(last_updated),
+    max(last_updated),
+    count(*)
+from (
+    select
+        symbol,
+        substr(last_updated, 1, 13) as bucket,
+        price,
+        volume_24h,
+        last_updated,
+        row_number() over (partition by symbol, substr(last_updated, 1, 13) order by last_updated asc) as first_in_bucket,
+        row_number() over (partition by symbol, substr(last_updated, 1, 13) order by last_updated desc) as last_in_bucket
+    from quote
+    where price is not null
+)
+group by symbol, bucket;
+
+insert into quote_daily (symbol, bucket, open, high, low, close, volume_24h, open_at, close_at, samples)
+select
+    symbol,
+    bucket,
+    max(case when first_in_bucket = 1 then open end),
+    max(high),
+    min(low),
+    max(case when last_in_bucket = 1 then close end),
+    max(case when last_in_bucket = 1 then volume_24h end),
+    min(open_at),
+    max(close_at),
+    sum(samples)
+from (
+    select
+        symbol,
+        substr(bucket, 1, 10) as bucket,
+        open,
+        high,
+        low,
+        close,
+        volume_24h,
+        open_at,
+        close_at,
+        samples,
+        row_number() over (partition by symbol, substr(bucket, 1, 10) order by open_at asc) as first_in_bucket,
+        row_number() over (partition by symbol, substr(bucket, 1, 10) order by close_at desc) as last_in_bucket
+    from quote_hourly
+)
+group by symbol, bucket;
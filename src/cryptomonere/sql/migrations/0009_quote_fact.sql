@@ -0,0 +1,393 @@
+-- Split quote into a per-asset dimension table and a narrow fact table. The fields that (almost) never change are stored once
+-- per asset instead of in every snapshot, and the snapshots live in a WITHOUT ROWID table clustered by (id, last_updated), which
+-- is also the key that makes a snapshot unique. quote becomes a view over the two, with triggers so existing inserts and deletes
+-- keep working. The dimension keeps the latest values of the static fields.
+create table asset (
+    id integer primary key,
+    symbol varchar(10),
+    name varchar(50),
+    date_added datetime,
+    max_supply Bigint,
+    infinite_supply tinyint,
+    is_fiat tinyint
+);
+
+create index asset_symbol on asset (symbol);
+
+create table quote_fact (
+    id integer not null,
+    last_updated datetime not null,
+    timestamp datetime,
+    price real,
+    volume_24h real,
+    volume_change_24h real,
+    percent_change_1h real,
+    percent_change_24h real,
+    percent_change_7d real,
+    percent_change_30d real,
+    percent_change_60d real,
+    percent_change_90d real,
+    market_cap real,
+    market_cap_dominance real,
+    fully_diluted_market_cap real,
+    circulating_supply real,
+    self_reported_circulating_supply numeric,
+    self_reported_market_cap real,
+    minted_market_cap real,
+    cmc_rank smallint,
+    is_active tinyint,
+    primary key (id, last_updated)
+) without rowid;
+
+-- Quotes stored without a coinmarketcap id get the id other quotes of their symbol have, or a negative one of their own
+create temp table quote_asset_id as
+select symbol, coalesce(max(id), -row_number() over (order by symbol)) as id
+from quote
+group by symbol;
+
+insert into asset (id, symbol, name, date_added, max_supply, infinite_supply, is_fiat)
+select asset_id, symbol, name, date_added, max_supply, infinite_supply, is_fiat
+from (
+    select
+        coalesce(q.id, s.id) as asset_id,
+        q.symbol,
+        q.name,
+        q.date_added,
+        q.max_supply,
+        q.infinite_supply,
+        q.is_fiat,
+        row_number() over (partition by coalesce(q.id, s.id) order by q.last_updated desc) as newest
+    from quote q
+    inner join temp.quote_asset_id s on s.symbol = q.symbol
+)
+where newest = 1;
+
+-- Repeated snapshots (same asset and last_updated) are stored once
+insert or ignore into quote_fact (
+    id,
+    last_updated,
+    timestamp,
+    price,
+    volume_24h,
+    volume_change_24h,
+    percent_change_1h,
+    percent_change_24h,
+    percent_change_7d,
+    percent_change_30d,
+    percent_change_60d,
+    percent_change_90d,
+    market_cap,
+    market_cap_dominance,
+    fully_diluted_market_cap,
+    circulating_supply,
+    self_reported_circulating_supply,
+    self_reported_market_cap,
+    minted_market_cap,
+    cmc_rank,
+    is_active
+)
+select
+    coalesce(q.id, s.id),
+    q.last_updated,
+    q.timestamp,
+    q.price,
+    q.volume_24h,
+    q.volume_change_24h,
+    q.percent_change_1h,
+    q.percent_change_24h,
+    q.percent_change_7d,
+    q.percent_change_30d,
+    q.percent_change_60d,
+    q.percent_change_90d,
+    q.market_cap,
+    q.market_cap_dominance,
+    q.fully_diluted_market_cap,
+    q.circulating_supply,
+    q.self_reported_circulating_supply,
+    q.self_reported_market_cap,
+    q.minted_market_cap,
+    q.cmc_rank,
+    q.is_active
+from quote q
+inner join temp.quote_asset_id s on s.symbol = q.symbol
+where q.last_updated is not null
+order by 1, 2;
+
+drop table temp.quote_asset_id;
+
+-- Dropping the table also drops its index and the quote_latest_upsert, price_interval_quote and quote_rollup triggers,
+-- which are recreated on quote_fact below
+drop table quote;
+
+create view quote as
+select
+    f.id,
+    f.timestamp,
+    a.name,
+    a.symbol,
+    a.date_added,
+    a.max_supply,
+    f.circulating_supply,
+    f.is_active,
+    a.infinite_supply,
+    f.minted_market_cap,
+    f.cmc_rank,
+    a.is_fiat,
+    f.self_reported_circulating_supply,
+    f.self_reported_market_cap,
+    f.last_updated,
+    f.price,
+    f.volume_24h,
+    f.volume_change_24h,
+    f.percent_change_1h,
+    f.percent_change_24h,
+    f.percent_change_7d,
+    f.percent_change_30d,
+    f.percent_change_60d,
+    f.percent_change_90d,
+    f.market_cap,
+    f.market_cap_dominance,
+    f.fully_diluted_market_cap
+from quote_fact f
+inner join asset a on a.id = f.id;
+
+create trigger quote_insert instead of insert on quote
+begin
+    insert into asset (id, symbol, name, date_added, max_supply, infinite_supply, is_fiat)
+    values (
+        coalesce(new.id, (select max(id) from asset where symbol = new.symbol), (select min(coalesce(min(id), 0), 0) - 1 from asset)),
+        new.symbol,
+        new.name,
+        new.date_added,
+        new.max_supply,
+        new.infinite_supply,
+        new.is_fiat
+    )
+    on conflict (id) do update set
+        symbol = excluded.symbol,
+        name = excluded.name,
+        date_added = excluded.date_added,
+        max_supply = excluded.max_supply,
+        infinite_supply = excluded.infinite_supply,
+        is_fiat = excluded.is_fiat
+    where
+        symbol is not excluded.symbol
+        or name is not excluded.name
+        or date_added is not excluded.date_added
+        or max_supply is not excluded.max_supply
+        or infinite_supply is not excluded.infinite_supply
+        or is_fiat is not excluded.is_fiat;
+
+    insert into quote_fact (
+        id,
+        last_updated,
+        timestamp,
+        price,
+        volume_24h,
+        volume_change_24h,
+        percent_change_1h,
+        percent_change_24h,
+        percent_change_7d,
+        percent_change_30d,
+        percent_change_60d,
+        percent_change_90d,
+        market_cap,
+        market_cap_dominance,
+        fully_diluted_market_cap,
+        circulating_supply,
+        self_reported_circulating_supply,
+        self_reported_market_cap,
+        minted_market_cap,
+        cmc_rank,
+        is_active
+    )
+    values (
+        coalesce(new.id, (select max(id) from asset where symbol = new.symbol)),
+        new.last_updated,
+        new.timestamp,
+        new.price,
+        new.volume_24h,
+        new.volume_change_24h,
+        new.percent_change_1h,
+        new.percent_change_24h,
+        new.percent_change_7d,
+        new.percent_change_30d,
+        new.percent_change_60d,
+        new.percent_change_90d,
+        new.market_cap,
+        new.market_cap_dominance,
+        new.fully_diluted_market_cap,
+        new.circulating_supply,
+        new.self_reported_circulating_supply,
+        new.self_reported_market_cap,
+        new.minted_market_cap,
+        new.cmc_rank,
+        new.is_active
+    )
+    -- the api returns the same snapshot until coinmarketcap updates it, so polling faster than that repeats snapshots
+    on conflict (id, last_updated) do nothing;
+end;
+
+create trigger quote_delete instead of delete on quote
+begin
+    delete from quote_fact where id = old.id and last_updated = old.last_updated;
+end;
+
+create trigger quote_latest_upsert after insert on quote_fact
+begin
+    insert or replace into quote_latest (
+        id,
+        timestamp,
+        name,
+        symbol,
+        date_added,
+        max_supply,
+        circulating_supply,
+        is_active,
+        infinite_supply,
+        minted_market_cap,
+        cmc_rank,
+        is_fiat,
+        self_reported_circulating_supply,
+        self_reported_market_cap,
+        last_updated,
+        price,
+        volume_24h,
+        volume_change_24h,
+        percent_change_1h,
+        percent_change_24h,
+        percent_change_7d,
+        percent_change_30d,
+        percent_change_60d,
+        percent_change_90d,
+        market_cap,
+        market_cap_dominance,
+        fully_diluted_market_cap
+    )
+    select
+        new.id,
+        new.timestamp,
+        a.name,
+        a.symbol,
+        a.date_added,
+        a.max_supply,
+        new.circulating_supply,
+        new.is_active,
+        a.infinite_supply,
+        new.minted_market_cap,
+        new.cmc_rank,
+        a.is_fiat,
+        new.self_reported_circulating_supply,
+        new.self_reported_market_cap,
+        new.last_updated,
+        new.price,
+        new.volume_24h,
+        new.volume_change_24h,
+        new.percent_change_1h,
+        new.percent_change_24h,
+        new.percent_change_7d,
+        new.percent_change_30d,
+        new.percent_change_60d,
+        new.percent_change_90d,
+        new.market_cap,
+        new.market_cap_dominance,
+        new.fully_diluted_market_cap
+    from asset a
+    where a.id = new.id and new.last_updated >= coalesce(
+        (select last_updated from quote_latest where symbol = a.symbol), ''
+    );
+end;
+
+create trigger quote_rollup after insert on quote_fact
+when new.price is not null
+begin
+    insert into quote_hourly (symbol, bucket, open, high, low, close, volume_24h, open_at, close_at, samples)
+    select a.symbol, substr(new.last_updated, 1, 13), new.price, new.price, new.price, new.price, new.volume_24h, new.last_updated, new.last_updated, 1
+    from asset a
+    where a.id = new.id
+    on conflict (symbol, bucket) do update set
+        open = case when excluded.open_at < open_at then excluded.open else open end,
+        high = max(high, excluded.high),
+        low = min(low, excluded.low),
+        close = case when excluded.close_at >= close_at then excluded.close else close end,
+        volume_24h = case when excluded.close_at >= close_at then excluded.volume_24h else volume_24h end,
+        open_at = min(open_at, excluded.open_at),
+        close_at = max(close_at, excluded.close_at),
+        samples = samples + 1;
+
+    insert into quote_daily (symbol, bucket, open, high, low, close, volume_24h, open_at, close_at, samples)
+    select a.symbol, substr(new.last_updated, 1, 10), new.price, new.price, new.price, new.price, new.volume_24h, new.last_updated, new.last_updated, 1
+    from asset a
+    where a.id = new.id
+    on conflict (symbol, bucket) do update set
+        open = case when excluded.open_at < open_at then excluded.open else open end,
+        high = max(high, excluded.high),
+        low = min(low, excluded.low),
+        close = case when excluded.close_at >= close_at then excluded.close else close end,
+        volume_24h = case when excluded.close_at >= close_at then excluded.volume_24h else volume_24h end,
+        open_at = min(open_at, excluded.open_at),
+        close_at = max(close_at, excluded.close_at),
+        samples = samples + 1;
+end;
+
+-- Quote segments were keyed by the quote rowid, which quote_fact does not have. A segment's id is now twice
+-- (asset id * 2^42 + milliseconds since 1970 of the quote that ends it), which is still even and unique.
+create trigger price_interval_quote after insert on quote_fact
+when new.price is not null and julianday(new.last_updated) is not null
+begin
+    insert or ignore into price_interval_symbol (symbol) select symbol from asset where id = new.id;
+    insert or replace into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+    select
+        (new.id * 4398046511104 + cast(round((julianday(new.last_updated) - 2440587.5) * 86400000) as integer)) * 2,
+        s.id,
+        s.id,
+        min(p.price, new.price),
+        max(p.price, new.price),
+        julianday(date(p.last_updated)),
+        julianday(date(new.last_updated)),
+        min(p.price, new.price),
+        max(p.price, new.price),
+        date(new.last_updated)
+    from (
+        select price, last_updated from quote_fact
+        where
+            id = new.id
+            and last_updated < new.last_updated
+            and price is not null
+        order by last_updated desc
+        limit 1
+    ) p
+    inner join asset a on a.id = new.id
+    inner join price_interval_symbol s on s.symbol = a.symbol;
+end;
+
+delete from price_interval where id % 2 = 0;
+
+insert or ignore into price_interval_symbol (symbol) select symbol from asset;
+
+insert into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+select
+    (q.id * 4398046511104 + cast(round((julianday(q.last_updated) - 2440587.5) * 86400000) as integer)) * 2,
+    s.id,
+    s.id,
+    min(q.prev_price, q.price),
+    max(q.prev_price, q.price),
+    julianday(date(q.prev_updated)),
+    julianday(date(q.last_updated)),
+    min(q.prev_price, q.price),
+    max(q.prev_price, q.price),
+    date(q.last_updated)
+from (
+    select
+        id,
+        price,
+        last_updated,
+        lag(price) over (win) as prev_price,
+        lag(last_updated) over (win) as prev_updated
+    from quote_fact
+    where price is not null
+    window win as (partition by id order by last_updated asc)
+) q
+inner join asset a on a.id = q.id
+inner join price_interval_symbol s on s.symbol = a.symbol
+where q.prev_price is not null and julianday(q.last_updated) is not null;
@@ -0,0 +1,15 @@
+-- Upserting a historical row that exists (reloading an export, or the daily ohlcv bar on every get) runs the update trigger
+-- inside the upsert, where sqlite replaces the trigger's "or ignore" with the statement's conflict handling, so registering an
+-- already known symbol failed with a unique constraint error. Register the symbol only when it is missing instead.
+drop trigger price_interval_historical_update;
+
+create trigger price_interval_historical_update after update on historical
+begin
+    delete from price_interval where id = old.rowid * 2 + 1;
+    insert into price_interval_symbol (symbol)
+    select new.symbol where not exists (select 1 from price_interval_symbol where symbol = new.symbol);
+    insert into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+    select new.rowid * 2 + 1, s.id, s.id, new.low, new.high, julianday(new.enddate), julianday(new.enddate), new.low, new.high, new.enddate
+    from price_interval_symbol s
+    where s.symbol = new.symbol and new.low is not null and new.high is not null;
+end;
@@ -0,0 +1,68 @@
+-- Windows of quotes/historical that "monere backfill" has fetched and stored for a currency, so an interrupted backfill resumes
+-- where it stopped and ranges coinmarketcap has no quotes for are not requested again.
+create table backfill_window (
+    id integer not null,
+    interval text not null,
+    time_start text not null,
+    time_end text not null,
+    quotes integer not null,
+    fetched_at text not null,
+    primary key (id, interval, time_start, time_end)
+) without rowid;
+
+-- Backfilled quotes are inserted between quotes already stored. Besides the segment from the previous quote to the new one,
+-- the segment of the next quote now starts at the new quote instead of bridging the gap.
+drop trigger price_interval_quote;
+
+create trigger price_interval_quote after insert on quote_fact
+when new.price is not null and julianday(new.last_updated) is not null
+begin
+    insert or ignore into price_interval_symbol (symbol) select symbol from asset where id = new.id;
+    insert or replace into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+    select
+        (new.id * 4398046511104 + cast(round((julianday(new.last_updated) - 2440587.5) * 86400000) as integer)) * 2,
+        s.id,
+        s.id,
+        min(p.price, new.price),
+        max(p.price, new.price),
+        julianday(date(p.last_updated)),
+        julianday(date(new.last_updated)),
+        min(p.price, new.price),
+        max(p.price, new.price),
+        date(new.last_updated)
+    from (
+        select price, last_updated from quote_fact
+        where
+            id = new.id
+            and last_updated < new.last_updated
+            and price is not null
+        order by last_updated desc
+        limit 1
+    ) p
+    inner join asset a on a.id = new.id
+    inner join price_interval_symbol s on s.symbol = a.symbol;
+
+    insert or replace into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+    select
+        (new.id * 4398046511104 + cast(round((julianday(n.last_updated) - 2440587.5) * 86400000) as integer)) * 2,
+        s.id,
+        s.id,
+        min(n.price, new.price),
+        max(n.price, new.price),
+        julianday(date(new.last_updated)),
+        julianday(date(n.last_updated)),
+        min(n.price, new.price),
+        max(n.price, new.price),
+        date(n.last_updated)
+    from (
+        select price, last_updated from quote_fact
+        where
+            id = new.id
+            and last_updated > new.last_updated
+            and price is not null
+        order by last_updated
+        limit 1
+    ) n
+    inner join asset a on a.id = new.id
+    inner join price_interval_symbol s on s.symbol = a.symbol;
+end;
@@ -0,0 +1,49 @@
+-- A historical row is dated by its EndDate, the day after the day it covers. For the bar of the current day, which "monere get"
+-- upserts from ohlcv/latest, that is tomorrow, so its price range is dated no later than today instead.
+drop trigger price_interval_historical_insert;
+drop trigger price_interval_historical_update;
+
+create trigger price_interval_historical_insert after insert on historical
+when new.low is not null and new.high is not null
+begin
+    insert or ignore into price_interval_symbol (symbol) values (new.symbol);
+    insert or replace into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+    select
+        new.rowid * 2 + 1,
+        s.id,
+        s.id,
+        new.low,
+        new.high,
+        julianday(min(new.enddate, date('now'))),
+        julianday(min(new.enddate, date('now'))),
+        new.low,
+        new.high,
+        min(new.enddate, date('now'))
+    from price_interval_symbol s
+    where s.symbol = new.symbol;
+end;
+
+create trigger price_interval_historical_update after update on historical
+begin
+    delete from price_interval where id = old.rowid * 2 + 1;
+    insert into price_interval_symbol (symbol)
+    select new.symbol where not exists (select 1 from price_interval_symbol where symbol = new.symbol);
+    insert into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+    select
+        new.rowid * 2 + 1,
+        s.id,
+        s.id,
+        new.low,
+        new.high,
+        julianday(min(new.enddate, date('now'))),
+        julianday(min(new.enddate, date('now'))),
+        new.low,
+        new.high,
+        min(new.enddate, date('now'))
+    from price_interval_symbol s
+    where s.symbol = new.symbol and new.low is not null and new.high is not null;
+end;
+
+update price_interval
+set day_lo = julianday(date('now')), day_hi = julianday(date('now')), day = date('now')
+where id % 2 = 1 and day > date('now');
@@ -0,0 +1,64 @@
+-- Migration 0012 dated the bar of the current day, whose EndDate is tomorrow, no later than today. That made the day depend on
+-- when a row was written or the index rebuilt. Date every historical range by StartDate, the day it covers, instead.
+drop trigger price_interval_historical_insert;
+drop trigger price_interval_historical_update;
+
+create trigger price_interval_historical_insert after insert on historical
+when new.low is not null and new.high is not null
+begin
+    insert or ignore into price_interval_symbol (symbol) values (new.symbol);
+    insert or replace into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+    select
+        new.rowid * 2 + 1,
+        s.id,
+        s.id,
+        new.low,
+        new.high,
+        julianday(date(new.startdate)),
+        julianday(date(new.startdate)),
+        new.low,
+        new.high,
+        date(new.startdate)
+    from price_interval_symbol s
+    where s.symbol = new.symbol;
+end;
+
+create trigger price_interval_historical_update after update on historical
+begin
+    delete from price_interval where id = old.rowid * 2 + 1;
+    insert into price_interval_symbol (symbol)
+    select new.symbol where not exists (select 1 from price_interval_symbol where symbol = new.symbol);
+    insert into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+    select
+        new.rowid * 2 + 1,
+        s.id,
+        s.id,
+        new.low,
+        new.high,
+        julianday(date(new.startdate)),
+        julianday(date(new.startdate)),
+        new.low,
+        new.high,
+        date(new.startdate)
+    from price_interval_symbol s
+    where s.symbol = new.symbol and new.low is not null and new.high is not null;
+end;
+
+-- The ranges of the history still in the database are dated again
+delete from price_interval where id % 2 = 1 and (id - 1) / 2 in (select rowid from historical);
+
+insert into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+select
+    h.rowid * 2 + 1,
+    s.id,
+    s.id,
+    h.low,
+    h.high,
+    julianday(date(h.startdate)),
+    julianday(date(h.startdate)),
+    h.low,
+    h.high,
+    date(h.startdate)
+from historical h
+inner join price_interval_symbol s on h.symbol = s.symbol
+where h.low is not null and h.high is not null;
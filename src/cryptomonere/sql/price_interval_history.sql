@@ -0,0 +1,17 @@
+-- Daily low/high ranges of the history in the database, dated by the day they cover. Their ids are twice the historical rowid
+-- plus one.
+insert into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+select
+    h.rowid * 2 + 1,
+    s.id,
+    s.id,
+    h.low,
+    h.high,
+    julianday(date(h.startdate)),
+    julianday(date(h.startdate)),
+    h.low,
+    h.high,
+    date(h.startdate)
+from historical h
+inner join price_interval_symbol s on h.symbol = s.symbol
+where h.low is not null and h.high is not null
@@ -0,0 +1,17 @@
+-- Last day each (symbol, price) pair staged in temp.price_queries was reached, using the price_interval R*Tree
+select
+    pq.symbol,
+    pq.price,
+    (
+        select max(i.day) from price_interval i
+        where
+            i.symbol_lo <= s.id
+            and i.symbol_hi >= s.id
+            and i.price_lo <= pq.price
+            and i.price_hi >= pq.price
+            and i.low <= pq.price
+            and i.high >= pq.price
+    ) as last_at
+from temp.price_queries pq
+left join price_interval_symbol s on pq.symbol = s.symbol
+order by pq.rowid
@@ -0,0 +1,60 @@
+-- Segments between consecutive price points of the assets whose symbol is staged in temp.price_interval_rebuild. The points are
+-- the quotes, and for every hour whose quotes were pruned or archived, a point standing for the hour from its hourly rollup:
+-- at its close if none of its quotes are left, or else at its open, and ranging over the hour's low and high. A segment's id is
+-- twice (asset id * 2^42 + milliseconds since 1970 of the point that ends it), as for the segments the quote_fact trigger adds.
+insert into price_interval (id, symbol_lo, symbol_hi, price_lo, price_hi, day_lo, day_hi, low, high, day)
+select
+    (p.id * 4398046511104 + cast(round((julianday(p.at) - 2440587.5) * 86400000) as integer)) * 2,
+    s.id,
+    s.id,
+    min(coalesce(p.prev_price, p.low), p.low),
+    max(coalesce(p.prev_price, p.high), p.high),
+    julianday(date(coalesce(p.prev_at, p.at))),
+    julianday(date(p.at)),
+    min(coalesce(p.prev_price, p.low), p.low),
+    max(coalesce(p.prev_price, p.high), p.high),
+    date(p.at)
+from (
+    select
+        id,
+        at,
+        low,
+        high,
+        rolled_up,
+        lag(price) over (win) as prev_price,
+        lag(at) over (win) as prev_at
+    from (
+        select f.id, f.last_updated as at, f.price, f.price as low, f.price as high, 0 as rolled_up
+        from quote_fact f
+        inner join asset a on a.id = f.id
+        where f.price is not null and a.symbol in (select symbol from temp.price_interval_rebuild)
+        union all
+        select
+            (select max(a.id) from asset a where a.symbol = h.symbol),
+            case when h.first_left is null then h.close_at else h.open_at end,
+            case when h.first_left is null then h.close else h.open end,
+            h.low,
+            h.high,
+            1
+        from (
+            select
+                h.*,
+                (
+                    select min(f.last_updated) from quote_fact f
+                    where
+                        f.id in (select id from asset where symbol = h.symbol)
+                        -- ';' sorts right after ':', so these are the times within the hour
+                        and f.last_updated >= h.bucket
+                        and f.last_updated < h.bucket || ';'
+                        and f.price is not null
+                ) as first_left
+            from quote_hourly h
+            where h.symbol in (select symbol from temp.price_interval_rebuild)
+        ) h
+        where h.first_left is null or h.open_at < h.first_left
+    )
+    window win as (partition by id order by at asc)
+) p
+inner join asset a on a.id = p.id
+inner join price_interval_symbol s on s.symbol = a.symbol
+where (p.prev_price is not null or p.rolled_up = 1) and julianday(p.at) is not null
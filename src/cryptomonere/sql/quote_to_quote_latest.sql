@@ -1,12 +1,72 @@
-drop table if exists quote_latest;
+begin immediate;
 
-create table quote_latest as
-select * from (
+delete from quote_latest;
+
+insert into quote_latest (
+    id,
+    timestamp,
+    name,
+    symbol,
+    date_added,
+    max_supply,
+    circulating_supply,
+    is_active,
+    infinite_supply,
+    minted_market_cap,
+    cmc_rank,
+    is_fiat,
+    self_reported_circulating_supply,
+    self_reported_market_cap,
+    last_updated,
+    price,
+    volume_24h,
+    volume_change_24h,
+    percent_change_1h,
+    percent_change_24h,
+    percent_change_7d,
+    percent_change_30d,
+    percent_change_60d,
+    percent_change_90d,
+    market_cap,
+    market_cap_dominance,
+    fully_diluted_market_cap
+)
+select
+    id,
+    timestamp,
+    name,
+    symbol,
+    date_added,
+    max_supply,
+    circulating_supply,
+    is_active,
+    infinite_supply,
+    minted_market_cap,
+    cmc_rank,
+    is_fiat,
+    self_reported_circulating_supply,
+    self_reported_market_cap,
+    last_updated,
+    price,
+    volume_24h,
+    volume_change_24h,
+    percent_change_1h,
+    percent_change_24h,
+    percent_change_7d,
+    percent_change_30d,
+    percent_change_60d,
+    percent_change_90d,
+    market_cap,
+    market_cap_dominance,
+    fully_diluted_market_cap
+from (
     select
         *,
         row_number() over (
-            partition by symbol order by timestamp desc
+            partition by symbol order by last_updated desc
         ) as is_latest
     from quote
 )
-where is_latest = 1
+where is_latest = 1;
+
+commit;
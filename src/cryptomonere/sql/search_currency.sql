@@ -0,0 +1,16 @@
+-- An exact symbol match comes first, then matches ranked by bm25 (a symbol match weighs more than name, name more than slug),
+-- then by currency_rank among equally good matches
+select
+    c.id,
+    c.symbol,
+    c.name,
+    c.slug,
+    c.currency_rank
+from currency_search s
+inner join currency c on s.rowid = c.rowid
+where currency_search match :query
+order by
+    c.symbol = :symbol desc,
+    round(bm25(currency_search, 10.0, 5.0, 1.0), 1) asc,
+    c.currency_rank asc
+limit :limit offset :offset
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import logging
+import math
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from cryptomonere import app, coinmarketcap as ccap, metrics, report
+from cryptomonere.config import get_config
+from cryptomonere.SqlHandler import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+class Watcher:
+    """Runs fetch -> insert -> alert -> report every interval seconds in one process, reusing the api client and database connection.
+
+    Ticks are scheduled against the start time rather than the end of the previous tick, so slow ticks do not make the schedule drift.
+    Api credits are tracked per UTC day (in watch_state.json, so restarts keep the count) and ticks are skipped once the budget is spent.
+    A tick's credits are counted before its requests are sent, as coinmarketcap bills a request that fails after reaching it.
+    """
+
+    def __init__(self, args: argparse.Namespace, interval: float, credit_budget: int | None = None):
+        self.args = args
+        self.interval = interval
+        self.credit_budget = credit_budget
+        self.config = get_config()
+        self.stopping = threading.Event()
+        self.state_path = self.config.data_dir.joinpath("watch_state.json")
+        self.timings_path = self.config.data_dir.joinpath("watch_timings.json")
+        self.state = {"day": None, "credits": 0}
+        if self.state_path.exists():
+            with open(self.state_path) as R:
+                self.state = json.load(R)
+        self.ticks = 0
+        self.timing_totals = {}
+        # the phases inside each tick (api requests, inserts...) are always recorded for watch_timings.json
+        self.metrics = metrics.enable()
+
+    def stop(self, signum, frame):
+        logger.info(f"Received {signal.Signals(signum).name}, stopping after the current tick")
+        self.stopping.set()
+
+    def credits_used_today(self) -> int:
+        today = datetime.now(timezone.utc).date().isoformat()
+        if self.state["day"] != today:
+            self.state = {"day": today, "credits": 0}
+        return self.state["credits"]
+
+    def spend_credits(self, credits: int):
+        self.credits_used_today()
+        self.state["credits"] += credits
+        with open(self.state_path, "w") as W:
+            json.dump(self.state, W)
+
+    def planned_credits(self, id_count: int) -> int:
+        """Credits the requests of a tick for id_count ids cost: one per 100 ids (rounded up) of each chunk, for each endpoint"""
+        chunk_size = self.config.quote_chunk_size
+        per_endpoint = sum(math.ceil(min(chunk_size, id_count - start) / 100) for start in range(0, id_count, chunk_size))
+        return per_endpoint * (2 if self.config.fetch_ohlcv else 1)
+
+    def within_budget(self, credits: int) -> bool:
+        return self.credit_budget is None or self.credits_used_today() + credits <= self.credit_budget
+
+    @contextmanager
+    def timed(self, timings: dict, phase: str):
+        start = time.perf_counter()
+        try:
+            with self.metrics.span(phase):
+                yield
+        finally:
+            timings[phase] = (time.perf_counter() - start) * 1000
+
+    def tick(self, ids: list[int], credits: int) -> dict:
+        timings = {}
+        timestamp = datetime.now(timezone.utc).isoformat()
+        self.spend_credits(credits)
+        with self.timed(timings, "fetch"):
+            data, ohlcv = app.fetch_latest(self.config, ids)
+        # counted as planned, unless coinmarketcap reports billing more
+        billed = data["status"].get("credit_count", 0) + (ohlcv["status"].get("credit_count", 0) if ohlcv is not None else 0)
+        if billed > credits:
+            self.spend_credits(billed - credits)
+        with self.timed(timings, "insert"):
+            # the bars go in first, so the crossings refreshed after the quotes are inserted already cover them
+            if ohlcv is not None:
+                app.insert_ohlcv(ohlcv)
+            rows = app.insert_quotes(data, timestamp)
+        if not self.args.no_update_alert:
+            with self.timed(timings, "alert"):
+                app.alert(self.args, rows)
+        if not self.args.no_report:
+            with self.timed(timings, "report"):
+                report.quote_latest()
+        return timings
+
+    def record(self, timings: dict):
+        self.ticks += 1
+        for phase, ms in timings.items():
+            self.timing_totals[phase] = self.timing_totals.get(phase, 0) + ms
+        logger.info(f"tick {self.ticks}: " + ", ".join(f"{phase} {ms:.1f}ms" for phase, ms in timings.items()))
+        with open(self.timings_path, "w") as W:
+            json.dump(
+                {
+                    "ticks": self.ticks,
+                    "last_ms": timings,
+                    "mean_ms": {phase: total / self.ticks for phase, total in self.timing_totals.items()},
+                    **self.metrics.summary(),
+                },
+                W,
+                indent=2,
+            )
+        if self.args.metrics_output is not None:
+            self.metrics.write(Path(self.args.metrics_output), self.args.metrics_format)
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        logger.info(f"Watching {len(self.config.symbols)} symbols every {self.interval}s")
+        start = time.monotonic()
+        while not self.stopping.is_set():
+            tick_start = time.monotonic()
+            ids = app.currency_ids(self.config)
+            credits = self.planned_credits(len(ids))
+            if self.within_budget(credits):
+                try:
+                    self.record(self.tick(ids, credits))
+                except ccap.ApiError as e:
+                    logger.error(e)
+                except Exception:
+                    logger.exception("Tick failed")
+            elif self.state.get("budget_warned") is None:
+                logger.warning(f"Daily api credit budget of {self.credit_budget} is spent, skipping ticks until tomorrow (UTC)")
+                self.state["budget_warned"] = True
+
+            now = time.monotonic()
+            if now - tick_start > self.interval:
+                logger.warning(f"Tick took {now - tick_start:.1f}s, longer than the {self.interval}s interval. Skipping the missed ticks")
+            next_tick = start + (math.floor((now - start) / self.interval) + 1) * self.interval
+            self.stopping.wait(next_tick - now)
+
+        ccap.get_client().close()
+        get_connection().close()
+        logger.info("Stopped watching")
+
+
+def run(args: argparse.Namespace):
+    config = get_config()
+    credit_budget = args.credit_budget if args.credit_budget is not None else config.daily_credit_budget
+    Watcher(args, args.interval, credit_budget).run()
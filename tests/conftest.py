@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+"""Monere home directories generated with the benchmark data generator, for tests running commands in process"""
+
+import pytest
+
+from benchmarks.suite import data
+from cryptomonere import app, coinmarketcap as ccap, config
+from cryptomonere.SqlHandler import get_connection
+
+
+def clear_caches():
+    """Forget the config, database connection and api client cached for the life of the process"""
+    if get_connection.cache_info().currsize:
+        get_connection().close()
+    for cached in (config.get_config, get_connection, ccap.get_client):
+        cached.cache_clear()
+
+
+@pytest.fixture
+def make_home(tmp_path, monkeypatch):
+    """Generate a home directory of a data.Size for an api at base_url under tmp_path, and point the config at it"""
+
+    def make(size: data.Size, base_url: str):
+        data.generate(tmp_path, size, base_url)
+        config_path = tmp_path.joinpath(".config", "cryptomonere", "config.json")
+        monkeypatch.setattr(config, "CONFIG_PATH", config_path)
+        monkeypatch.setattr(config, "CONFIG_CACHE_PATH", config_path.with_name(".config_cache.json"))
+        clear_caches()
+        app.init_db()
+        return tmp_path
+
+    yield make
+    clear_caches()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+"""Reading history from both the database and the archive"""
+
+import pytest
+
+from benchmarks.suite import data
+from cryptomonere import historic
+from cryptomonere.SqlHandler import SqlHandler
+
+pl = pytest.importorskip("polars")
+archive = pytest.importorskip("cryptomonere.archive")
+
+
+@pytest.fixture
+def home(make_home):
+    """30 days of BTC history, of which the part older than 10 days is archived"""
+    home = make_home(data.Size(symbols=1, history_symbols=1, quote_days=0, history_days=30), "http://127.0.0.1:9")
+    historic.load("BTC", [str(home.joinpath("history", "BTC.csv"))])
+    assert archive.archive(days=10) > 0
+    return home
+
+
+def test_history_loaded_again_is_read_once(home):
+    total = historic.load("BTC", [str(home.joinpath("history", "BTC.csv"))])
+    SQL = SqlHandler()
+    first = SQL.listQuery("select min(EndDate) from historical")[0]
+    SQL.sql("update historical set Close = -1 where EndDate = ?", params=(first,))
+
+    history = archive.scan("historical", ["BTC"], ["EndDate", "Close"]).collect()
+    assert history.height == history["EndDate"].n_unique() == total
+    # the rows in the database win over their archived copies
+    assert history.filter(pl.col("EndDate") == first)["Close"].to_list() == [-1]
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""backfill against the benchmark stub: finding gaps, filling them once, resuming and keeping price_interval in step"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.suite import data
+from benchmarks.suite.stub import StubApi, StubServer
+from cryptomonere import backfill as backfill_module, price_index, rollup
+from cryptomonere.backfill import backfill, find_gaps, floor_time, format_time, parse_time
+from cryptomonere.config import get_config
+from cryptomonere.SqlHandler import SqlHandler
+
+SYMBOLS = ["BTC", "ETH", "XMR"]
+# Quotes removed from the generated minute quotes, in hours before the last one: a stretch the backfill starts in, one in the
+# middle and the last hour
+REMOVED = {"head": (40, 30), "interior": (20, 18), "tail": (1, 0)}
+SINCE_HOURS = 36
+
+
+class FlakyApi(StubApi):
+    """StubApi whose quotes/historical answers 500 for windows starting at one of failing, and no quotes for those starting at
+    one of empty"""
+
+    def __init__(self, count: int):
+        super().__init__(count)
+        self.failing = set()
+        self.empty = set()
+        self.requested = []
+        self.routes["/v2/cryptocurrency/quotes/historical"] = self.flaky_historical
+
+    def flaky_historical(self, params: dict):
+        self.requested.append(params["time_start"][0])
+        if params["time_start"][0] in self.failing:
+            return 500, {"status": {"error_code": 500, "error_message": "down"}}, {}
+        if params["time_start"][0] in self.empty:
+            return {"status": {"error_code": 0, "credit_count": 1}, "data": {}}
+        return self.quotes_historical(params)
+
+
+@pytest.fixture(params=[timedelta(0), timedelta(minutes=2)], ids=["since on the grid", "since off the grid"])
+def home(request, make_home):
+    """Two days of minute quotes for three currencies with the REMOVED stretches deleted, served by a FlakyApi"""
+    api = FlakyApi(len(SYMBOLS))
+    with StubServer(api) as server:
+        make_home(data.Size(symbols=len(SYMBOLS), history_symbols=len(SYMBOLS), quote_days=2, history_days=0), server.url)
+        SQL = SqlHandler()
+        last = parse_time(SQL.listQuery("select max(last_updated) from quote_fact")[0])
+        bounds = {name: (last - timedelta(hours=start), last - timedelta(hours=end)) for name, (start, end) in REMOVED.items()}
+        with SQL.transaction():
+            for start, end in bounds.values():
+                SQL.cx.execute("delete from quote_fact where last_updated >= ? and last_updated <= ?", (format_time(start), format_time(end)))
+                # quotes never fetched were never rolled up either, else the rebuild would stand in for them with their hours
+                SQL.cx.execute("delete from quote_hourly where bucket between ? and ?", (format_time(start)[:13], format_time(end)[:13]))
+        # quote_fact has no delete trigger, so the segments bridging the deleted quotes are recomputed
+        price_index.rebuild()
+        api.bounds = bounds
+        api.last = last
+        # on the 5 minute grid of the backfilled quotes, so the first of them falls exactly on since, or just off it
+        api.since = floor_time(last - timedelta(hours=SINCE_HOURS), timedelta(minutes=5)) + request.param
+        yield api
+
+
+def quote_count() -> int:
+    return SqlHandler().listQuery("select count(*) from quote_fact")[0]
+
+
+def price_intervals() -> list[tuple]:
+    return SqlHandler().sql("select * from price_interval order by id")
+
+
+def test_find_gaps_finds_head_interior_and_tail_gaps(home):
+    until = home.last + timedelta(minutes=1)
+    gaps = find_gaps(SYMBOLS, home.since, until, "5m")
+    minute = timedelta(minutes=1)
+    expected = []
+    for cmc_id, symbol in enumerate(SYMBOLS, 1):
+        for name in ("head", "interior"):
+            start, end = home.bounds[name]
+            expected.append((symbol, cmc_id, start - minute, end + minute))
+        expected.append((symbol, cmc_id, home.bounds["tail"][0] - minute, until))
+    assert gaps == sorted(expected)
+    # the backfill starts inside the head gap
+    assert home.bounds["head"][0] < home.since < home.bounds["head"][1]
+
+
+def test_second_backfill_inserts_nothing(home, monkeypatch):
+    gaps = find_gaps(SYMBOLS, home.since, home.last + timedelta(minutes=1), "5m")
+    before = quote_count()
+    assert backfill(SYMBOLS, since=home.since) == 0
+    filled = quote_count()
+    assert SqlHandler().listQuery("select sum(quotes) from backfill_window")[0] == filled - before > 0
+    requests = len(home.requested)
+
+    # the gaps are filled, so nothing is requested again
+    assert backfill(SYMBOLS, since=home.since, refetch=True) == 0
+    assert len(home.requested) == requests
+    # a run which found the gaps before the first one filled them gets the same quotes, which are ignored on (id, last_updated)
+    monkeypatch.setattr(backfill_module, "find_gaps", lambda *args: gaps)
+    assert backfill(SYMBOLS, since=home.since, refetch=True) == 0
+    assert len(home.requested) == 2 * requests
+    assert quote_count() == filled
+
+
+def window_start(time: datetime) -> str:
+    return format_time(floor_time(time, timedelta(minutes=5)))
+
+
+def test_backfill_resumes_from_the_fetched_windows(home):
+    # each removed stretch is one window, requested for all three currencies at once. coinmarketcap has no quotes for the head
+    # window, so its gap stays, and the interior window fails.
+    head, interior = (window_start(max(home.bounds[name][0] - timedelta(minutes=1), home.since)) for name in ("head", "interior"))
+    home.empty, home.failing = {head}, {interior}
+    assert backfill(SYMBOLS, since=home.since) == 1
+    assert len(home.requested) == 3
+    assert sorted(set(SqlHandler().listQuery("select time_start from backfill_window"))) == sorted(set(home.requested) - {interior})
+
+    # only the failed window is requested again, the empty one is not
+    home.failing = set()
+    assert backfill(SYMBOLS, since=home.since) == 0
+    assert home.requested[3:] == [interior]
+    assert backfill(SYMBOLS, since=home.since) == 0
+    assert len(home.requested) == 4
+
+
+def test_backfill_starts_at_the_retention_cutoff(home, monkeypatch):
+    # the quotes are generated up to now, so with a day of retention the head gap is older than the cutoff and the interior one is not
+    monkeypatch.setattr(get_config(), "quote_retention_days", 1)
+    cutoff = parse_time(rollup.retention_cutoff())
+    assert home.bounds["head"][1] < cutoff < home.bounds["interior"][0]
+    assert backfill(SYMBOLS, since=home.since) == 0
+    assert home.requested and min(parse_time(start) for start in home.requested) >= floor_time(cutoff, timedelta(minutes=5))
+    start, end = (format_time(time) for time in home.bounds["head"])
+    assert SqlHandler().listQuery("select count(*) from quote_fact where last_updated between ? and ?", (start, end))[0] == 0
+
+
+def test_price_interval_matches_a_rebuild(home):
+    assert backfill(SYMBOLS, since=home.since) == 0
+    backfilled = price_intervals()
+    price_index.rebuild()
+    assert backfilled == price_intervals()
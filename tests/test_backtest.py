@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""The price series backtests run over, joined from history, hourly rollups and quotes"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from benchmarks.suite import data
+from cryptomonere import app, historic
+from cryptomonere.SqlHandler import SqlHandler
+
+pl = pytest.importorskip("polars")
+backtest = pytest.importorskip("cryptomonere.backtest")
+
+
+@pytest.fixture
+def home(make_home):
+    """A day of minute quotes for BTC, 30 days of history up to them and the bar of the current day"""
+    home = make_home(data.Size(symbols=1, history_symbols=1, quote_days=1, history_days=30), "http://127.0.0.1:9")
+    historic.load("BTC", [str(home.joinpath("history", "BTC.csv"))])
+    app.insert_ohlcv({"data": {"1": data.ohlcv_entry(1, "BTC", 5000.0, datetime.now(timezone.utc))}})
+    return home
+
+
+def assert_joined(series, start: str):
+    """series has increasing times, and history up to start and then the finer sources"""
+    assert series["time"].is_sorted() and series["time"].n_unique() == series.height
+    history_days = SqlHandler().listQuery("select count(*) from historical where EndDate < ?", (start,))[0]
+    assert series.filter(pl.col("time") < datetime.fromisoformat(start[:19])).height == history_days
+
+
+@pytest.mark.parametrize("hourly", [True, False], ids=["with hourly rollups", "without hourly rollups"])
+def test_series_times_increase(home, hourly):
+    SQL = SqlHandler()
+    if not hourly:
+        SQL.sql("delete from quote_hourly")
+    start = SQL.listQuery("select min(last_updated) from quote_fact")[0]
+    assert_joined(backtest.load_series("BTC"), start)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""ApiClient against a local stub server: retries, Retry-After, timeouts and the TTL cache"""
+
+import os
+import time
+
+import pytest
+
+from benchmarks.suite.stub import StubServer
+from cryptomonere.client import ApiClient, ApiError
+
+OK = {"status": {"error_code": 0}, "data": {"price": 1}}
+
+
+class ScriptedApi:
+    """Answers /quotes with the scripted responses in order, repeating the last one, and counts the calls"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+        self.routes = {"/quotes": self.quotes}
+
+    def quotes(self, params: dict):
+        self.calls += 1
+        response = self.responses[min(self.calls, len(self.responses)) - 1]
+        return response(params) if callable(response) else response
+
+
+def client(server: StubServer, **options) -> ApiClient:
+    return ApiClient(server.url, **{"retries": 2, "backoff": 0.01, "timeout": 5, **options})
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retries_rate_limits_and_server_errors(status):
+    api = ScriptedApi((status, {"status": {"error_code": status, "error_message": "busy"}}, {}), OK)
+    with StubServer(api) as server:
+        assert client(server).get_json("/quotes") == OK
+    assert api.calls == 2
+
+
+def test_gives_up_after_the_retries():
+    api = ScriptedApi((500, {"status": {"error_code": 500, "error_message": "down"}}, {}))
+    with StubServer(api) as server, pytest.raises(ApiError, match="after 3 attempts"):
+        client(server).get_json("/quotes")
+    assert api.calls == 3
+
+
+def test_api_errors_are_not_retried():
+    api = ScriptedApi((400, {"status": {"error_code": 1002, "error_message": "bad key"}}, {}))
+    with StubServer(api) as server, pytest.raises(ApiError, match="bad key"):
+        client(server).get_json("/quotes")
+    assert api.calls == 1
+
+
+def test_exhausted_credits_are_not_retried():
+    api = ScriptedApi((429, {"status": {"error_code": 1009, "error_message": "plan limit"}}, {}))
+    with StubServer(api) as server, pytest.raises(ApiError, match="plan limit"):
+        client(server).get_json("/quotes")
+    assert api.calls == 1
+
+
+def test_retry_after_seconds_is_honored():
+    api = ScriptedApi((429, {"status": {"error_code": 429}}, {"Retry-After": "0.3"}), OK)
+    with StubServer(api) as server:
+        started = time.monotonic()
+        assert client(server).get_json("/quotes") == OK
+    assert time.monotonic() - started >= 0.3
+
+
+@pytest.mark.parametrize("retry_after", ["soon", "Mon, 99 Foo 2024 25:61:00 GMT", ""])
+def test_unparseable_retry_after_falls_back_to_backoff(retry_after):
+    api = ScriptedApi((429, {"status": {"error_code": 429}}, {"Retry-After": retry_after}), OK)
+    with StubServer(api) as server:
+        assert client(server).get_json("/quotes") == OK
+    assert api.calls == 2
+
+
+def test_timeouts_are_retried():
+    def slow(params):
+        time.sleep(0.5)
+        return OK
+
+    api = ScriptedApi(slow, OK)
+    with StubServer(api) as server:
+        assert client(server, timeout=0.1).get_json("/quotes") == OK
+    assert api.calls == 2
+
+
+def test_cache_hits_within_ttl(tmp_path):
+    api = ScriptedApi(OK)
+    with StubServer(api) as server:
+        api_client = client(server, cache_dir=tmp_path)
+        assert api_client.get_json("/quotes", {"id": "1"}, ttl=60) == OK
+        assert api_client.get_json("/quotes", {"id": "1"}, ttl=60) == OK
+        assert api_client.get_json("/quotes", {"id": "2"}, ttl=60) == OK
+    assert api.calls == 2
+
+
+def test_nothing_is_cached_without_a_ttl(tmp_path):
+    api = ScriptedApi(OK)
+    with StubServer(api) as server:
+        api_client = client(server, cache_dir=tmp_path)
+        api_client.get_json("/quotes")
+        api_client.get_json("/quotes")
+    assert api.calls == 2
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_expired_entries_are_pruned(tmp_path):
+    expired = tmp_path.joinpath("expired.json")
+    expired.write_text("{}")
+    os.utime(expired, (time.time() - 3600, time.time() - 3600))
+    with StubServer(ScriptedApi(OK)) as server:
+        client(server, cache_dir=tmp_path).get_json("/quotes", ttl=60)
+    assert not expired.exists()
+    assert len(list(tmp_path.glob("*.json"))) == 1
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""dedup merging the quotes a symbol has under a placeholder id into its real id"""
+
+import pytest
+
+from benchmarks.suite import data
+from cryptomonere import app, price_index
+from cryptomonere.dedup import dedup
+from cryptomonere.SqlHandler import SqlHandler
+
+REAL_ID = 9001
+TIMES = ["2024-01-01T00:00:00.000Z", "2024-01-01T00:05:00.000Z", "2024-01-01T00:10:00.000Z"]
+
+
+def insert_quote(cmc_id: int | None, price: float, last_updated: str):
+    quote = data.quote_entry(cmc_id or 1, "NEW", price, last_updated)
+    quote["id"] = cmc_id
+    app.insert_quotes({"data": {"0": quote}}, last_updated)
+
+
+@pytest.fixture
+def split(make_home):
+    """NEW quoted at TIMES without an id, then under REAL_ID before that and at the first of TIMES again"""
+    make_home(data.Size(symbols=1, history_symbols=0, quote_days=0, history_days=0), "http://127.0.0.1:9")
+    for price, last_updated in zip([1.0, 2.0, 3.0], TIMES):
+        insert_quote(None, price, last_updated)
+    insert_quote(REAL_ID, 0.5, "2023-12-31T23:55:00.000Z")
+    insert_quote(REAL_ID, 1.0, TIMES[0])
+    return SqlHandler()
+
+
+def test_dedup_moves_placeholder_quotes_to_the_real_id(split):
+    assert split.sql("select id from asset where symbol = 'NEW' order by id") == [(-1,), (REAL_ID,)]
+    assert split.sql("select id, last_updated from quote_latest where symbol = 'NEW'") == [(-1, TIMES[2])]
+
+    # the quote at the first of TIMES is stored under both ids, so it is dropped rather than moved
+    assert dedup() == (2, 1)
+    assert split.sql("select id from asset where symbol = 'NEW'") == [(REAL_ID,)]
+    assert split.sql("select id, last_updated, price from quote_fact where id in (-1, ?) order by last_updated", params=(REAL_ID,)) == [
+        (REAL_ID, "2023-12-31T23:55:00.000Z", 0.5),
+        (REAL_ID, TIMES[0], 1.0),
+        (REAL_ID, TIMES[1], 2.0),
+        (REAL_ID, TIMES[2], 3.0),
+    ]
+    assert split.sql("select id, last_updated from quote_latest where symbol = 'NEW'") == [(REAL_ID, TIMES[2])]
+
+    # only NEW was re-segmented, to what a rebuild of the whole index gives
+    intervals = split.sql("select * from price_interval order by id")
+    assert split.listQuery("select count(*) from price_interval where id % 2 = 0")[0] == 3
+    price_index.rebuild()
+    assert split.sql("select * from price_interval order by id") == intervals
+    assert dedup() == (0, 0)
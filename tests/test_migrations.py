@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""Two processes migrating the same database at once: both end at the latest version, and the loser skips what the winner applied"""
+
+import logging
+import sqlite3 as sqlite
+import threading
+
+from cryptomonere import migrations
+
+LATEST = int(migrations.migrations()[-1].name[:4])
+
+
+def schema(cx: sqlite.Connection) -> list[tuple]:
+    return cx.execute("select type, name, sql from sqlite_master order by type, name").fetchall()
+
+
+def test_concurrent_migrations_reach_the_latest_version(tmp_path):
+    path = tmp_path.joinpath("crypto.db")
+    barrier = threading.Barrier(2)
+    versions, errors = [], []
+
+    def run():
+        cx = sqlite.connect(path, timeout=30, check_same_thread=False)
+        try:
+            barrier.wait()
+            versions.append(migrations.migrate(cx))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            cx.close()
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert versions == [LATEST, LATEST]
+    with sqlite.connect(path) as cx:
+        assert migrations.schema_version(cx) == LATEST
+
+
+def test_migration_applied_by_another_process_is_skipped(tmp_path, monkeypatch, caplog):
+    path = tmp_path.joinpath("crypto.db")
+    winner, loser = sqlite.connect(path), sqlite.connect(path)
+    migrations.migrate(winner)
+    migrated = schema(winner)
+
+    # the loser read the version before the winner migrated, so it tries every migration
+    stale = [0]
+    schema_version = migrations.schema_version
+    monkeypatch.setattr(migrations, "schema_version", lambda cx: stale.pop() if stale else schema_version(cx))
+    with caplog.at_level(logging.INFO, logger=migrations.__name__):
+        assert migrations.migrate(loser) == LATEST
+    # the version guard stops the first migration, and the version then recorded skips the rest
+    skipped = [record.getMessage() for record in caplog.records if "another process" in record.getMessage()]
+    assert skipped == ["Schema version 1 was applied by another process"]
+    assert schema(loser) == migrated
+    winner.close()
+    loser.close()
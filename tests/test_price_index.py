@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""The price_interval index kept up to date by triggers against the same index rebuilt from scratch"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from benchmarks.suite import data
+from cryptomonere import app, historic, price_index
+from cryptomonere.SqlHandler import SqlHandler
+
+
+@pytest.fixture
+def home(make_home):
+    """A day of minute quotes and 30 days of history before them for BTC, and minute quotes for ETH"""
+    home = make_home(data.Size(symbols=2, history_symbols=2, quote_days=1, history_days=30), "http://127.0.0.1:9")
+    historic.load("BTC", [str(home.joinpath("history", "BTC.csv"))])
+    return home
+
+
+def price_intervals() -> list[tuple]:
+    return SqlHandler().sql("select * from price_interval order by id")
+
+
+def test_history_is_dated_by_the_day_it_covers(home):
+    now = datetime.now(timezone.utc)
+    bar = data.ohlcv_entry(1, "BTC", 1e9, now)
+    app.insert_ohlcv({"data": {"1": bar}})
+    # the bar of the current day is dated today, not by its EndDate of tomorrow
+    assert price_index.last_at("BTC", 1e9) == now.date().isoformat()
+    start, end = SqlHandler().sql("select min(StartDate), max(StartDate) from historical where Symbol = 'BTC' and High < 1e9")[0]
+    assert SqlHandler().sql("select min(day), max(day) from price_interval where id % 2 = 1 and high < 1e9") == [(start, end)]
+
+    incremental = price_intervals()
+    price_index.rebuild()
+    assert price_intervals() == incremental
+
+
+def quote_ranges() -> list[tuple]:
+    """Price range of the quote segments of each symbol and day"""
+    return SqlHandler().sql("select symbol_lo, day, min(price_lo), max(price_hi) from price_interval where id % 2 = 0 group by symbol_lo, day order by 1, 2")
+
+
+def test_rebuild_keeps_the_ranges_of_pruned_quotes(home):
+    SQL = SqlHandler()
+    ranges = quote_ranges()
+    first, last = SQL.sql("select min(last_updated), max(last_updated) from quote_fact")[0]
+    # off the hour, so the quotes of one hour are only partly pruned
+    cutoff = (datetime.fromisoformat(first) + (datetime.fromisoformat(last) - datetime.fromisoformat(first)) / 2).strftime("%Y-%m-%dT%H:%M:30")
+    with SQL.transaction():
+        pruned = SQL.cx.execute("delete from quote_fact where last_updated < ?", (cutoff,)).rowcount
+    assert pruned > 0
+
+    price_index.rebuild()
+    assert quote_ranges() == ranges
+    assert SQL.listQuery("select count(*) from price_interval where id % 2 = 0")[0] < SQL.listQuery("select count(*) from quote_fact")[0] + pruned
+
+
+def history_ranges() -> list[tuple]:
+    return SqlHandler().sql("select symbol_lo, day_lo, day_hi, low, high, day from price_interval where id % 2 = 1 order by 1, 2")
+
+
+def test_rebuild_keeps_archived_history(home):
+    pytest.importorskip("polars")
+    from cryptomonere import archive
+
+    ranges = history_ranges()
+    assert archive.archive(days=10) > 0
+    assert SqlHandler().listQuery("select count(*) from historical")[0] < len(ranges)
+
+    price_index.rebuild()
+    assert history_ranges() == ranges
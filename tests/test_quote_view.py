@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""Inserts through the quote view, which its triggers split into asset and quote_fact and roll up into quote_latest and quote_hourly"""
+
+import pytest
+
+from benchmarks.suite import data
+from cryptomonere import app
+from cryptomonere.SqlHandler import SqlHandler
+
+
+def quote(cmc_id: int | None, symbol: str, price: float, last_updated: str) -> dict:
+    entry = data.quote_entry(cmc_id or 1, symbol, price, last_updated)
+    entry["id"] = cmc_id
+    return app.quote_row(entry, last_updated)
+
+
+@pytest.fixture
+def SQL(make_home):
+    make_home(data.Size(symbols=1, history_symbols=0, quote_days=0, history_days=0), "http://127.0.0.1:9")
+    return SqlHandler()
+
+
+def test_quote_view_insert(SQL):
+    SQL.bulk_insert(
+        "quote",
+        app.quote_columns,
+        [
+            quote(7, "SEVEN", 100.0, "2024-01-01T10:00:00.000Z"),
+            quote(7, "SEVEN", 110.0, "2024-01-01T10:30:00.000Z"),
+            # the same snapshot again is ignored on (id, last_updated)
+            quote(7, "SEVEN", 999.0, "2024-01-01T10:30:00.000Z"),
+            quote(7, "SEVEN", 90.0, "2024-01-01T11:05:00.000Z"),
+            # quotes without an id get a placeholder asset, which the symbol's later id-less quotes share
+            quote(None, "NOID", 5.0, "2024-01-01T10:00:00.000Z"),
+            quote(None, "NOID", 6.0, "2024-01-01T10:15:00.000Z"),
+        ],
+    )
+
+    assert SQL.sql("select id, symbol, name from asset order by id") == [(-1, "NOID", "NOID Coin"), (7, "SEVEN", "SEVEN Coin")]
+    assert SQL.sql("select id, last_updated, price from quote_fact order by id, last_updated") == [
+        (-1, "2024-01-01T10:00:00.000Z", 5.0),
+        (-1, "2024-01-01T10:15:00.000Z", 6.0),
+        (7, "2024-01-01T10:00:00.000Z", 100.0),
+        (7, "2024-01-01T10:30:00.000Z", 110.0),
+        (7, "2024-01-01T11:05:00.000Z", 90.0),
+    ]
+    assert SQL.sql("select id, symbol, last_updated, price from quote_latest order by id") == [
+        (-1, "NOID", "2024-01-01T10:15:00.000Z", 6.0),
+        (7, "SEVEN", "2024-01-01T11:05:00.000Z", 90.0),
+    ]
+    assert SQL.sql("select symbol, bucket, open, high, low, close, open_at, close_at, samples from quote_hourly order by symbol, bucket") == [
+        ("NOID", "2024-01-01T10", 5.0, 6.0, 5.0, 6.0, "2024-01-01T10:00:00.000Z", "2024-01-01T10:15:00.000Z", 2),
+        ("SEVEN", "2024-01-01T10", 100.0, 110.0, 100.0, 110.0, "2024-01-01T10:00:00.000Z", "2024-01-01T10:30:00.000Z", 2),
+        ("SEVEN", "2024-01-01T11", 90.0, 90.0, 90.0, 90.0, "2024-01-01T11:05:00.000Z", "2024-01-01T11:05:00.000Z", 1),
+    ]
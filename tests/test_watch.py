@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""Watcher ticks against the benchmark stub: api credits are counted against the budget even when a request fails"""
+
+from argparse import Namespace
+
+import pytest
+
+from benchmarks.suite import data
+from benchmarks.suite.stub import StubApi, StubServer
+from cryptomonere import app
+from cryptomonere.client import ApiError
+from cryptomonere.config import get_config
+from cryptomonere.watch import Watcher
+
+ARGS = Namespace(no_update_alert=True, no_report=True, metrics_output=None)
+
+
+class DownApi(StubApi):
+    """StubApi whose quotes/latest answers 500 while down is set"""
+
+    def __init__(self, count: int):
+        super().__init__(count)
+        self.down = False
+        self.routes["/v2/cryptocurrency/quotes/latest"] = self.flaky_quotes_latest
+
+    def flaky_quotes_latest(self, params: dict):
+        if self.down:
+            return 500, {"status": {"error_code": 500, "error_message": "down"}}, {}
+        return self.quotes_latest(params)
+
+
+@pytest.fixture
+def api(make_home):
+    api = DownApi(3)
+    with StubServer(api) as server:
+        make_home(data.Size(symbols=3, history_symbols=0, quote_days=0, history_days=0), server.url)
+        yield api
+
+
+def test_planned_credits_round_up_per_chunk_and_endpoint(api):
+    watcher = Watcher(ARGS, 60)
+    chunk_size = get_config().quote_chunk_size
+    assert watcher.planned_credits(0) == 0
+    assert watcher.planned_credits(1) == 2
+    assert watcher.planned_credits(chunk_size + 101) == 2 * (chunk_size // 100 + 2)
+
+
+def test_failed_ticks_spend_credits(api):
+    watcher = Watcher(ARGS, 60, credit_budget=5)
+    ids = app.currency_ids(get_config())
+    credits = watcher.planned_credits(len(ids))
+    assert credits == 2 and watcher.within_budget(credits)
+
+    api.down = True
+    with pytest.raises(ApiError):
+        watcher.tick(ids, credits)
+    assert watcher.state["credits"] == credits
+
+    api.down = False
+    watcher.tick(ids, credits)
+    assert watcher.state["credits"] == 2 * credits
+    assert not watcher.within_budget(credits)
+    # a restart keeps the count
+    assert Watcher(ARGS, 60, credit_budget=5).credits_used_today() == 2 * credits